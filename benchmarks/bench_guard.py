@@ -0,0 +1,58 @@
+"""
+Micro-benchmark: enforce_allowed_ingredients throughput on large recipe payloads.
+
+    python benchmarks/bench_guard.py --recipes 5000 --ingredients 12
+"""
+import argparse
+import json
+import random
+import time
+
+from bitewise.recipes import enforce_allowed_ingredients
+
+PANTRY = [
+    "tomatoes", "canned tuna in water", "chickpeas", "spinach", "rice", "eggs", "onion",
+    "garlic", "bell peppers", "zucchini", "chicken breast", "black beans", "corn", "lemon",
+]
+NOISE = ["Bacon", "Shrimp", "Saffron", "Truffle", "Quail eggs", "Caviar"]
+EXTRAS = ["salt", "pepper", "olive oil", "water"]
+
+
+def _payload(n_recipes: int, n_ingredients: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    pool = [p.title() for p in PANTRY] + [p + "s" for p in PANTRY] + NOISE + EXTRAS
+    recipes = [
+        {"name": f"Recipe {i}", "ingredients": rng.sample(pool, n_ingredients), "estimated_calories": 400}
+        for i in range(n_recipes)
+    ]
+    return json.dumps({"recipes": recipes})
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--recipes", type=int, default=2000)
+    ap.add_argument("--ingredients", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    raw = _payload(args.recipes, args.ingredients)
+    enforce_allowed_ingredients(raw, PANTRY, ["Keto"])  # warm the canonical index
+    best = float("inf")
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        enforce_allowed_ingredients(raw, PANTRY, ["Keto"])
+        best = min(best, time.perf_counter() - t0)
+    items = args.recipes * args.ingredients
+    print(json.dumps({
+        "bench": "guard",
+        "recipes": args.recipes,
+        "payload_bytes": len(raw),
+        "best_s": round(best, 6),
+        "recipes_per_s": round(args.recipes / best),
+        "items_per_s": round(items / best),
+    }))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,288 @@
+"""
+Benchmark suite: local hot-path micro-benchmarks + end-to-end `plan` runs
+against a fake model client with configurable latency.
+
+    python benchmarks/bench_suite.py                               # full run, JSON on stdout
+    python benchmarks/bench_suite.py --quick --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_suite.py --quick --baseline benchmarks/baseline.json --tolerance 0.3
+
+Every result reports p50/p95/p99 latency (ms), throughput (ops/s) and peak
+traced memory (KB). With --baseline, any result whose p50 (micro) or p95 (e2e)
+is more than `tolerance` slower than the baseline is listed under
+"regressions" and the exit status is 1.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from bitewise.imaging import ImageOptions, guess_mime, preprocess_image
+from bitewise.prompts import FEW_SHOT_BLOCK, PROMPT_TEMPLATE
+from bitewise.dietary import compile_rule
+from bitewise.retrieval import RecipeIndex
+from bitewise.recipes import _expand_allowed, enforce_allowed_ingredients, suggest_recipes_from_ingredients
+from bitewise.vision import _dedup_clamp, _normalize_lines, detect_ingredients_many
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE = os.path.join(HERE, "..", "examples", "sample_fridge.jpg")
+
+PANTRY = [
+    "Tomatoes", "Canned tuna in water", "Chickpeas", "Spinach", "Rice", "Eggs", "Onion",
+    "Garlic", "Bell peppers", "Zucchini", "Chicken breast", "Black beans", "Corn", "Lemon",
+    "Carrots", "Greek yogurt", "Cheddar cheese", "Broccoli", "Mushrooms", "Tofu",
+    "Potatoes", "Cucumber", "Avocado", "Lentils", "Pasta", "Butter", "Milk", "Apples",
+]
+
+
+# ---------- stats ----------
+def _pct(xs, q):
+    xs = sorted(xs)
+    if not xs:
+        return 0.0
+    i = q * (len(xs) - 1)
+    lo = int(i)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (i - lo)
+
+
+def _summary(name, kind, samples_s, ops, wall_s, peak_bytes, **extra):
+    out = {
+        "name": name,
+        "kind": kind,
+        "p50_ms": round(_pct(samples_s, 0.50) * 1e3, 6),
+        "p95_ms": round(_pct(samples_s, 0.95) * 1e3, 6),
+        "p99_ms": round(_pct(samples_s, 0.99) * 1e3, 6),
+        "ops_per_s": round(ops / wall_s, 1) if wall_s > 0 else None,
+        "peak_kb": round(peak_bytes / 1024, 1),
+    }
+    out.update(extra)
+    return out
+
+
+# ---------- micro ----------
+def _micro(name, fn, samples, inner):
+    """`samples` timings, each the mean of `inner` back-to-back calls (keeps timer noise out)."""
+    fn()  # warm caches/indexes
+    tracemalloc.start()
+    times, t_all = [], time.perf_counter()
+    for _ in range(samples):
+        t0 = time.perf_counter()
+        for _ in range(inner):
+            fn()
+        times.append((time.perf_counter() - t0) / inner)
+    wall = time.perf_counter() - t_all
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _summary(name, "micro", times, samples * inner, wall, peak)
+
+
+def _recipes_payload(n_recipes, n_ingredients, seed=0):
+    rng = random.Random(seed)
+    pool = PANTRY + ["Bacon", "Shrimp", "Saffron", "Truffle", "salt", "olive oil"]
+    return json.dumps({"recipes": [
+        {"name": f"Recipe {i}", "ingredients": rng.sample(pool, n_ingredients), "estimated_calories": 400}
+        for i in range(n_recipes)
+    ]})
+
+
+def _corpus(n, seed=0):
+    rng = random.Random(seed)
+    cuisines = ["Italian", "Mexican", "Indian", "Chinese", "American"]
+    return [
+        {"name": f"Recipe {i}", "ingredients": rng.sample(PANTRY, rng.randint(2, 6)),
+         "estimated_calories": rng.randrange(200, 900, 10), "cuisines": [rng.choice(cuisines)],
+         "diets": ["Vegetarian"] if i % 3 == 0 else [], "free_of": ["Nuts"] if i % 2 else []}
+        for i in range(n)
+    ]
+
+
+def micro_benchmarks(samples, inner):
+    with open(SAMPLE, "rb") as f:
+        jpeg = f.read()
+    lines = "Here are the items:\n" + "\n".join(f"{i}. {x}" for i, x in enumerate(PANTRY * 2, 1))
+    items = [x.lower() + "s" for x in PANTRY] + PANTRY
+    payload = _recipes_payload(20, 10)
+    fmt = dict(
+        ingredients_str=", ".join(PANTRY[:12]), calorie_limit=600, cuisines_str="Italian",
+        allergies_str="none", diets_str="none", few_shots=FEW_SHOT_BLOCK,
+    )
+    opts = ImageOptions(max_edge=1024)
+    index = RecipeIndex(_corpus(100_000))
+
+    cases = [
+        ("guess_mime", lambda: guess_mime(jpeg), inner),
+        ("normalize_lines", lambda: _normalize_lines(lines), inner),
+        ("dedup_clamp", lambda: _dedup_clamp(items, 20), inner),
+        ("expand_allowed", lambda: _expand_allowed(PANTRY), inner),
+        ("enforce_allowed_ingredients", lambda: enforce_allowed_ingredients(payload, PANTRY[:14], ["Keto"]),
+         max(1, inner // 10)),
+        ("prompt_template_format", lambda: PROMPT_TEMPLATE.format(**fmt), inner),
+        ("preprocess_image", lambda: preprocess_image(jpeg, opts), 1),
+        ("dietary_check", lambda: compile_rule(["Lactose", "Nuts"], ["Keto"]).violations(PANTRY), inner),
+        ("retrieval_search_100k", lambda: index.search(PANTRY[:14], 600, ["Italian"], ["Nuts"]), max(1, inner // 100)),
+    ]
+    return [_micro(name, fn, samples, n) for name, fn, n in cases]
+
+
+# ---------- end-to-end ----------
+class _Resp:
+    def __init__(self, text):
+        self.text = text
+
+
+class LatencyClient:
+    """Fake model: sleeps latency±jitter, answers vision calls with `n_items` names and
+    recipe calls with three recipes over those names."""
+
+    def __init__(self, latency, jitter, n_items, seed=0):
+        self.latency, self.jitter = latency, jitter
+        self.items = (PANTRY * (n_items // len(PANTRY) + 1))[:n_items]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _sleep(self):
+        with self._lock:
+            d = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, d))
+
+    def generate_content(self, contents, **kwargs):
+        self._sleep()
+        parts = contents[0]["parts"]
+        if any("inline_data" in p for p in parts):
+            return _Resp(json.dumps(self.items))
+        return _Resp(json.dumps({"recipes": [
+            {"name": f"Dish {i}", "ingredients": self.items[i::3] + ["salt"], "estimated_calories": 450}
+            for i in range(3)
+        ]}))
+
+
+def _synthetic_jpeg(edge):
+    from PIL import Image
+    img = Image.effect_noise((edge, edge * 3 // 4), 48).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=92)
+    return buf.getvalue()
+
+
+def _plan(images, client, calorie_limit=700):
+    detected = detect_ingredients_many(images, client, max_items=40).ingredients
+    return suggest_recipes_from_ingredients(client, detected, calorie_limit)
+
+
+def e2e_benchmark(edge, n_items, concurrency, runs, latency, jitter):
+    image = _synthetic_jpeg(edge)
+    client = LatencyClient(latency, jitter, n_items)
+    times, lock = [], threading.Lock()
+
+    def one(_):
+        t0 = time.perf_counter()
+        _plan([image], client)
+        with lock:
+            times.append(time.perf_counter() - t0)
+
+    one(None)  # warm-up (canonical index, PIL plugins)
+    times.clear()
+    tracemalloc.start()
+    t_all = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(runs)))
+    wall = time.perf_counter() - t_all
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _summary(
+        f"plan[edge={edge},items={n_items},conc={concurrency}]", "e2e", times, runs, wall, peak,
+        image_bytes=len(image),
+    )
+
+
+# ---------- baseline ----------
+def compare(results, baseline, tolerance):
+    """Results slower than baseline by more than `tolerance` (fraction)."""
+    base = {r["name"]: r for r in baseline.get("results", [])}
+    out = []
+    for r in results:
+        b = base.get(r["name"])
+        if b is None:
+            continue
+        metric = "p50_ms" if r["kind"] == "micro" else "p95_ms"
+        if b[metric] > 0 and r[metric] > b[metric] * (1 + tolerance):
+            out.append({
+                "name": r["name"], "metric": metric, "baseline": b[metric], "current": r[metric],
+                "slowdown": round(r[metric] / b[metric], 2),
+            })
+    return out
+
+
+def _ints(s):
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--quick", action="store_true", help="Small matrix / few samples (CI smoke run)")
+    ap.add_argument("--only", choices=["micro", "e2e"], default=None)
+    ap.add_argument("--samples", type=int, default=None, help="Micro-benchmark samples")
+    ap.add_argument("--edges", default=None, help="Comma-separated synthetic image long edges (px)")
+    ap.add_argument("--items", default=None, help="Comma-separated detected-ingredient counts")
+    ap.add_argument("--concurrency", default=None, help="Comma-separated concurrency levels")
+    ap.add_argument("--runs", type=int, default=None, help="Plans per e2e configuration")
+    ap.add_argument("--latency", type=float, default=0.05, help="Fake model latency (s)")
+    ap.add_argument("--jitter", type=float, default=0.01, help="Fake model latency jitter (s)")
+    ap.add_argument("--baseline", default=None, help="Compare against this saved result file")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    ap.add_argument("--save-baseline", default=None, help="Write results to this file")
+    args = ap.parse_args()
+
+    q = args.quick
+    samples = args.samples or (15 if q else 50)
+    edges = _ints(args.edges) if args.edges else ([800, 2400] if q else [640, 1600, 4000])
+    items = _ints(args.items) if args.items else ([8] if q else [5, 20, 40])
+    conc = _ints(args.concurrency) if args.concurrency else ([1, 8] if q else [1, 4, 16])
+    runs = args.runs or (16 if q else 64)
+
+    results = []
+    if args.only in (None, "micro"):
+        results += micro_benchmarks(samples, inner=50 if q else 200)
+    if args.only in (None, "e2e"):
+        for e in edges:
+            for n in items:
+                for c in conc:
+                    results.append(e2e_benchmark(e, n, c, runs, args.latency, args.jitter))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "quick": q,
+            "latency_s": args.latency,
+            "jitter_s": args.jitter,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = compare(results, json.load(f), args.tolerance)
+        if report["regressions"]:
+            status = 1
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    if status:
+        for r in report["regressions"]:
+            print(f"REGRESSION {r['name']}: {r['metric']} {r['baseline']} -> {r['current']} "
+                  f"(x{r['slowdown']})", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,7 +1,6 @@
 # src/bitewise/app.py
 from __future__ import annotations
-import json, os, tempfile
-from pathlib import Path
+import json, os
 from typing import Iterable
 
 try:
@@ -15,8 +14,12 @@ except Exception:
         )
         return 1
 else:
-    from .recipes import create_client, suggest_recipes_from_ingredients
-    from .vision  import detect_ingredients
+    from .recipes import create_client, suggest_recipes_offline, suggest_recipes_stream
+    from .vision  import detect_ingredients_many
+    from .cache   import DetectionCache, RecipeCache
+    from .canon   import canonical_id
+    from .policy  import CallPolicy, CircuitBreaker
+    from .scheduler import scheduler_from_env
 
     # ---------- helpers ----------
     def _split_csv(s: str) -> list[str]:
@@ -31,8 +34,9 @@ else:
     def _dedup(seq: Iterable[str]) -> list[str]:
         seen, out = set(), []
         for x in seq:
-            if x and x not in seen:
-                seen.add(x); out.append(x)
+            k = canonical_id(x) if x else ""
+            if x and k not in seen:
+                seen.add(k); out.append(x)
         return out
 
     def _iter_uploads(value):
@@ -59,6 +63,14 @@ else:
     # ---------- UI ----------
     def run() -> int:
         client = create_client()
+        sched = scheduler_from_env()  # BITEWISE_RPM / BITEWISE_TPM
+        if client is not None and sched is not None:
+            client = sched.wrap(client, priority="interactive")
+        # re-clicking Process on the same uploads should not re-run vision
+        det_cache = DetectionCache(maxsize=64)
+        recipe_cache = RecipeCache(maxsize=128)
+        # retries/hedging for slow calls; an unhealthy backend falls back to offline recipes
+        policy = CallPolicy(deadline=45.0, hedge=True, breaker=CircuitBreaker(failure_threshold=3))
 
         # Top description (styled like your shots)
         desc = widgets.HTML(
@@ -145,28 +157,16 @@ else:
             return [c.description for c in checks if c.value]
 
         def _detect_from_uploads() -> list[str]:
-            items: list[str] = []
             if client is None:
                 # Silent: user may be offline; they can still submit manual pantry/custom items
-                return items
-            temp_paths: list[Path] = []
-            try:
-                for name, data in _iter_uploads(up.value) or []:
-                    if not data:
-                        continue
-                    tmp = Path(tempfile.mkstemp(prefix="bw_", suffix=Path(name or "img.jpg").suffix or ".jpg")[1])
-                    temp_paths.append(tmp)
-                    with open(tmp, "wb") as f:
-                        f.write(data)
-                    try:
-                        items.extend(detect_ingredients(str(tmp), client, max_items=20))
-                    except Exception:
-                        pass
-            finally:
-                for p in temp_paths:
-                    try: p.unlink(missing_ok=True)
-                    except Exception: pass
-            return _dedup(items)
+                return []
+            blobs = [bytes(data) for _, data in _iter_uploads(up.value) or [] if data]
+            if not blobs:
+                return []
+            # fridge + pantry + freezer shots go out as one packed request
+            res = detect_ingredients_many(blobs, client, max_items=20, cache=det_cache, pack=True,
+                                         policy=policy)
+            return _dedup(res.ingredients)
 
         def _pretty_json(s: str) -> str:
             try:
@@ -196,11 +196,6 @@ else:
             allergies = _dedup(_selected_labels(allergy_checks) + _split_csv(allergy_other.value)) or None
             diets     = _dedup(_selected_labels(diet_checks) + _split_csv(diet_other.value)) or None
 
-            # Call suggester (online if key present, else offline fallback)
-            result = suggest_recipes_from_ingredients(
-                client, ingredients, cal.value, cuisines, allergies, diets
-            )
-
             # Summary card (exactly one block above JSON)
             summary = widgets.HTML(
                 "<div style='font-family:ui-sans-serif,system-ui;"
@@ -212,9 +207,28 @@ else:
                 f"<div style='margin-top:6px'><b>Calories:</b> {cal.value}</div>"
                 "</div>"
             )
-            print(_pretty_json(result))
             display(summary)
 
+            # Instant matches from the local recipe library while the model works
+            if client is not None and ingredients:
+                quick = json.loads(suggest_recipes_offline(ingredients, cal.value, cuisines, allergies, diets))
+                if quick["recipes"]:
+                    print("Quick picks from the recipe library:")
+                    print(json.dumps(quick, ensure_ascii=False, indent=2))
+                    print("Tailored suggestions:")
+
+            # Stream recipes into the output as each one is generated and guarded
+            # (online if key present, else offline fallback)
+            n = 0
+            for recipe in suggest_recipes_stream(
+                client, ingredients, cal.value, cuisines, allergies, diets,
+                cache=recipe_cache, policy=policy,
+            ):
+                n += 1
+                print(json.dumps(recipe, ensure_ascii=False, indent=2))
+            if n == 0:
+                print(_pretty_json(json.dumps({"recipes": []})))
+
         btn.on_click(_on_process)
 
         # Layout (matches your clean, single-column flow)
@@ -0,0 +1,224 @@
+# src/bitewise/backends.py
+"""
+Pluggable model backends behind `recipes.create_client`.
+
+Anything with `generate_content(contents, **kw)` / `generate_content_async(...)`
+returning objects with `.text` works as a client. Besides the live Gemini model:
+
+- RecordingClient: wraps a client and writes (request fingerprint -> response) to disk
+- ReplayClient:    serves those recordings back, offline, with synthetic latency,
+                   jitter and error injection for repeatable performance runs
+
+Select with `create_client(backend="record:DIR" | "replay:DIR?latency=0.3&jitter=0.1")`
+or the BITEWISE_BACKEND environment variable.
+"""
+from __future__ import annotations
+from dataclasses import fields, is_dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Iterator, Optional, Protocol
+from urllib.parse import parse_qs, urlsplit
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+
+class ModelBackend(Protocol):
+    def generate_content(self, contents, **kwargs) -> Any: ...
+    async def generate_content_async(self, contents, **kwargs) -> Any: ...
+
+
+class ReplayMiss(LookupError):
+    """No recording matches the request fingerprint."""
+
+
+class InjectedError(ConnectionError):
+    """Synthetic transient failure raised by ReplayClient(error_rate=...)."""
+
+
+# request fields that don't change the answer
+_IGNORED_KWARGS = {"request_options", "stream"}
+
+
+def _canon(obj: Any) -> Any:
+    """JSON-able, order-stable view of a request (bytes/images become hashes)."""
+    if isinstance(obj, (str, int, float, bool)) or obj is None:
+        return obj
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return {"sha256": hashlib.sha256(bytes(obj)).hexdigest()}
+    if isinstance(obj, dict):
+        return {str(k): _canon(v) for k, v in sorted(obj.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(obj, (list, tuple)):
+        return [_canon(x) for x in obj]
+    if isinstance(obj, type):
+        return f"{obj.__module__}.{obj.__qualname__}"
+    if is_dataclass(obj):
+        return {f.name: _canon(getattr(obj, f.name)) for f in fields(obj)}
+    if hasattr(obj, "tobytes") and hasattr(obj, "size"):  # PIL image
+        return {"image_sha256": hashlib.sha256(obj.tobytes()).hexdigest(), "size": list(obj.size)}
+    return repr(obj)
+
+
+def fingerprint(contents, **kwargs) -> str:
+    """Stable hash of a generate_content request."""
+    req = {
+        "contents": _canon(contents),
+        "kwargs": _canon({k: v for k, v in kwargs.items() if k not in _IGNORED_KWARGS}),
+    }
+    return hashlib.sha256(json.dumps(req, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _usage(resp) -> Optional[dict]:
+    u = getattr(resp, "usage_metadata", None)
+    if u is None:
+        return None
+    keys = ("prompt_token_count", "candidates_token_count", "total_token_count")
+    return {k: int(getattr(u, k, 0) or 0) for k in keys}
+
+
+def _response(text: str, usage: Optional[dict]) -> SimpleNamespace:
+    return SimpleNamespace(text=text, usage_metadata=SimpleNamespace(**usage) if usage else None)
+
+
+class RecordingClient:
+    """Pass-through client that saves every response under `path/<fingerprint>.json`."""
+
+    def __init__(self, inner, path: str):
+        self.inner = inner
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def _save(self, fp: str, text: str, usage: Optional[dict]) -> None:
+        rec = {"fingerprint": fp, "text": text, "usage": usage}
+        tmp = self.path / f"{fp}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp.write_text(json.dumps(rec, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path / f"{fp}.json")
+        with self._lock:
+            self.recorded += 1
+
+    def _stream(self, fp: str, chunks) -> Iterator[Any]:
+        parts, usage = [], None
+        for ch in chunks:
+            parts.append(getattr(ch, "text", "") or "")
+            usage = _usage(ch) or usage
+            yield ch
+        self._save(fp, "".join(parts), usage)
+
+    def generate_content(self, contents, **kwargs):
+        fp = fingerprint(contents, **kwargs)
+        resp = self.inner.generate_content(contents, **kwargs)
+        if kwargs.get("stream"):
+            return self._stream(fp, resp)
+        self._save(fp, getattr(resp, "text", "") or "", _usage(resp))
+        return resp
+
+    async def generate_content_async(self, contents, **kwargs):
+        fp = fingerprint(contents, **kwargs)
+        resp = await self.inner.generate_content_async(contents, **kwargs)
+        self._save(fp, getattr(resp, "text", "") or "", _usage(resp))
+        return resp
+
+
+class ReplayClient:
+    """
+    Serves recordings made by RecordingClient; no network.
+
+    latency/jitter: seconds added per call, uniform in [latency - jitter, latency + jitter]
+    error_rate:     probability of raising InjectedError (a retryable ConnectionError)
+    chunk_size:     characters per chunk when the caller asks for stream=True
+    """
+
+    def __init__(
+        self,
+        path: str,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        chunk_size: int = 64,
+        seed: Optional[int] = None,
+    ):
+        self.path = Path(path)
+        self.latency, self.jitter, self.error_rate = latency, jitter, error_rate
+        self.chunk_size = max(1, int(chunk_size))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._records = {}
+        for p in self.path.glob("*.json"):
+            rec = json.loads(p.read_text(encoding="utf-8"))
+            self._records[rec["fingerprint"]] = rec
+        self.calls = self.misses = self.injected = 0
+
+    def _delay(self) -> float:
+        with self._lock:
+            self.calls += 1
+            d = self.latency + (self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if fail:
+                self.injected += 1
+        if fail:
+            raise InjectedError("Injected transient backend error")
+        return max(0.0, d)
+
+    def _lookup(self, contents, kwargs) -> dict:
+        fp = fingerprint(contents, **kwargs)
+        rec = self._records.get(fp)
+        if rec is None:
+            with self._lock:
+                self.misses += 1
+            raise ReplayMiss(f"No recording for request {fp[:12]} in {self.path}")
+        return rec
+
+    def _chunks(self, rec: dict) -> Iterator[SimpleNamespace]:
+        text = rec["text"]
+        for i in range(0, max(len(text), 1), self.chunk_size):
+            yield _response(text[i:i + self.chunk_size], rec.get("usage"))
+
+    def generate_content(self, contents, **kwargs):
+        rec = self._lookup(contents, kwargs)
+        time.sleep(self._delay())
+        if kwargs.get("stream"):
+            return self._chunks(rec)
+        return _response(rec["text"], rec.get("usage"))
+
+    async def generate_content_async(self, contents, **kwargs):
+        rec = self._lookup(contents, kwargs)
+        await asyncio.sleep(self._delay())
+        return _response(rec["text"], rec.get("usage"))
+
+
+def parse_backend(spec: str):
+    """'record:DIR' / 'replay:DIR?latency=..' -> (kind, path, options)."""
+    kind, _, rest = spec.partition(":")
+    parts = urlsplit(rest)
+    path = parts.path or rest
+    opts = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+    return kind.strip().lower(), path, opts
+
+
+def make_backend(spec: str, live_factory):
+    """
+    Build a client for `spec`. `live_factory()` returns the real model client
+    (or None without an API key); only 'live' and 'record' call it.
+    """
+    kind, path, opts = parse_backend(spec)
+    if kind in ("", "live"):
+        return live_factory()
+    if kind == "replay":
+        return ReplayClient(
+            path,
+            latency=float(opts.get("latency", 0)),
+            jitter=float(opts.get("jitter", 0)),
+            error_rate=float(opts.get("error_rate", 0)),
+            chunk_size=int(opts.get("chunk_size", 64)),
+            seed=int(opts["seed"]) if "seed" in opts else None,
+        )
+    if kind == "record":
+        inner = live_factory()
+        return RecordingClient(inner, path) if inner is not None else None
+    raise ValueError(f"Unknown backend {spec!r}; use live, record:DIR or replay:DIR")
@@ -0,0 +1,218 @@
+# src/bitewise/batch.py
+"""
+Bulk mode behind `bitewise batch`: many detect/suggest/plan jobs in one process,
+on one shared client and cache, with bounded concurrency.
+
+Sources:
+- a directory: every image in it (recursively) becomes a detect or plan job
+- a JSONL file, one job per line:
+    {"id": "a1", "type": "plan", "images": ["fridge.jpg"], "calories": 600, "diets": ["Vegan"]}
+    {"type": "suggest", "ingredients": ["rice", "eggs"], "calories": 500}
+  relative image paths are resolved against the JSONL file's directory.
+
+Results are written as JSON lines in completion order. With a checkpoint file,
+ids of finished jobs are appended as they complete and skipped on the next run,
+so an interrupted run resumes where it stopped (failed jobs are retried).
+"""
+from __future__ import annotations
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, TextIO
+import json
+import os
+import threading
+import time
+
+from .cache import DetectionCache, RecipeCache
+from .imaging import ImageOptions
+from .policy import CallPolicy
+from .recipes import suggest_recipes_from_ingredients
+from .vision import detect_ingredients_many
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+JOB_TYPES = ("detect", "suggest", "plan")
+
+
+@dataclass
+class BatchJob:
+    id: str
+    type: str
+    images: List[str] = field(default_factory=list)
+    ingredients: List[str] = field(default_factory=list)
+    calories: Optional[int] = None
+    cuisines: Optional[List[str]] = None
+    allergies: Optional[List[str]] = None
+    diets: Optional[List[str]] = None
+    max_items: int = 20
+
+
+def _as_list(v) -> Optional[List[str]]:
+    if v is None:
+        return None
+    if isinstance(v, str):
+        v = v.split(",")
+    out = [str(x).strip() for x in v if str(x).strip()]
+    return out or None
+
+
+def jobs_from_dir(path: str, kind: str = "detect", **defaults) -> Iterator[BatchJob]:
+    """One job per image under `path` (sorted, recursive); id = path relative to `path`."""
+    root = Path(path)
+    for p in sorted(root.rglob("*")):
+        if p.is_file() and p.suffix.lower() in IMAGE_SUFFIXES:
+            yield BatchJob(id=p.relative_to(root).as_posix(), type=kind, images=[str(p)], **defaults)
+
+
+def jobs_from_jsonl(path: str, **defaults) -> Iterator[BatchJob]:
+    """Jobs from a JSONL file; missing fields come from `defaults`, id defaults to the line number."""
+    base = Path(path).parent
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{n}: invalid JSON ({e})") from None
+            kind = str(obj.get("type") or "plan").lower()
+            if kind not in JOB_TYPES:
+                raise ValueError(f"{path}:{n}: unknown job type {kind!r}")
+            images = obj.get("images") or ([obj["image"]] if obj.get("image") else [])
+            opts = dict(defaults)
+            for k in ("cuisines", "allergies", "diets"):
+                if k in obj:
+                    opts[k] = _as_list(obj[k])
+            if "calories" in obj:
+                opts["calories"] = int(obj["calories"])
+            if "max_items" in obj:
+                opts["max_items"] = int(obj["max_items"])
+            yield BatchJob(
+                id=str(obj.get("id") or n),
+                type=kind,
+                images=[str(base / p) if not os.path.isabs(p) else p for p in images],
+                ingredients=_as_list(obj.get("ingredients")) or [],
+                **opts,
+            )
+
+
+def load_jobs(source: str, kind: str = "detect", **defaults) -> Iterator[BatchJob]:
+    """Directory -> jobs_from_dir, anything else -> jobs_from_jsonl."""
+    if os.path.isdir(source):
+        return jobs_from_dir(source, kind, **defaults)
+    return jobs_from_jsonl(source, **defaults)
+
+
+def read_checkpoint(path: Optional[str]) -> set:
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+class BatchRunner:
+    """
+    Runs jobs on a thread pool sharing one client, detection/recipe caches and
+    call policy. At most `max_workers * 2` jobs are in flight, so a job file with
+    thousands of lines is consumed lazily.
+    """
+
+    def __init__(
+        self,
+        client,
+        max_workers: int = 8,
+        detection_cache: Optional[DetectionCache] = None,
+        recipe_cache: Optional[RecipeCache] = None,
+        image_options: Optional[ImageOptions] = None,
+        policy: Optional[CallPolicy] = None,
+    ):
+        self.client = client
+        self.max_workers = max(1, int(max_workers))
+        self.detection_cache = detection_cache if detection_cache is not None else DetectionCache()
+        self.recipe_cache = recipe_cache if recipe_cache is not None else RecipeCache()
+        self.image_options = image_options
+        self.policy = policy
+
+    def _detect(self, job: BatchJob) -> List[str]:
+        res = detect_ingredients_many(
+            job.images, self.client, max_items=job.max_items, max_workers=1,
+            cache=self.detection_cache, image_options=self.image_options, policy=self.policy,
+        )
+        if res.errors and all(e is not None for e in res.errors):
+            raise res.errors[0]
+        return res.ingredients
+
+    def _suggest(self, job: BatchJob, ingredients: List[str]) -> dict:
+        if job.calories is None:
+            raise ValueError("calories is required for suggest/plan jobs")
+        out = suggest_recipes_from_ingredients(
+            self.client, ingredients, job.calories, job.cuisines, job.allergies, job.diets,
+            cache=self.recipe_cache, policy=self.policy,
+        )
+        return json.loads(out)
+
+    def run_job(self, job: BatchJob) -> dict:
+        """Result record for one job; errors are captured, never raised."""
+        t0 = time.perf_counter()
+        rec = {"id": job.id, "type": job.type}
+        try:
+            if job.type == "detect":
+                rec["ingredients"] = self._detect(job)
+            elif job.type == "suggest":
+                rec.update(self._suggest(job, job.ingredients))
+            else:
+                rec["ingredients"] = self._detect(job) if job.images else job.ingredients
+                rec.update(self._suggest(job, rec["ingredients"]))
+            rec["ok"] = True
+        except Exception as e:
+            rec["ok"], rec["error"] = False, f"{type(e).__name__}: {e}"
+        rec["seconds"] = round(time.perf_counter() - t0, 3)
+        return rec
+
+    def run(
+        self,
+        jobs: Iterable[BatchJob],
+        out: TextIO,
+        checkpoint: Optional[str] = None,
+        on_result: Optional[Callable[[dict], None]] = None,
+    ) -> dict:
+        """Write one JSON line per finished job to `out`; returns run totals."""
+        done_ids = read_checkpoint(checkpoint)
+        ck = open(checkpoint, "a", encoding="utf-8") if checkpoint else None
+        lock = threading.Lock()
+        totals = {"ok": 0, "failed": 0, "skipped": 0}
+        t0 = time.perf_counter()
+
+        def _emit(rec: dict) -> None:
+            with lock:
+                out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                out.flush()
+                totals["ok" if rec["ok"] else "failed"] += 1
+                if ck is not None and rec["ok"]:
+                    ck.write(rec["id"] + "\n")
+                    ck.flush()
+            if on_result is not None:
+                on_result(rec)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bw-batch") as pool:
+                pending = set()
+                for job in jobs:
+                    if job.id in done_ids:
+                        totals["skipped"] += 1
+                        continue
+                    pending.add(pool.submit(self.run_job, job))
+                    finished = {f for f in pending if f.done()}
+                    if len(pending) >= self.max_workers * 2 and not finished:
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in finished:
+                        pending.discard(f)
+                        _emit(f.result())
+                for f in as_completed(pending):
+                    _emit(f.result())
+        finally:
+            if ck is not None:
+                ck.close()
+        totals["seconds"] = round(time.perf_counter() - t0, 3)
+        return totals
@@ -0,0 +1,277 @@
+# src/bitewise/cache.py
+"""Result caches for model calls: content-addressed detections, subset-aware recipes."""
+from __future__ import annotations
+import hashlib, json, os, threading, time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+
+def _sha256(*chunks: bytes) -> str:
+    h = hashlib.sha256()
+    for c in chunks:
+        h.update(len(c).to_bytes(8, "big"))
+        h.update(c)
+    return h.hexdigest()
+
+
+class DetectionCache:
+    """
+    Cache for `vision.detect_ingredients` keyed by sha256(image bytes + prompt + max_items).
+
+    - memory tier: LRU with at most `maxsize` entries
+    - disk tier (optional): one small JSON file per key under `disk_dir`,
+      evicted oldest-first (down to 90%) once the directory grows past `disk_max_bytes`;
+      the directory size is tracked in memory, so only an eviction walks the directory
+    - `ttl` (seconds) applies to both tiers; None = never expire
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 64 * 1024 * 1024,
+        ttl: Optional[float] = None,
+    ):
+        self.maxsize = max(0, int(maxsize))
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = int(disk_max_bytes)
+        self.ttl = ttl
+        self._mem: "OrderedDict[str, tuple[float, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.disk_hits = 0
+        self._disk_bytes: Optional[int] = None  # seeded by the first write's directory scan
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(image_bytes: bytes, prompt: str, max_items: int, variant: str = "") -> str:
+        """`variant` distinguishes request shapes for the same image (e.g. preprocessing options)."""
+        return _sha256(
+            image_bytes, prompt.encode("utf-8"), str(int(max_items)).encode(), variant.encode("utf-8")
+        )
+
+    def _expired(self, ts: float) -> bool:
+        return self.ttl is not None and (time.time() - ts) > self.ttl
+
+    def _path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    # ---------- lookup ----------
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                ts, items = hit
+                if not self._expired(ts):
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return list(items)
+                del self._mem[key]
+
+        items = self._disk_get(key)
+        with self._lock:
+            if items is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._mem_put(key, items)
+        return list(items)
+
+    def _disk_get(self, key: str) -> Optional[List[str]]:
+        if not self.disk_dir:
+            return None
+        p = self._path(key)
+        try:
+            st = p.stat()
+            if self._expired(st.st_mtime):
+                p.unlink(missing_ok=True)
+                self._disk_grew(-st.st_size)
+                return None
+            data = json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return [str(x) for x in data] if isinstance(data, list) else None
+
+    # ---------- store ----------
+    def put(self, key: str, items: List[str]) -> None:
+        items = list(items)
+        with self._lock:
+            self._mem_put(key, items)
+        if self.disk_dir:
+            p = self._path(key)
+            data = json.dumps(items, ensure_ascii=False).encode("utf-8")
+            try:
+                p.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    old = p.stat().st_size
+                except FileNotFoundError:
+                    old = 0
+                tmp = p.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, p)
+            except OSError:
+                return
+            if self._disk_grew(len(data) - old):
+                self._disk_evict()
+
+    def _mem_put(self, key: str, items: List[str]) -> None:
+        if self.maxsize == 0:
+            return
+        self._mem[key] = (time.time(), items)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.maxsize:
+            self._mem.popitem(last=False)
+
+    def _disk_grew(self, delta: int) -> bool:
+        """Account `delta` bytes; True when the directory needs an eviction pass (or was never scanned)."""
+        with self._lock:
+            if self._disk_bytes is None:
+                return True
+            self._disk_bytes = max(0, self._disk_bytes + delta)
+            return self._disk_bytes > self.disk_max_bytes
+
+    def _disk_evict(self) -> None:
+        """Walk the directory: drop expired files, then the oldest down to 90% of the budget."""
+        entries, total = [], 0
+        for p in self.disk_dir.glob("*/*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            if self._expired(st.st_mtime):
+                p.unlink(missing_ok=True)
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+        if total > self.disk_max_bytes:
+            low_water = self.disk_max_bytes * 0.9  # headroom, so the next puts don't walk again
+            for _, size, p in sorted(entries):
+                p.unlink(missing_ok=True)
+                total -= size
+                if total <= low_water:
+                    break
+        with self._lock:
+            self._disk_bytes = total
+
+    # ---------- introspection ----------
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "memory_entries": len(self._mem),
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self.hits = self.misses = self.disk_hits = 0
+        self._disk_bytes: Optional[int] = None  # seeded by the first write's directory scan
+        if self.disk_dir:
+            for p in self.disk_dir.glob("*/*.json"):
+                p.unlink(missing_ok=True)
+
+
+# diets that change the guard's allowed extras (recipes.ALLOWED_EXTRAS_KETO): a
+# stricter diet set is only reusable when these match exactly
+_EXTRAS_DIETS = frozenset({"keto"})
+
+
+class RecipeCache:
+    """
+    Cache for `recipes.suggest_recipes_from_ingredients` results (guarded JSON text).
+
+    Keys are normalized ingredient/constraint sets (the caller maps ingredients
+    to canon.canonical_id and constraints through recipes._norm). Besides exact hits, a cached answer is reused when it is
+    *compatible* with the new request:
+
+    - its ingredient set is a subset of the requested one (covering at least
+      `min_subset_coverage` of it, so a 10-item pantry isn't answered from 1 item)
+    - its calorie limit is <= the requested limit
+    - same cuisines; its allergies/diets are a superset (at least as strict)
+
+    LRU eviction at `maxsize` entries, optional `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: Optional[float] = None, min_subset_coverage: float = 0.6):
+        self.maxsize = max(0, int(maxsize))
+        self.ttl = ttl
+        self.min_subset_coverage = float(min_subset_coverage)
+        # key -> (ts, text); key = (ingredients, calorie_limit, cuisines, allergies, diets)
+        self._entries: "OrderedDict[tuple, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = self.subset_hits = self.misses = 0
+
+    @staticmethod
+    def key(ingredients, calorie_limit: int, cuisines=(), allergies=(), diets=()) -> tuple:
+        return (
+            frozenset(ingredients), int(calorie_limit),
+            frozenset(cuisines or ()), frozenset(allergies or ()), frozenset(diets or ()),
+        )
+
+    def _expired(self, ts: float) -> bool:
+        return self.ttl is not None and (time.time() - ts) > self.ttl
+
+    def _compatible(self, cached: tuple, want: tuple) -> bool:
+        ing, cal, cui, alg, dts = cached
+        w_ing, w_cal, w_cui, w_alg, w_dts = want
+        return (
+            cal <= w_cal and cui == w_cui and alg >= w_alg and dts >= w_dts
+            and dts & _EXTRAS_DIETS == w_dts & _EXTRAS_DIETS  # same allowed extras (Keto adds butter...)
+            and ing <= w_ing and len(ing) >= self.min_subset_coverage * len(w_ing)
+        )
+
+    def get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None and not self._expired(hit[0]):
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return hit[1]
+
+            best, best_rank = None, None
+            for k, (ts, text) in list(self._entries.items()):
+                if self._expired(ts):
+                    del self._entries[k]
+                    continue
+                if self._compatible(k, key):
+                    rank = (len(k[0]), k[1])  # widest pantry coverage, then closest calorie limit
+                    if best_rank is None or rank > best_rank:
+                        best, best_rank = k, rank
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.subset_hits += 1
+            return self._entries[best][1]
+
+    def put(self, key: tuple, text: str) -> None:
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time(), text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.exact_hits + self.subset_hits
+            lookups = hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "subset_hits": self.subset_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.exact_hits = self.subset_hits = self.misses = 0
@@ -0,0 +1,160 @@
+# src/bitewise/canon.py
+"""
+Ingredient canonicalization: map any ingredient string to a canonical ID.
+
+"Tomatoes", "tomato (diced)", "canned tuna in water" / "tuna", "garbanzo beans" /
+"chickpeas" all collapse to one ID. The lookup tables are compiled into a token
+trie on first use; each lookup is a single left-to-right pass over the words.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import re
+import threading
+
+# words dropped anywhere in a name (preparation/state/packaging, not identity)
+MODIFIERS = {
+    "canned", "tinned", "jarred", "fresh", "frozen", "dried", "dry", "raw", "cooked",
+    "chopped", "diced", "sliced", "minced", "grated", "shredded", "crushed", "cubed",
+    "mashed", "peeled", "trimmed", "halved", "quartered", "spiralized", "rinsed", "drained",
+    "boneless", "skinless", "organic", "large", "small", "medium", "ripe", "whole",
+    "lean", "ground", "leftover", "plain", "unsalted", "salted", "unsweetened",
+    "low-fat", "lowfat", "light", "extra", "virgin", "a", "an", "the", "some", "of",
+    "cup", "cups", "tbsp", "tsp", "can", "cans", "pack", "packet", "bunch", "handful",
+    "florets", "floret",
+}
+
+# trailing phrases dropped from the end of a name
+TRAILING = (
+    ("in", "water"), ("in", "oil"), ("in", "brine"), ("in", "olive", "oil"),
+    ("to", "taste"), ("for", "garnish"), ("optional",),
+)
+
+IRREGULAR_PLURALS = {
+    "leaves": "leaf", "loaves": "loaf", "halves": "half", "knives": "knife",
+    "geese": "goose", "mice": "mouse", "teeth": "tooth", "feet": "foot",
+    "chillies": "chili", "chilies": "chili", "chiles": "chili", "chilli": "chili", "chile": "chili",
+    "cacti": "cactus", "fungi": "fungus",
+}
+
+# words that end in "s" but are not plurals
+NON_PLURALS = {
+    "hummus", "asparagus", "couscous", "molasses", "swiss", "citrus", "octopus",
+    "grits", "brussels", "series", "species", "haggis",
+}
+
+# regional/alternative names -> canonical name (matched after singularization)
+SYNONYMS = {
+    "scallion": "green onion", "spring onion": "green onion",
+    "coriander": "cilantro", "coriander leaf": "cilantro",
+    "garbanzo": "chickpea", "garbanzo bean": "chickpea", "chick pea": "chickpea",
+    "aubergine": "eggplant", "courgette": "zucchini", "capsicum": "bell pepper",
+    "red bell pepper": "bell pepper", "green bell pepper": "bell pepper",
+    "yellow bell pepper": "bell pepper",
+    "prawn": "shrimp", "king prawn": "shrimp", "yoghurt": "yogurt",
+    "mayo": "mayonnaise", "tuna fish": "tuna", "chicken egg": "egg",
+    "spaghetti": "pasta", "penne": "pasta", "macaroni": "pasta", "fusilli": "pasta",
+    "beef mince": "beef", "mince": "beef", "rocket": "arugula",
+    "cornflour": "cornstarch", "corn starch": "cornstarch",
+    "icing sugar": "powdered sugar", "confectioners sugar": "powdered sugar",
+    "soya sauce": "soy sauce", "shoyu": "soy sauce", "tamari": "soy sauce",
+    "gluten free soy sauce": "soy sauce", "gluten-free soy sauce": "soy sauce",
+    "double cream": "heavy cream", "whipping cream": "heavy cream",
+    "cheddar cheese": "cheddar", "parmesan cheese": "parmesan", "feta cheese": "feta",
+    "mozzarella cheese": "mozzarella", "evoo": "olive oil",
+}
+
+_SPLIT = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+_PAREN = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+
+
+def _singular(w: str) -> str:
+    if w in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[w]
+    if w in NON_PLURALS or len(w) <= 3:
+        return w
+    if w.endswith("ies"):
+        return w[:-3] + "y"                      # berries -> berry
+    if w.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return w[:-2]                            # radishes -> radish
+    if w.endswith("oes"):
+        return w[:-2]                            # (regular) -oes -> -o
+    if w.endswith("s") and not w.endswith(("ss", "us", "is")):
+        return w[:-1]                            # sausages -> sausage
+    return w
+
+
+class _Trie:
+    """Token trie for longest-match phrase replacement."""
+    __slots__ = ("root",)
+
+    def __init__(self, phrases: Dict[Tuple[str, ...], str]):
+        self.root: dict = {}
+        for toks, target in phrases.items():
+            node = self.root
+            for t in toks:
+                node = node.setdefault(t, {})
+            node[None] = target
+
+    def rewrite(self, toks: List[str]) -> List[str]:
+        out, i, n = [], 0, len(toks)
+        while i < n:
+            node, j, hit, hit_end = self.root, i, None, i
+            while j < n and toks[j] in node:
+                node = node[toks[j]]
+                j += 1
+                if None in node:
+                    hit, hit_end = node[None], j
+            if hit is None:
+                out.append(toks[i])
+                i += 1
+            else:
+                out.extend(hit.split())
+                i = hit_end
+        return out
+
+
+class CanonIndex:
+    """Compiled lookup tables; use `canonical_id` rather than building one directly."""
+
+    def __init__(self):
+        self.modifiers = frozenset(MODIFIERS)
+        self.trailing = sorted(TRAILING, key=len, reverse=True)
+        phrases = {}
+        for src, dst in SYNONYMS.items():
+            toks = tuple(_singular(t) for t in _SPLIT.findall(src))
+            phrases[toks] = " ".join(_singular(t) for t in _SPLIT.findall(dst))
+        self.synonyms = _Trie(phrases)
+
+    def canonical(self, name: str) -> str:
+        s = _PAREN.sub(" ", (name or "").lower())
+        toks = _SPLIT.findall(s)
+        for tail in self.trailing:
+            k = len(tail)
+            if len(toks) > k and tuple(toks[-k:]) == tail:
+                toks = toks[:-k]
+                break
+        kept = [t for t in toks if t not in self.modifiers]
+        toks = [_singular(t) for t in (kept or toks)]
+        toks = self.synonyms.rewrite(toks)
+        return " ".join(toks)
+
+
+_INDEX: Optional[CanonIndex] = None
+_LOCK = threading.Lock()
+
+
+def get_index() -> CanonIndex:
+    """Build the index on first use (thread-safe), then reuse it."""
+    global _INDEX
+    if _INDEX is None:
+        with _LOCK:
+            if _INDEX is None:
+                _INDEX = CanonIndex()
+    return _INDEX
+
+
+@lru_cache(maxsize=8192)
+def canonical_id(name: str) -> str:
+    """Canonical ingredient ID for `name` ("Canned Tuna in Water" -> "tuna")."""
+    return get_index().canonical(name)
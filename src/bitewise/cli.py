@@ -1,16 +1,13 @@
 # Minimal CLI for BiteWise
+# Package modules are imported inside the commands that use them, so `--version`,
+# `--help` and argument errors never pay for the SDK/PIL/asyncio imports.
+from __future__ import annotations
 import argparse
+import os
 import sys
 import json
 from importlib.metadata import version, PackageNotFoundError
 
-from .recipes import (
-    create_client,
-    suggest_recipes_from_ingredients,
-)
-
-from .vision import detect_ingredients as _detect_from_image
-
 # -------- helpers --------
 def _split_csv(s: str):
     return [x.strip() for x in s.split(",") if x.strip()]
@@ -18,6 +15,131 @@ def _split_csv(s: str):
 def _print_json(obj):
     print(json.dumps(obj, ensure_ascii=False, indent=2))
 
+def _add_image_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--max-edge", type=int, default=1536,
+                   help="Downscale so the longest side is at most this many px (0 = keep size)")
+    p.add_argument("--quality", type=int, default=85, help="JPEG/WebP quality for the upload")
+    p.add_argument("--image-format", choices=["jpeg", "webp"], default="jpeg", help="Upload encoding")
+    p.add_argument("--raw-image", action="store_true", help="Send original bytes (no preprocessing)")
+
+def _add_detect_args(p: argparse.ArgumentParser) -> None:
+    """Flags read by _detect_from_images (detect, plan)."""
+    p.add_argument("--sizes", action="store_true", help="Report payload sizes before/after preprocessing")
+    p.add_argument("--pack", action="store_true",
+                   help="Send several images per model request instead of one request per image")
+
+def _add_policy_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--timeout", type=float, default=60.0, help="End-to-end seconds per model call (retries included)")
+    p.add_argument("--retries", type=int, default=3, help="Retries on transient errors (429/5xx/timeouts)")
+    p.add_argument("--hedge-after", type=float, default=None,
+                   help="Send a duplicate request if the first is slower than this many seconds")
+    p.add_argument("--rpm", type=float, default=None,
+                   help="Model requests-per-minute quota to stay under (env: BITEWISE_RPM)")
+    p.add_argument("--tpm", type=float, default=None,
+                   help="Model tokens-per-minute quota to stay under (env: BITEWISE_TPM)")
+
+def _policy(args):
+    from .policy import CallPolicy, CircuitBreaker
+    return CallPolicy(
+        deadline=args.timeout,
+        max_attempts=args.retries + 1,
+        hedge=args.hedge_after is not None,
+        hedge_after=args.hedge_after,
+        breaker=CircuitBreaker(),
+    )
+
+def _install_metrics(args) -> None:
+    from .instrument import JsonLinesSink, MultiSink, PrometheusSink, set_sink
+    sinks = []
+    if args.metrics:
+        sinks.append(JsonLinesSink(sys.stderr if args.metrics == "-" else args.metrics))
+    if args.metrics_prom:
+        sinks.append(PrometheusSink(args.metrics_prom))
+    if sinks:
+        set_sink(sinks[0] if len(sinks) == 1 else MultiSink(*sinks))
+
+def _image_options(args):
+    from .imaging import ImageOptions
+    return ImageOptions(
+        max_edge=args.max_edge or None,
+        format=args.image_format.upper(),
+        quality=args.quality,
+        reencode=not args.raw_image,
+    )
+
+def _human(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024 or unit == "MB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+def _report_sizes(images: list[str], opts) -> None:
+    from .imaging import preprocess_image
+    for path in images:
+        try:
+            with open(path, "rb") as f:
+                prep = preprocess_image(f.read(), opts)
+        except OSError:
+            continue
+        dims = f" ({prep.original_size[0]}x{prep.original_size[1]} -> {prep.size[0]}x{prep.size[1]})" if prep.size else ""
+        print(f"{path}: {_human(prep.original_bytes)} -> {_human(prep.payload_bytes)} {prep.mime}{dims}",
+              file=sys.stderr)
+
+def _detect_from_images(images: list[str], client, args, cache, policy=None) -> list[str]:
+    """Detect over all -i images concurrently; report per-image failures on stderr."""
+    from .vision import detect_ingredients_many
+    opts = _image_options(args)
+    if args.sizes:
+        _report_sizes(images, opts)
+    res = detect_ingredients_many(
+        images, client, max_items=args.max_items, max_workers=args.workers, cache=cache,
+        image_options=opts, pack=args.pack, policy=policy,
+    )
+    for path, err in zip(images, res.errors):
+        if err is not None:
+            print(f"Detection failed for {path}: {err}", file=sys.stderr)
+    if all(e is not None for e in res.errors):
+        raise SystemExit(1)
+    return res.ingredients
+
+
+def _run_batch(args, client, cache, policy) -> int:
+    from .batch import BatchRunner, load_jobs
+    defaults = dict(
+        calories=args.calories,
+        cuisines=_split_csv(args.cuisine) or None,
+        allergies=_split_csv(args.allergy) or None,
+        diets=_split_csv(args.diet) or None,
+        max_items=args.max_items,
+    )
+    runner = BatchRunner(
+        client, max_workers=args.workers, detection_cache=cache,
+        image_options=_image_options(args), policy=policy,
+    )
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    try:
+        totals = runner.run(load_jobs(args.source, args.mode, **defaults), out, checkpoint=args.checkpoint or None)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps(totals), file=sys.stderr)
+    return 1 if totals["failed"] else 0
+
+def _serve(args, client, cache, policy) -> int:
+    import asyncio
+    from .serve import BiteWiseServer
+    server = BiteWiseServer(
+        client, host=args.host, port=args.port, workers=args.workers, queue_size=args.queue,
+        max_items=args.max_items, policy=policy, image_options=_image_options(args), detection_cache=cache,
+        batch_window=args.batch_window,
+    )
+    print(f"BiteWise serving on http://{args.host}:{args.port} "
+          f"({'online' if client is not None else 'offline: suggest uses fallback recipes'})", file=sys.stderr)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
 
 def _pick_from_list(items: list[str]) -> list[str]:
     """
@@ -57,11 +179,25 @@ def main() -> int:
     # version / run
     parser.add_argument("--version", action="store_true", help="Show package version and exit")
     parser.add_argument("--run", action="store_true", help="Launch demo UI (requires Jupyter)")
+    parser.add_argument("--backend", default=None,
+                        help="Model backend: live, record:DIR or replay:DIR[?latency=..&jitter=..&error_rate=..] "
+                             "(env: BITEWISE_BACKEND)")
+    parser.add_argument("--metrics", default=None,
+                        help="Write per-stage timing/token events as JSON lines to this file ('-' = stderr)")
+    parser.add_argument("--metrics-prom", default="",
+                        help="Write aggregated stage metrics to this Prometheus text file")
 
     # detect
     p_detect = sub.add_parser("detect", help="Detect ingredients from an image")
-    p_detect.add_argument("-i", "--image", required=True, help="Path to fridge/pantry image")
+    p_detect.add_argument("-i", "--image", required=True, action="append",
+                          help="Path to fridge/pantry image (repeat -i for several images)")
     p_detect.add_argument("--max-items", type=int, default=20, help="Max ingredients to return")
+    p_detect.add_argument("--workers", type=int, default=4, help="Max concurrent detections")
+    _add_image_args(p_detect)
+    _add_detect_args(p_detect)
+    _add_policy_args(p_detect)
+    p_detect.add_argument("--cache-dir", default=None,
+                          help="Directory for the on-disk detection cache (env: BITEWISE_CACHE_DIR)")
 
     # suggest
     p_suggest = sub.add_parser("suggest", help="Suggest recipes from ingredients")
@@ -70,16 +206,79 @@ def main() -> int:
     p_suggest.add_argument("--cuisine", default="", help="Comma-separated cuisines (optional)")
     p_suggest.add_argument("--allergy", default="", help="Comma-separated allergens to avoid")
     p_suggest.add_argument("--diet", default="", help="Comma-separated diets (Keto, Vegan, etc.)")
+    _add_policy_args(p_suggest)
+    p_suggest.add_argument("--stream", action="store_true",
+                           help="Print each recipe (one JSON object per line) as soon as it is generated")
+
+    # mealplan (N days, one model call)
+    p_meal = sub.add_parser("mealplan", help="Plan several days of recipes from one pantry in a single model call")
+    p_meal.add_argument("--ingredients", required=True, help="Comma-separated list")
+    p_meal.add_argument("--calories", "-c", required=True, type=int, help="Calorie limit per recipe")
+    p_meal.add_argument("--days", type=int, default=7, help="Days to plan (1-14)")
+    p_meal.add_argument("--cuisine", default="", help="Comma-separated cuisines (optional)")
+    p_meal.add_argument("--allergy", default="", help="Comma-separated allergens to avoid")
+    p_meal.add_argument("--diet", default="", help="Comma-separated diets (Keto, Vegan, etc.)")
+    _add_policy_args(p_meal)
+
+    # prompt-stats (no model call)
+    p_stats = sub.add_parser("prompt-stats", help="Report recipe prompt size for a request (no model call)")
+    p_stats.add_argument("--ingredients", required=True, help="Comma-separated list")
+    p_stats.add_argument("--calories", "-c", required=True, type=int, help="Calorie limit")
+    p_stats.add_argument("--cuisine", default="", help="Comma-separated cuisines (optional)")
+    p_stats.add_argument("--allergy", default="", help="Comma-separated allergens to avoid")
+    p_stats.add_argument("--diet", default="", help="Comma-separated diets (Keto, Vegan, etc.)")
+    p_stats.add_argument("--k", type=int, default=None, help="Max few-shot examples")
+    p_stats.add_argument("--budget", type=int, default=None, help="Few-shot token budget")
 
     # plan (detect ➜ optionally pick ➜ suggest)
     p_plan = sub.add_parser("plan", help="Detect from image then (optionally) pick items before suggesting")
-    p_plan.add_argument("-i", "--image", required=True, help="Path to fridge/pantry image")
+    p_plan.add_argument("-i", "--image", required=True, action="append",
+                        help="Path to fridge/pantry image (repeat -i for several images)")
     p_plan.add_argument("--calories", "-c", required=True, type=int, help="Calorie limit")
     p_plan.add_argument("--cuisine", default="", help="Comma-separated cuisines (optional)")
     p_plan.add_argument("--allergy", default="", help="Comma-separated allergens to avoid")
     p_plan.add_argument("--diet", default="", help="Comma-separated diets (Keto, Vegan, etc.)")
     p_plan.add_argument("--max-items", type=int, default=20, help="Max detected ingredients to use")
+    p_plan.add_argument("--workers", type=int, default=4, help="Max concurrent detections")
+    _add_image_args(p_plan)
+    _add_detect_args(p_plan)
+    _add_policy_args(p_plan)
     p_plan.add_argument("--pick", action="store_true", help="Interactively pick from detected items")
+    p_plan.add_argument("--cache-dir", default=None,
+                        help="Directory for the on-disk detection cache (env: BITEWISE_CACHE_DIR)")
+
+    # batch (many jobs, one process/client)
+    p_batch = sub.add_parser("batch", help="Run many detect/suggest/plan jobs from a directory or JSONL file")
+    p_batch.add_argument("source", help="Directory of images, or a JSONL file with one job per line")
+    p_batch.add_argument("--mode", choices=["detect", "plan"], default="detect",
+                         help="Job type for images in a directory")
+    p_batch.add_argument("--calories", "-c", type=int, default=None, help="Default calorie limit for suggest/plan jobs")
+    p_batch.add_argument("--cuisine", default="", help="Default comma-separated cuisines")
+    p_batch.add_argument("--allergy", default="", help="Default comma-separated allergens to avoid")
+    p_batch.add_argument("--diet", default="", help="Default comma-separated diets")
+    p_batch.add_argument("--max-items", type=int, default=20, help="Max detected ingredients per job")
+    p_batch.add_argument("--workers", type=int, default=8, help="Jobs run concurrently")
+    p_batch.add_argument("-o", "--output", default="", help="Append JSON-lines results here (default: stdout)")
+    p_batch.add_argument("--checkpoint", default="",
+                         help="File of finished job ids; finished jobs are skipped when the run is restarted")
+    _add_image_args(p_batch)
+    _add_policy_args(p_batch)
+    p_batch.add_argument("--cache-dir", default=None,
+                         help="Directory for the on-disk detection cache (env: BITEWISE_CACHE_DIR)")
+
+    # serve (long-running HTTP service, warm client)
+    p_serve = sub.add_parser("serve", help="Run the HTTP service (/detect, /suggest, /plan, /healthz, /metrics)")
+    p_serve.add_argument("--host", default="127.0.0.1", help="Bind address")
+    p_serve.add_argument("--port", type=int, default=8080, help="Bind port")
+    p_serve.add_argument("--workers", type=int, default=8, help="Requests processed concurrently")
+    p_serve.add_argument("--queue", type=int, default=64, help="Waiting requests before answering 503")
+    p_serve.add_argument("--max-items", type=int, default=20, help="Default max detected ingredients")
+    p_serve.add_argument("--batch-window", type=float, default=0.0,
+                         help="Pack recipe requests arriving within this many seconds into one model call (0 = off)")
+    _add_image_args(p_serve)
+    _add_policy_args(p_serve)
+    p_serve.add_argument("--cache-dir", default=None,
+                         help="Directory for the on-disk detection cache (env: BITEWISE_CACHE_DIR)")
 
     args = parser.parse_args()
 
@@ -99,28 +298,77 @@ def main() -> int:
             print(f"BiteWise failed to start: {e}", file=sys.stderr)
             return 1
 
+    from .recipes import load_env
+    load_env()  # .env may set GOOGLE_API_KEY / BITEWISE_* before defaults are resolved
+    if args.metrics is None:
+        args.metrics = os.getenv("BITEWISE_METRICS", "")
+    if hasattr(args, "cache_dir") and args.cache_dir is None:
+        args.cache_dir = os.getenv("BITEWISE_CACHE_DIR", "")
+    _install_metrics(args)
+
     # subcommands
-    if args.cmd in {"detect", "suggest", "plan"}:
-        client = create_client()  # needs GOOGLE_API_KEY in env for online mode
+    if args.cmd == "prompt-stats":
+        from .recipes import prompt_stats
+        _print_json(prompt_stats(
+            _split_csv(args.ingredients), args.calories,
+            _split_csv(args.cuisine) or None, _split_csv(args.allergy) or None, _split_csv(args.diet) or None,
+            k=args.k, token_budget=args.budget,
+        ))
+        return 0
+
+    if args.cmd == "mealplan" and not 1 <= args.days <= 14:
+        parser.error("--days must be between 1 and 14")
+
+    if args.cmd in {"detect", "suggest", "mealplan", "plan", "batch", "serve"}:
+        from .recipes import create_client
+        client = create_client(backend=args.backend)  # needs GOOGLE_API_KEY in env for online mode
+        if client is not None:
+            from .scheduler import Scheduler, scheduler_from_env
+            sched = Scheduler(rpm=args.rpm, tpm=args.tpm) if (args.rpm or args.tpm) else scheduler_from_env()
+            if sched is not None:
+                client = sched.wrap(client, "bulk" if args.cmd == "batch" else "interactive")
+    cache = None
+    if getattr(args, "cache_dir", ""):
+        from .cache import DetectionCache
+        cache = DetectionCache(disk_dir=args.cache_dir)
+    policy = _policy(args) if hasattr(args, "timeout") else None
 
     if args.cmd == "detect":
-        items = _detect_from_image(args.image, client, args.max_items)
+        items = _detect_from_images(args.image, client, args, cache, policy)
         _print_json(items)
         return 0
 
     if args.cmd == "suggest":
+        from .recipes import suggest_recipes_from_ingredients, suggest_recipes_stream
         ingredients = _split_csv(args.ingredients)
         cuisines  = _split_csv(args.cuisine) if args.cuisine else None
         allergies = _split_csv(args.allergy) if args.allergy else None
         diets     = _split_csv(args.diet)    if args.diet    else None
+        if args.stream:
+            for recipe in suggest_recipes_stream(
+                client, ingredients, args.calories, cuisines, allergies, diets, policy=policy
+            ):
+                print(json.dumps(recipe, ensure_ascii=False), flush=True)
+            return 0
         out = suggest_recipes_from_ingredients(
-            client, ingredients, args.calories, cuisines, allergies, diets
+            client, ingredients, args.calories, cuisines, allergies, diets, policy=policy
+        )
+        print(out)
+        return 0
+
+    if args.cmd == "mealplan":
+        from .recipes import suggest_meal_plan
+        out = suggest_meal_plan(
+            client, _split_csv(args.ingredients), args.calories, days=args.days,
+            cuisines=_split_csv(args.cuisine) or None, allergies=_split_csv(args.allergy) or None,
+            diets=_split_csv(args.diet) or None, policy=policy,
         )
         print(out)
         return 0
 
     if args.cmd == "plan":
-        detected = _detect_from_image(args.image, client, args.max_items)
+        from .recipes import suggest_recipes_from_ingredients
+        detected = _detect_from_images(args.image, client, args, cache, policy)
         if args.pick:
             detected = _pick_from_list(detected)
 
@@ -128,11 +376,17 @@ def main() -> int:
         allergies = _split_csv(args.allergy) if args.allergy else None
         diets     = _split_csv(args.diet)    if args.diet    else None
         out = suggest_recipes_from_ingredients(
-            client, detected, args.calories, cuisines, allergies, diets
+            client, detected, args.calories, cuisines, allergies, diets, policy=policy
         )
         print(out)
         return 0
 
+    if args.cmd == "batch":
+        return _run_batch(args, client, cache, policy)
+
+    if args.cmd == "serve":
+        return _serve(args, client, cache, policy)
+
     # default: show help
     parser.print_help()
     return 0
@@ -0,0 +1,244 @@
+# src/bitewise/dietary.py
+"""
+Allergen and diet exclusion rules, checked locally on every returned recipe.
+
+Ingredients are classified into classes (meat, dairy, gluten, legume, ...) by
+longest-phrase match over their canonical tokens (canon.canonical_id), so
+"Canned tuna in water" is fish, "peanut butter" is nut + legume (not dairy),
+"eggplant" is not egg. Allergens and diets map to the classes they exclude:
+
+    rule = compile_rule(allergies=["Lactose", "Nuts"], diets=["Keto"])
+    rule.violations(["cheddar", "zucchini", "rice"])  # -> ["cheddar", "rice"]
+
+Classes are bits; a rule is one banned mask (plus phrase rules for custom
+allergens such as "celery"), and per-ingredient masks are cached, so a check is
+a handful of dict lookups and ANDs. A "<x>-free" qualifier in the raw name
+("gluten-free soy sauce", "dairy-free cheese") lifts the matching classes.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+import re
+import threading
+
+from .canon import canonical_id
+
+# class -> ingredient phrases (canonicalized when compiled)
+CLASSES: Dict[str, Tuple[str, ...]] = {
+    "meat": ("beef", "steak", "pork", "ham", "bacon", "sausage", "salami", "lamb", "veal",
+             "chorizo", "prosciutto", "pepperoni", "venison", "mutton", "goat", "gelatin", "lard"),
+    "poultry": ("chicken", "turkey", "duck", "goose", "quail"),
+    "fish": ("fish", "seafood", "tuna", "salmon", "cod", "sardine", "anchovy", "mackerel", "trout",
+             "tilapia", "halibut", "haddock", "herring", "fish sauce"),
+    "shellfish": ("shellfish", "seafood", "shrimp", "crab", "lobster", "mussel", "clam", "oyster", "scallop",
+                  "crayfish", "squid", "calamari", "octopus"),
+    "dairy": ("milk", "cheese", "cheddar", "mozzarella", "parmesan", "feta", "ricotta", "brie",
+              "gouda", "halloumi", "paneer", "butter", "ghee", "cream", "heavy cream", "sour cream",
+              "cream cheese", "yogurt", "greek yogurt", "whey", "buttermilk", "custard"),
+    "egg": ("egg", "egg white", "egg yolk", "mayonnaise", "meringue", "aioli"),
+    "nut": ("nut", "almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "macadamia",
+            "brazil nut", "pine nut", "peanut", "almond milk", "almond flour", "pesto", "praline"),
+    "soy": ("soy", "soy sauce", "soybean", "tofu", "tempeh", "edamame", "miso", "soy milk"),
+    "sesame": ("sesame", "sesame seed", "sesame oil", "tahini"),
+    "gluten": ("wheat", "flour", "bread", "breadcrumb", "pasta", "noodle", "couscous", "barley",
+               "rye", "bulgur", "semolina", "seitan", "cracker", "tortilla", "pita", "bagel",
+               "croissant", "soy sauce", "beer"),
+    "grain": ("rice", "brown rice", "wheat", "flour", "bread", "pasta", "noodle", "couscous",
+              "oat", "oatmeal", "barley", "rye", "quinoa", "corn", "cornmeal", "cornstarch",
+              "tortilla", "tortilla chip", "cracker", "cereal", "granola", "bulgur", "pita", "bagel"),
+    "starchy": ("potato", "sweet potato", "yam", "cassava", "plantain", "corn", "pea", "parsnip"),
+    "legume": ("bean", "black bean", "kidney bean", "chickpea", "lentil", "pea", "peanut",
+               "hummus", "soybean", "edamame", "split pea"),
+    "sugar": ("sugar", "brown sugar", "powdered sugar", "honey", "maple syrup", "syrup", "jam",
+              "molasses", "agave", "ketchup", "chocolate", "candy"),
+    "honey": ("honey",),
+}
+
+# phrases whose classes are NOT the union of their parts (longest match wins)
+OVERRIDES: Dict[str, Tuple[str, ...]] = {
+    "peanut butter": ("nut", "legume"), "almond butter": ("nut",), "cashew butter": ("nut",),
+    "almond milk": ("nut",), "cashew milk": ("nut",), "coconut milk": (), "coconut cream": (),
+    "oat milk": ("grain",), "rice milk": ("grain",), "soy milk": ("soy", "legume"),
+    "cocoa butter": (), "butternut squash": (), "nutmeg": (), "coconut": (), "water chestnut": (),
+    "rice noodle": ("grain",), "egg noodle": ("egg", "grain", "gluten"),
+    "cream of tartar": (), "nutritional yeast": (), "fish sauce": ("fish",),
+    "buckwheat": ("grain",), "corn tortilla": ("grain", "starchy"), "rice flour": ("grain",),
+    "coconut flour": (), "rice vinegar": (), "cauliflower rice": (), "zucchini noodle": (),
+    "shirataki noodle": (),
+}
+
+# allergen / diet names (lower-case, singular, hyphenated) -> excluded classes
+ALLERGENS: Dict[str, Tuple[str, ...]] = {
+    "lactose": ("dairy",), "dairy": ("dairy",), "milk": ("dairy",),
+    "nut": ("nut",), "tree nut": ("nut",), "peanut": ("nut",),
+    "shellfish": ("shellfish",), "egg": ("egg",), "soy": ("soy",), "fish": ("fish",),
+    "gluten": ("gluten",), "wheat": ("gluten",), "sesame": ("sesame",),
+}
+
+DIET_RULES: Dict[str, Tuple[str, ...]] = {
+    "vegetarian": ("meat", "poultry", "fish", "shellfish"),
+    "vegan": ("meat", "poultry", "fish", "shellfish", "dairy", "egg", "honey"),
+    "pescatarian": ("meat", "poultry"),
+    "keto": ("grain", "starchy", "legume", "sugar"),  # PROMPT_TEMPLATE's banned keto categories
+    "low-carb": ("grain", "starchy", "sugar"),
+    "paleo": ("grain", "legume", "dairy", "sugar"),
+    "gluten-free": ("gluten",),
+    "dairy-free": ("dairy",), "lactose-free": ("dairy",),
+    "nut-free": ("nut",), "egg-free": ("egg",),
+}
+
+# "<word>-free" / "<word> free" / "vegan ..." in a raw ingredient name lifts these classes
+FREE_QUALIFIERS: Dict[str, Tuple[str, ...]] = {
+    "gluten": ("gluten",), "wheat": ("gluten",), "dairy": ("dairy",), "lactose": ("dairy",),
+    "milk": ("dairy",), "egg": ("egg",), "nut": ("nut",), "soy": ("soy",), "sugar": ("sugar",),
+    "grain": ("grain", "gluten"),
+}
+PLANT_BASED = ("meat", "poultry", "fish", "shellfish", "dairy", "egg", "honey")
+
+_FREE = re.compile(r"\b([a-z]+)[\s-]free\b")
+_PLANT = re.compile(r"\b(vegan|plant[\s-]based)\b")
+
+
+def _name_key(s: str) -> str:
+    """Allergen/diet lookup key: "Tree Nuts" -> "tree-nut", "Gluten Free" -> "gluten-free"."""
+    return canonical_id(str(s)).replace(" ", "-")
+
+
+class Taxonomy:
+    """Compiled class bits + phrase table; use `get_taxonomy()` rather than building one directly."""
+
+    def __init__(self):
+        names = list(CLASSES)
+        self.bits: Dict[str, int] = {c: 1 << i for i, c in enumerate(names)}
+        phrases: Dict[Tuple[str, ...], int] = {}
+        for cls, items in CLASSES.items():
+            for p in items:
+                toks = tuple(canonical_id(p).split())
+                phrases[toks] = phrases.get(toks, 0) | self.bits[cls]
+        for p, classes in OVERRIDES.items():
+            phrases[tuple(canonical_id(p).split())] = self.mask(classes)
+        self.phrases = phrases
+        self.max_len = max(len(k) for k in phrases)
+        self.allergens = {_name_key(k): self.mask(v) for k, v in ALLERGENS.items()}
+        self.diets = {_name_key(k): self.mask(v) for k, v in DIET_RULES.items()}
+        self.free = {k: self.mask(v) for k, v in FREE_QUALIFIERS.items()}
+        self.plant_based = self.mask(PLANT_BASED)
+
+    def mask(self, classes: Iterable[str]) -> int:
+        m = 0
+        for c in classes:
+            m |= self.bits[c]
+        return m
+
+    def classes(self, mask: int) -> List[str]:
+        return [c for c, b in self.bits.items() if mask & b]
+
+    def match(self, toks: List[str]) -> int:
+        """Union of class bits over a longest-match scan of `toks`."""
+        m, i, n = 0, 0, len(toks)
+        while i < n:
+            for j in range(min(n, i + self.max_len), i, -1):
+                hit = self.phrases.get(tuple(toks[i:j]))
+                if hit is not None:
+                    m |= hit
+                    i = j
+                    break
+            else:
+                i += 1
+        return m
+
+    def classify(self, name: str) -> int:
+        """Class bits of one ingredient name (qualifiers like "gluten-free" applied)."""
+        raw = str(name).lower()
+        m = self.match(canonical_id(raw).split())
+        if m:
+            for word in _FREE.findall(raw):
+                m &= ~self.free.get(_name_key(word), 0)
+            if _PLANT.search(raw):
+                m &= ~self.plant_based
+        return m
+
+
+_TAXONOMY: Optional[Taxonomy] = None
+_LOCK = threading.Lock()
+
+
+def get_taxonomy() -> Taxonomy:
+    """Build the taxonomy on first use (thread-safe), then reuse it."""
+    global _TAXONOMY
+    if _TAXONOMY is None:
+        with _LOCK:
+            if _TAXONOMY is None:
+                _TAXONOMY = Taxonomy()
+    return _TAXONOMY
+
+
+@lru_cache(maxsize=8192)
+def classify(name: str) -> int:
+    return get_taxonomy().classify(name)
+
+
+def ingredient_classes(name: str) -> List[str]:
+    """Class names of one ingredient ("Peanut butter" -> ["nut", "legume"])."""
+    return get_taxonomy().classes(classify(name))
+
+
+class DietRule:
+    """Compiled exclusions for one (allergies, diets) request."""
+    __slots__ = ("banned", "phrases")
+
+    def __init__(self, banned: int, phrases: FrozenSet[Tuple[str, ...]]):
+        self.banned = banned
+        self.phrases = phrases  # custom allergens matched as token phrases
+
+    def __bool__(self) -> bool:
+        return bool(self.banned or self.phrases)
+
+    def violates(self, name: str) -> bool:
+        if self.banned and classify(name) & self.banned:
+            return True
+        if self.phrases:
+            toks = canonical_id(str(name)).split()
+            for p in self.phrases:
+                k = len(p)
+                if any(tuple(toks[i:i + k]) == p for i in range(len(toks) - k + 1)):
+                    return True
+        return False
+
+    def violations(self, ingredients: Iterable[str]) -> List[str]:
+        return [x for x in ingredients if self.violates(x)]
+
+    def allows(self, ingredients: Iterable[str]) -> bool:
+        return not any(self.violates(x) for x in ingredients)
+
+
+def _key(xs: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    return tuple(sorted({canonical_id(str(x)) for x in (xs or ()) if str(x).strip()}))
+
+
+@lru_cache(maxsize=1024)
+def _compile(allergies: Tuple[str, ...], diets: Tuple[str, ...]) -> DietRule:
+    tax = get_taxonomy()
+    banned, phrases = 0, set()
+    for a in allergies:
+        k = a.replace(" ", "-")
+        if k in tax.allergens:
+            banned |= tax.allergens[k]
+        elif a:  # not in the taxonomy ("celery", "mustard"): exclude by name
+            phrases.add(tuple(a.split()))
+    for d in diets:
+        banned |= tax.diets.get(d.replace(" ", "-"), 0)  # unknown diets stay prompt-only
+    return DietRule(banned, frozenset(phrases))
+
+
+def compile_rule(allergies: Optional[Iterable[str]] = None, diets: Optional[Iterable[str]] = None) -> DietRule:
+    """Exclusion rule for the given allergies/diets (compiled once per distinct request shape)."""
+    return _compile(_key(allergies), _key(diets))
+
+
+def known_allergen(name: str) -> bool:
+    return _name_key(name) in get_taxonomy().allergens
+
+
+def known_diet(name: str) -> bool:
+    return _name_key(name) in get_taxonomy().diets
@@ -0,0 +1,93 @@
+# src/bitewise/fewshot.py
+"""Retrieval of the few-shot examples most relevant to a request (prompt shrinking)."""
+from __future__ import annotations
+from typing import List, Optional
+import re
+
+from .prompts import FEW_SHOT_EXAMPLES, render_example
+
+# defaults used by recipes._build_prompt; callers may override per call
+FEW_SHOT_K = 3
+FEW_SHOT_TOKEN_BUDGET = 1200
+
+# relevance weights
+_W_DIET, _W_CUISINE, _W_ALLERGY, _W_INGREDIENT = 4.0, 2.0, 1.0, 3.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars/token for English + JSON)."""
+    return (len(text) + 3) // 4
+
+
+def _key(s: str) -> str:
+    return re.sub(r"\s+", " ", s.strip().lower())
+
+
+def _words(items) -> frozenset:
+    return frozenset(w for x in items for w in re.findall(r"[a-z]+", x.lower()) if len(w) > 2)
+
+
+class _Indexed:
+    __slots__ = ("pos", "text", "tokens", "cuisines", "allergies", "diets", "words")
+
+    def __init__(self, pos: int, ex: dict):
+        self.pos = pos
+        self.text = render_example(ex)
+        self.tokens = estimate_tokens(self.text)
+        self.cuisines = frozenset(map(_key, ex["cuisines"]))
+        self.allergies = frozenset(map(_key, ex["allergies"]))
+        self.diets = frozenset(map(_key, ex["diets"]))
+        self.words = _words(ex["ingredients"])
+
+
+# built once at import: rendered text, token cost and match sets per example
+_INDEX = [_Indexed(i, ex) for i, ex in enumerate(FEW_SHOT_EXAMPLES)]
+
+
+def _score(e: _Indexed, words, cuisines, allergies, diets) -> float:
+    score = _W_DIET * len(e.diets & diets) + _W_CUISINE * len(e.cuisines & cuisines)
+    score += _W_ALLERGY * len(e.allergies & allergies)
+    if words and e.words:
+        score += _W_INGREDIENT * len(e.words & words) / len(words | e.words)
+    # an example with a diet the user didn't ask for (e.g. Keto) teaches the wrong rules
+    if e.diets and not (e.diets & diets):
+        score -= _W_DIET / 2
+    return score
+
+
+def select_few_shots(
+    ingredients: List[str],
+    cuisines: Optional[List[str]] = None,
+    allergies: Optional[List[str]] = None,
+    diets: Optional[List[str]] = None,
+    k: Optional[int] = None,
+    token_budget: Optional[int] = None,
+) -> List[str]:
+    """
+    Rendered examples (best first) ranked by diet/cuisine/allergy overlap and
+    ingredient similarity, at most `k`, staying within `token_budget`.
+    Always returns at least one example so the output format is demonstrated.
+    """
+    k = FEW_SHOT_K if k is None else k
+    budget = FEW_SHOT_TOKEN_BUDGET if token_budget is None else token_budget
+    words = _words(ingredients or [])
+    cui = frozenset(map(_key, cuisines or []))
+    alg = frozenset(map(_key, allergies or []))
+    dts = frozenset(map(_key, diets or []))
+
+    ranked = sorted(_INDEX, key=lambda e: (-_score(e, words, cui, alg, dts), e.tokens, e.pos))
+    chosen, used = [], 0
+    for e in ranked:
+        if len(chosen) >= k:
+            break
+        if used + e.tokens <= budget:
+            chosen.append(e)
+            used += e.tokens
+    if not chosen and ranked and k > 0:
+        chosen = [min(ranked[: max(k, 1)], key=lambda e: e.tokens)]
+    return [e.text for e in chosen]
+
+
+def few_shot_block(*args, **kwargs) -> str:
+    """select_few_shots(...) joined the same way prompts.FEW_SHOT_BLOCK is."""
+    return "\n\n".join(select_few_shots(*args, **kwargs))
@@ -0,0 +1,140 @@
+# src/bitewise/imaging.py
+"""Image preprocessing before upload: orient, downscale, re-encode (decode once)."""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Optional
+import io
+
+_PIL = None  # (Image, ImageOps) once imported, False if Pillow is missing
+
+
+def _pil():
+    """Import Pillow on first use (keeps `import bitewise...` fast); None without it."""
+    global _PIL
+    if _PIL is None:
+        try:
+            from PIL import Image, ImageOps  # optional
+            _PIL = (Image, ImageOps)
+        except Exception:
+            _PIL = False  # no Pillow: images are sent as-is
+    return _PIL or None
+
+
+@dataclass(frozen=True)
+class ImageOptions:
+    """
+    max_edge:   longest side in pixels after resize (None = keep size)
+    format:     "JPEG" or "WEBP" for the re-encoded payload
+    quality:    encoder quality (1-95)
+    draft:      let libjpeg decode at a reduced scale (much less memory for big photos)
+    exif_transpose: apply EXIF orientation so the model sees the photo upright
+    reencode:   False = send original bytes untouched (other options ignored)
+    """
+    max_edge: Optional[int] = 1536
+    format: str = "JPEG"
+    quality: int = 85
+    draft: bool = True
+    exif_transpose: bool = True
+    reencode: bool = True
+
+    def tag(self) -> str:
+        """Stable string folded into cache keys (different options = different payload)."""
+        if not self.reencode:
+            return "raw"
+        return f"{self.format.upper()}:{self.max_edge}:{self.quality}:{int(self.exif_transpose)}"
+
+
+DEFAULT_IMAGE_OPTIONS = ImageOptions()
+RAW_IMAGE_OPTIONS = ImageOptions(reencode=False)
+
+_MIME = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    """Encoded upload payload, built once and reused across every model attempt."""
+    data: bytes
+    mime: str
+    original_bytes: int
+    size: Optional[tuple] = None           # (w, h) sent
+    original_size: Optional[tuple] = None  # (w, h) decoded header
+
+    @property
+    def payload_bytes(self) -> int:
+        return len(self.data)
+
+    def part(self) -> dict:
+        # raw bytes: the SDK ships them as-is, no client-side base64 inflation
+        return {"inline_data": {"mime_type": self.mime, "data": self.data}}
+
+
+def guess_mime(image_bytes: bytes) -> str:
+    """Tiny mime sniffer. Prefer JPEG if unsure."""
+    if image_bytes.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if image_bytes.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+
+def _passthrough(data: bytes) -> PreparedImage:
+    return PreparedImage(data=data, mime=guess_mime(data), original_bytes=len(data))
+
+
+def preprocess_image(data: bytes, options: Optional[ImageOptions] = None) -> PreparedImage:
+    """
+    Decode `data` once, fix orientation, shrink to `max_edge` and re-encode.
+    Falls back to the original bytes when Pillow is missing, the image can't
+    be decoded, or re-encoding would not make the payload smaller.
+    """
+    opts = options or DEFAULT_IMAGE_OPTIONS
+    pil = _pil() if opts.reencode else None
+    if pil is None:
+        return _passthrough(data)
+    PILImage, ImageOps = pil
+
+    fmt = opts.format.upper()
+    if fmt not in _MIME:
+        raise ValueError(f"Unsupported image format {opts.format!r}; use JPEG or WEBP")
+
+    try:
+        img = PILImage.open(io.BytesIO(data))
+        original_size = img.size
+        if opts.draft and opts.max_edge and img.format == "JPEG":
+            # decode at 1/2, 1/4 or 1/8 scale while staying >= max_edge
+            img.draft("RGB", (opts.max_edge, opts.max_edge))
+        img.load()
+
+        rotated = False
+        if opts.exif_transpose:
+            oriented = ImageOps.exif_transpose(img)
+            rotated = oriented is not img
+            img = oriented
+
+        resized = False
+        if opts.max_edge and max(img.size) > opts.max_edge:
+            img.thumbnail((opts.max_edge, opts.max_edge), PILImage.LANCZOS)
+            resized = True
+        elif img.size != original_size:
+            resized = True  # draft already scaled it down
+
+        if img.mode not in ("RGB", "L") and not (fmt == "WEBP" and img.mode == "RGBA"):
+            img = img.convert("RGB")
+
+        buf = io.BytesIO()
+        img.save(buf, format=fmt, quality=int(opts.quality), optimize=(fmt == "JPEG"))
+        encoded = buf.getvalue()
+    except Exception:
+        return _passthrough(data)
+
+    if not (resized or rotated) and len(encoded) >= len(data):
+        return PreparedImage(
+            data=data, mime=guess_mime(data), original_bytes=len(data),
+            size=original_size, original_size=original_size,
+        )
+    return PreparedImage(
+        data=encoded, mime=_MIME[fmt], original_bytes=len(data),
+        size=img.size, original_size=original_size,
+    )
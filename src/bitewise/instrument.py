@@ -0,0 +1,226 @@
+# src/bitewise/instrument.py
+"""
+Per-stage timing / size / token instrumentation for vision.py and recipes.py.
+
+    with stage("vision.call") as st:
+        resp = ...
+        st.usage(resp)            # usage_metadata token counts
+    count("cache", cache="detection", outcome="hit")
+
+Nothing is recorded until a sink is installed with `set_sink(...)`; without one
+`stage()` returns a shared no-op object and `count()` returns immediately.
+Sinks: CallbackSink (any callable), JsonLinesSink (file/stream), PrometheusSink
+(node_exporter textfile format), MultiSink (several of those). Events are plain dicts:
+
+    {"ts": ..., "stage": "recipe.call", "seconds": 0.84, "ok": true, "prompt_tokens": 912, ...}
+    {"ts": ..., "counter": "cache", "value": 1, "cache": "recipe", "outcome": "hit"}
+"""
+from __future__ import annotations
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional, TextIO, Tuple
+import atexit
+import json
+import os
+import threading
+import time
+
+
+class CallbackSink:
+    """Hands every event dict to `fn`."""
+
+    def __init__(self, fn: Callable[[dict], Any]):
+        self.fn = fn
+
+    def emit(self, event: dict) -> None:
+        self.fn(event)
+
+
+class MultiSink:
+    """Fans every event out to several sinks."""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def emit(self, event: dict) -> None:
+        for s in self.sinks:
+            s.emit(event)
+
+
+class JsonLinesSink:
+    """One JSON object per event, appended to `path` (or written to an open stream)."""
+
+    def __init__(self, path_or_stream):
+        self._own = isinstance(path_or_stream, (str, os.PathLike))
+        self._fh: TextIO = open(path_or_stream, "a", encoding="utf-8") if self._own else path_or_stream
+        self._lock = threading.Lock()
+
+    def emit(self, event: dict) -> None:
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            self._fh.write(line + "\n")
+            self._fh.flush()
+
+    def close(self) -> None:
+        if self._own:
+            self._fh.close()
+
+
+class PrometheusSink:
+    """
+    Aggregates events and rewrites a Prometheus text file (e.g. for node_exporter's
+    textfile collector) at most every `interval` seconds, and at exit.
+    With path=None nothing is written; call render() (e.g. from a /metrics endpoint).
+    """
+
+    def __init__(self, path: Optional[str], interval: float = 5.0, prefix: str = "bitewise"):
+        self.path, self.interval, self.prefix = path, interval, prefix
+        self._lock = threading.Lock()
+        self._stage_sum: Dict[str, float] = defaultdict(float)
+        self._stage_count: Dict[Tuple[str, bool], int] = defaultdict(int)
+        self._bytes: Dict[str, int] = defaultdict(int)
+        self._tokens: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._counters: Dict[Tuple[str, Tuple], float] = defaultdict(float)
+        self._last = 0.0
+        if path is not None:
+            atexit.register(self.flush)
+
+    def emit(self, event: dict) -> None:
+        with self._lock:
+            if "stage" in event:
+                name = event["stage"]
+                self._stage_sum[name] += event.get("seconds", 0.0)
+                self._stage_count[(name, bool(event.get("ok", True)))] += 1
+                for k in ("bytes_in", "bytes_out"):
+                    if k in event:
+                        self._bytes[f"{name}|{k[6:]}"] += int(event[k])
+                for k in ("prompt_tokens", "output_tokens"):
+                    if k in event:
+                        self._tokens[(name, k[:-7])] += int(event[k])
+            elif "counter" in event:
+                labels = tuple(sorted((k, str(v)) for k, v in event.items() if k not in ("ts", "counter", "value")))
+                self._counters[(event["counter"], labels)] += event.get("value", 1)
+            due = self.path is not None and time.monotonic() - self._last >= self.interval
+        if due:
+            self.flush()
+
+    @staticmethod
+    def _labels(**kv) -> str:
+        return "{" + ",".join(f'{k}="{v}"' for k, v in kv.items()) + "}"
+
+    def render(self) -> str:
+        p, L = self.prefix, self._labels
+        with self._lock:
+            lines = [f"# TYPE {p}_stage_seconds summary"]
+            for name, s in sorted(self._stage_sum.items()):
+                n = sum(c for (st, _), c in self._stage_count.items() if st == name)
+                lines += [f"{p}_stage_seconds_sum{L(stage=name)} {s:.6f}", f"{p}_stage_seconds_count{L(stage=name)} {n}"]
+            lines.append(f"# TYPE {p}_stage_errors_total counter")
+            for (name, ok), c in sorted(self._stage_count.items()):
+                if not ok:
+                    lines.append(f"{p}_stage_errors_total{L(stage=name)} {c}")
+            lines.append(f"# TYPE {p}_stage_bytes_total counter")
+            for key, b in sorted(self._bytes.items()):
+                name, direction = key.split("|")
+                lines.append(f"{p}_stage_bytes_total{L(stage=name, direction=direction)} {b}")
+            lines.append(f"# TYPE {p}_tokens_total counter")
+            for (name, kind), t in sorted(self._tokens.items()):
+                lines.append(f"{p}_tokens_total{L(stage=name, kind=kind)} {t}")
+            for (name, labels), v in sorted(self._counters.items()):
+                lines.append(f"{p}_{name}_total{L(**dict(labels))} {v:g}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        if self.path is None:
+            return
+        text = self.render()
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, self.path)  # scrapers never see a half-written file
+        with self._lock:
+            self._last = time.monotonic()
+
+
+# ---------- recording API ----------
+_SINK = None
+
+
+def set_sink(sink) -> None:
+    """Install a sink (anything with `.emit(dict)`), or None to turn recording off."""
+    global _SINK
+    _SINK = sink
+
+
+def get_sink():
+    return _SINK
+
+
+def enabled() -> bool:
+    return _SINK is not None
+
+
+class _NoopStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields) -> None:
+        pass
+
+    def usage(self, resp) -> None:
+        pass
+
+
+_NOOP = _NoopStage()
+
+
+class _Stage:
+    __slots__ = ("sink", "fields", "t0")
+
+    def __init__(self, sink, name: str, fields: dict):
+        self.sink = sink
+        self.fields = {"stage": name, **fields}
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ev = {"ts": time.time(), **self.fields, "seconds": time.perf_counter() - self.t0, "ok": exc_type is None}
+        if exc_type is not None:
+            ev["error"] = exc_type.__name__
+        self.sink.emit(ev)
+        return False
+
+    def set(self, **fields) -> None:
+        self.fields.update(fields)
+
+    def usage(self, resp) -> None:
+        """Copy token counts from a response's usage_metadata (if the backend reports them)."""
+        u = getattr(resp, "usage_metadata", None)
+        if u is None:
+            return
+        for src, dst in (("prompt_token_count", "prompt_tokens"), ("candidates_token_count", "output_tokens")):
+            v = getattr(u, src, None)
+            if v:
+                self.fields[dst] = int(v)
+
+
+def stage(name: str, **fields):
+    """Context manager timing one pipeline stage; a shared no-op when no sink is set."""
+    sink = _SINK
+    if sink is None:
+        return _NOOP
+    return _Stage(sink, name, fields)
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """Bump counter `name` (e.g. cache outcomes, fallbacks, guard drops)."""
+    sink = _SINK
+    if sink is None:
+        return
+    sink.emit({"ts": time.time(), "counter": name, "value": value, **labels})
@@ -0,0 +1,141 @@
+# src/bitewise/microbatch.py
+"""
+Micro-batching for suggest: requests arriving within a short window are packed
+into one model call (recipes.suggest_recipes_batch), so the static prompt
+(rules + few-shots) is paid once per batch instead of once per user.
+
+    batcher = RecipeBatcher(client, window=0.02, cache=RecipeCache(), policy=policy)
+    batcher.suggest(["rice", "eggs"], 500)                  # threads: blocks for its answer
+    await batcher.asuggest(["tofu", "rice"], 600, diets=["Vegan"])   # asyncio
+    batcher.close()
+
+The first request of an empty window starts the clock; the batch goes out when
+`window` seconds have passed or `max_batch` requests are waiting, whichever is
+first. A lone request therefore waits at most `window` longer than it would
+unbatched. Batches run on a small thread pool, so a slow call does not hold
+back the next window. A failed batch fails every request in it.
+"""
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import asyncio
+import threading
+import time
+
+from .cache import RecipeCache
+from .instrument import count
+from .policy import CallPolicy
+from .recipes import MAX_REQUESTS_PER_CALL, SuggestRequest, suggest_recipes_batch
+
+
+class RecipeBatcher:
+    def __init__(
+        self,
+        client,
+        window: float = 0.02,
+        max_batch: int = MAX_REQUESTS_PER_CALL,
+        max_workers: int = 4,
+        cache: Optional[RecipeCache] = None,
+        policy: Optional[CallPolicy] = None,
+    ):
+        self.client = client
+        self.window = max(0.0, float(window))
+        self.max_batch = max(1, int(max_batch))
+        self.cache, self.policy = cache, policy
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[SuggestRequest, Future]] = []
+        self._deadline = 0.0
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="bw-microbatch")
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.batches = self.requests = 0
+
+    def submit(
+        self,
+        ingredients: List[str],
+        calorie_limit: int,
+        cuisines: Optional[List[str]] = None,
+        allergies: Optional[List[str]] = None,
+        diets: Optional[List[str]] = None,
+    ) -> Future:
+        """Queue one request for the current window; the Future resolves to its recipes JSON text."""
+        fut: Future = Future()
+        req = SuggestRequest(list(ingredients), int(calorie_limit), cuisines, allergies, diets)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("RecipeBatcher is closed")
+            if not self._pending:
+                self._deadline = time.monotonic() + self.window
+            self._pending.append((req, fut))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="bw-microbatch-window", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return fut
+
+    def suggest(self, *args, **kwargs) -> str:
+        return self.submit(*args, **kwargs).result()
+
+    async def asuggest(self, *args, **kwargs) -> str:
+        return await asyncio.wrap_future(self.submit(*args, **kwargs))
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return  # closed and drained
+                while len(self._pending) < self.max_batch and not self._closed:
+                    left = self._deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                # the overflow already waited out this window: it goes with the next pass
+            self._pool.submit(self._flush, batch)
+
+    def _flush(self, batch: List[Tuple[SuggestRequest, Future]]) -> None:
+        live = [(r, f) for r, f in batch if f.set_running_or_notify_cancel()]  # skip cancelled callers
+        if not live:
+            return
+        with self._cond:
+            self.batches += 1
+            self.requests += len(live)
+        count("microbatch_requests", len(live))
+        try:
+            outs = suggest_recipes_batch(
+                self.client, [r for r, _ in live], cache=self.cache, policy=self.policy,
+                max_per_call=self.max_batch,
+            )
+        except BaseException as e:
+            for _, f in live:
+                f.set_exception(e)
+            return
+        for (_, f), out in zip(live, outs):
+            f.set_result(out)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "batches": self.batches,
+                "requests": self.requests,
+                "avg_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            }
+
+    def close(self) -> None:
+        """Send what is still waiting, then stop (idempotent)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> "RecipeBatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,345 @@
+# src/bitewise/policy.py
+"""
+Call policy for model requests: end-to-end deadline, retries with jittered
+exponential backoff (retryable errors only), optional hedged requests and a
+circuit breaker. Every generate_content call in vision.py / recipes.py goes
+through `generate` / `agenerate`; with policy=None they are a plain call.
+"""
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
+import asyncio
+import random
+import threading
+import time
+
+
+class CircuitOpenError(RuntimeError):
+    """Backend marked unhealthy; the call was rejected without being sent."""
+
+
+class CallTimeout(TimeoutError):
+    """The end-to-end deadline ran out."""
+
+
+class AdmissionTimeout(CallTimeout):
+    """The deadline ran out waiting for quota (scheduler.py); the backend was never asked."""
+
+
+# google.api_core exception class names that are worth another attempt
+_RETRYABLE_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "Aborted", "BadGateway", "RetryError",
+}
+_RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Transient (429/5xx/timeouts/connection resets) vs permanent (bad key, bad request)."""
+    if isinstance(exc, (CircuitOpenError, CallTimeout)):
+        return False
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    for cls in type(exc).__mro__:
+        if cls.__name__ in _RETRYABLE_NAMES:
+            return True
+    code = getattr(exc, "code", None)
+    try:
+        return int(code) in _RETRYABLE_CODES
+    except (TypeError, ValueError):
+        return False
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures; while open every call is
+    rejected for `reset_after` seconds, then one trial call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.reset_after else "open"
+
+    def admit(self) -> Optional[str]:
+        """"call" while closed, "trial" for the one half-open probe, None when rejected."""
+        with self._lock:
+            if self._opened_at is None:
+                return "call"
+            if time.monotonic() - self._opened_at >= self.reset_after and not self._trial:
+                self._trial = True
+                return "trial"
+            return None
+
+    def allow(self) -> bool:
+        return self.admit() is not None
+
+    def release(self, ticket: Optional[str]) -> None:
+        """A trial that ended without a verdict (cancelled, permanent error): let the next call probe."""
+        if ticket == "trial":
+            with self._lock:
+                self._trial = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures, self._opened_at, self._trial = 0, None, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                self._opened_at, self._trial = time.monotonic(), False
+
+
+class CallPolicy:
+    """
+    deadline:     end-to-end seconds for one logical call, retries included
+    max_attempts: attempts per logical call (1 = no retry)
+    base_delay/max_delay: backoff bounds; sleeps are uniform(0, min(max, base * 2**n))
+    hedge:        send a duplicate request when the first is slower than
+                  `hedge_after` seconds (None = observed p95 once enough samples exist)
+    breaker:      CircuitBreaker shared by every call made under this policy
+    """
+
+    def __init__(
+        self,
+        deadline: float = 60.0,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        hedge: bool = False,
+        hedge_after: Optional[float] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        retryable: Callable[[BaseException], bool] = is_retryable,
+    ):
+        self.deadline = deadline
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.breaker = breaker
+        self.retryable = retryable
+        self._latencies: deque = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.calls = self.attempts = self.retries = self.hedges = self.rejected = 0
+
+    # ---------- bookkeeping ----------
+    def _observe(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < 20:
+                return None
+            xs = sorted(self._latencies)
+        return xs[int(0.95 * (len(xs) - 1))]
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        return self.hedge_after if self.hedge_after is not None else self.p95()
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _admit(self) -> Optional[str]:
+        if self.breaker is None:
+            return None
+        ticket = self.breaker.admit()
+        if ticket is None:
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError("Model backend unhealthy (circuit open)")
+        return ticket
+
+    def _trips(self, exc: BaseException) -> bool:
+        """Only transient failures say the backend is unhealthy; a bad request or key does not."""
+        if isinstance(exc, AdmissionTimeout):
+            return False
+        return isinstance(exc, TimeoutError) or self.retryable(exc)
+
+    def _record(self, ticket: Optional[str], ok: Optional[bool]) -> None:
+        """ok=None: no verdict on the backend; just free a half-open trial."""
+        if self.breaker is None:
+            return
+        if ok is None:
+            self.breaker.release(ticket)
+        else:
+            (self.breaker.record_success if ok else self.breaker.record_failure)()
+
+    def report_failure(self, exc: BaseException) -> None:
+        """A failure seen after `call` returned (e.g. a stream breaking mid-way); counts like an attempt's."""
+        if self._trips(exc):
+            self._record(None, False)
+
+    def _count(self, **inc) -> None:
+        with self._lock:
+            for k, v in inc.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {
+                "calls": self.calls, "attempts": self.attempts, "retries": self.retries,
+                "hedges": self.hedges, "rejected": self.rejected,
+            }
+        out["p95_s"] = self.p95()
+        out["breaker"] = self.breaker.state if self.breaker is not None else None
+        return out
+
+    # ---------- sync ----------
+    def call(self, fn: Callable[[float], Any]) -> Any:
+        """Run `fn(timeout_seconds)` under the policy and return its result."""
+        self._count(calls=1)
+        end = time.monotonic() + self.deadline
+        for attempt in range(self.max_attempts):
+            ticket, ok = self._admit(), None
+            try:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    raise CallTimeout(f"Deadline of {self.deadline}s exceeded")
+                self._count(attempts=1)
+                t0 = time.monotonic()
+                try:
+                    result = self._attempt(fn, remaining)
+                except Exception as e:
+                    ok = False if self._trips(e) else None
+                    pause = self._backoff(attempt)
+                    last = attempt == self.max_attempts - 1
+                    if last or not self.retryable(e) or time.monotonic() + pause >= end:
+                        raise
+                    self._count(retries=1)
+                else:
+                    ok = True
+                    self._observe(time.monotonic() - t0)
+                    return result
+            finally:  # BaseException-safe: a half-open trial is never left dangling
+                self._record(ticket, ok)
+            time.sleep(pause)
+        raise CallTimeout("No attempts left")  # not reached
+
+    def _attempt(self, fn, remaining: float):
+        delay = self._hedge_delay()
+        if delay is None or delay >= remaining:
+            return fn(remaining)
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="bw-hedge")
+        start = time.monotonic()
+        futures = [self._pool.submit(fn, remaining)]
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            self._count(hedges=1)
+            futures.append(self._pool.submit(fn, max(remaining - delay, 0.001)))
+        error: Optional[BaseException] = None
+        while futures:
+            left = remaining - (time.monotonic() - start)
+            done, pending = wait(futures, timeout=max(left, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                raise CallTimeout(f"Deadline of {self.deadline}s exceeded")
+            for f in done:
+                if f.exception() is None:
+                    return f.result()  # first success wins; the loser finishes in the background
+                error = f.exception()
+            futures = list(pending)
+        raise error
+
+    # ---------- async ----------
+    async def acall(self, fn: Callable[[float], Any]) -> Any:
+        """asyncio twin of `call`; `fn(timeout)` must return an awaitable."""
+        self._count(calls=1)
+        end = time.monotonic() + self.deadline
+        for attempt in range(self.max_attempts):
+            ticket, ok = self._admit(), None
+            try:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    raise CallTimeout(f"Deadline of {self.deadline}s exceeded")
+                self._count(attempts=1)
+                t0 = time.monotonic()
+                try:
+                    result = await self._aattempt(fn, remaining)
+                except Exception as e:
+                    timed_out = isinstance(e, asyncio.TimeoutError)
+                    ok = False if timed_out or self._trips(e) else None
+                    pause = self._backoff(attempt)
+                    last = attempt == self.max_attempts - 1
+                    if last or time.monotonic() + pause >= end:
+                        if timed_out:
+                            raise CallTimeout(f"Deadline of {self.deadline}s exceeded") from None
+                        raise
+                    if not timed_out and not self.retryable(e):
+                        raise
+                    self._count(retries=1)
+                else:
+                    ok = True
+                    self._observe(time.monotonic() - t0)
+                    return result
+            finally:  # also runs on CancelledError, which would otherwise pin a half-open trial
+                self._record(ticket, ok)
+            await asyncio.sleep(pause)
+        raise CallTimeout("No attempts left")  # not reached
+
+    async def _aattempt(self, fn, remaining: float):
+        delay = self._hedge_delay()
+        if delay is None or delay >= remaining:
+            return await asyncio.wait_for(fn(remaining), timeout=remaining)
+        tasks = [asyncio.ensure_future(fn(remaining))]
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            self._count(hedges=1)
+            tasks.append(asyncio.ensure_future(fn(max(remaining - delay, 0.001))))
+        loop = asyncio.get_running_loop()
+        end = loop.time() + remaining - delay
+        error: Optional[BaseException] = None
+        try:
+            while tasks:
+                done, pending = await asyncio.wait(
+                    tasks, timeout=max(end - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError
+                for t in done:
+                    if t.exception() is None:
+                        return t.result()
+                    error = t.exception()
+                tasks = list(pending)
+            raise error
+        finally:
+            for t in tasks:
+                t.cancel()
+
+
+# ---------- call helpers used by vision.py / recipes.py ----------
+def generate(client, contents, policy: Optional[CallPolicy] = None, **kwargs):
+    """client.generate_content(contents, **kwargs), under `policy` when given."""
+    if policy is None:
+        return client.generate_content(contents, **kwargs)
+    return policy.call(
+        lambda timeout: client.generate_content(contents, request_options={"timeout": timeout}, **kwargs)
+    )
+
+
+async def agenerate(client, contents, policy: Optional[CallPolicy] = None, **kwargs):
+    """asyncio twin of `generate` (client.generate_content_async)."""
+    if policy is None:
+        return await client.generate_content_async(contents, **kwargs)
+    return await policy.acall(
+        lambda timeout: client.generate_content_async(contents, request_options={"timeout": timeout}, **kwargs)
+    )
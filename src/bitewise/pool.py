@@ -0,0 +1,210 @@
+# src/bitewise/pool.py
+"""
+Pool of isolated model clients (one per API key x model), used wherever a single
+client is accepted: detect_ingredients(pool, ...), suggest_recipes_from_ingredients(pool, ...).
+
+- no process-global genai.configure: every member has its own service client
+- members are picked round-robin or least-loaded (fewest in-flight calls)
+- a member answering with a quota error (429 / ResourceExhausted) is parked for
+  `park_for` seconds and the call moves on to the next member
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Sequence
+import hashlib
+import itertools
+import threading
+import time
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+_QUOTA_NAMES = {"ResourceExhausted", "TooManyRequests"}
+
+
+def is_quota_error(exc: BaseException) -> bool:
+    for cls in type(exc).__mro__:
+        if cls.__name__ in _QUOTA_NAMES:
+            return True
+    return getattr(exc, "code", None) == 429
+
+
+def key_label(api_key: str) -> str:
+    """Short, non-reversible id for logs/stats (never print keys)."""
+    return "key-" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+
+
+def make_model(api_key: str, model: str = DEFAULT_MODEL):
+    """
+    GenerativeModel bound to its own key (does not touch genai.configure).
+
+    Relies on SDK internals (`_ClientManager`, `GenerativeModel._client` /
+    `._async_client`), checked against google-generativeai 0.7-0.8; the version
+    range is pinned in pyproject.toml. Only the sync client is built here: a gRPC
+    aio channel binds to the event loop it is created on, so the async client is
+    made on first `generate_content_async` inside the running loop (and again if
+    a later call runs on a different loop, e.g. successive asyncio.run calls).
+    """
+    import asyncio
+    import google.generativeai as genai
+    from google.generativeai.client import _ClientManager
+
+    manager = _ClientManager()
+    manager.configure(api_key=api_key)
+    m = genai.GenerativeModel(model)
+    m._client = manager.get_default_client("generative")
+    generate_async = m.generate_content_async  # bound SDK method
+    bound_loop = None
+
+    async def generate_content_async(*args, **kwargs):
+        nonlocal bound_loop
+        loop = asyncio.get_running_loop()
+        if bound_loop is not loop:
+            # never None here: the SDK would fall back to the global, unkeyed client
+            m._async_client = manager.make_client("generative_async")
+            bound_loop = loop
+        return await generate_async(*args, **kwargs)
+
+    m.generate_content_async = generate_content_async
+    return m
+
+
+@dataclass
+class PoolMember:
+    client: object
+    key: str = ""
+    model: str = DEFAULT_MODEL
+    inflight: int = 0
+    calls: int = 0
+    quota_errors: int = 0
+    parked_until: float = 0.0
+
+    def parked(self, now: float) -> bool:
+        return self.parked_until > now
+
+
+class ClientPool:
+    """
+    strategy:  "round_robin" or "least_loaded"
+    park_for:  seconds a member sits out after a quota error
+    is_quota:  classifier for errors that should park a member and fail over
+    """
+
+    def __init__(
+        self,
+        members: Iterable[PoolMember] = (),
+        strategy: str = "round_robin",
+        park_for: float = 60.0,
+        is_quota: Callable[[BaseException], bool] = is_quota_error,
+    ):
+        if strategy not in ("round_robin", "least_loaded"):
+            raise ValueError(f"Unknown pool strategy {strategy!r}")
+        self.members: List[PoolMember] = list(members)
+        self.strategy = strategy
+        self.park_for = park_for
+        self.is_quota = is_quota
+        self._rr = itertools.count()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_keys(
+        cls,
+        api_keys: Sequence[str],
+        models: Sequence[str] = (DEFAULT_MODEL,),
+        factory: Callable[[str, str], object] = make_model,
+        **kwargs,
+    ) -> "ClientPool":
+        """One isolated client per (key, model)."""
+        members = [
+            PoolMember(client=factory(k, m), key=key_label(k), model=m)
+            for k in api_keys if k for m in models
+        ]
+        if not members:
+            raise ValueError("ClientPool needs at least one API key")
+        return cls(members, **kwargs)
+
+    def add(self, client, key: str = "", model: str = DEFAULT_MODEL) -> PoolMember:
+        m = PoolMember(client=client, key=key, model=model)
+        with self._lock:
+            self.members.append(m)
+        return m
+
+    def for_model(self, model: str) -> "ClientPool":
+        """Pool over the members serving `model` (members and their state are shared)."""
+        sub = ClientPool([m for m in self.members if m.model == model], self.strategy, self.park_for, self.is_quota)
+        if not sub.members:
+            raise ValueError(f"No pool members for model {model!r}")
+        sub._lock = self._lock
+        return sub
+
+    # ---------- selection ----------
+    def _acquire(self, tried: set) -> PoolMember:
+        with self._lock:
+            now = time.monotonic()
+            fresh = [m for m in self.members if id(m) not in tried]
+            if not fresh:
+                raise LookupError("ClientPool is empty")
+            ready = [m for m in fresh if not m.parked(now)]
+            if not ready:  # everyone is parked: try the one that un-parks first
+                m = min(fresh, key=lambda x: x.parked_until)
+            elif self.strategy == "least_loaded":
+                m = min(ready, key=lambda x: (x.inflight, x.calls))
+            else:
+                m = ready[next(self._rr) % len(ready)]
+            m.inflight += 1
+            m.calls += 1
+            return m
+
+    def _release(self, m: PoolMember, exc: Optional[BaseException]) -> bool:
+        """Returns True when the call should fail over to another member."""
+        with self._lock:
+            m.inflight -= 1
+            if exc is not None and self.is_quota(exc):
+                m.quota_errors += 1
+                m.parked_until = time.monotonic() + self.park_for
+                return True
+        return False
+
+    # ---------- client surface ----------
+    def generate_content(self, contents, **kwargs):
+        tried: set = set()
+        while True:
+            m = self._acquire(tried)
+            tried.add(id(m))
+            failed = False
+            try:
+                return m.client.generate_content(contents, **kwargs)
+            except Exception as e:
+                failed = True
+                if not self._release(m, e) or len(tried) >= len(self.members):
+                    raise
+            finally:  # success, or a cancelled/interrupted call (a hedge loser): still frees the slot
+                if not failed:
+                    self._release(m, None)
+
+    async def generate_content_async(self, contents, **kwargs):
+        tried: set = set()
+        while True:
+            m = self._acquire(tried)
+            tried.add(id(m))
+            failed = False
+            try:
+                return await m.client.generate_content_async(contents, **kwargs)
+            except Exception as e:
+                failed = True
+                if not self._release(m, e) or len(tried) >= len(self.members):
+                    raise
+            finally:  # success, or a cancelled/interrupted call (a hedge loser): still frees the slot
+                if not failed:
+                    self._release(m, None)
+
+    def stats(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "key": m.key, "model": m.model, "inflight": m.inflight, "calls": m.calls,
+                    "quota_errors": m.quota_errors,
+                    "parked_s": round(max(0.0, m.parked_until - now), 1),
+                }
+                for m in self.members
+            ]
@@ -1,78 +1,309 @@
-from typing import List, Optional
-import os, json
-import google.generativeai as genai
-from google.generativeai.types import GenerationConfig
-from .prompts import PROMPT_TEMPLATE, FEW_SHOT_BLOCK
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Sequence, Union
+import os, json, time
+from . import prompts
+from .prompts import MEAL_PLAN_TEMPLATE, PACKED_PROMPT_TEMPLATE, PROMPT_TEMPLATE, FEW_SHOT_BLOCK, render_request
+from .fewshot import FEW_SHOT_K, few_shot_block, estimate_tokens, select_few_shots
+from .backends import make_backend
+from .cache import RecipeCache
+from .canon import canonical_id
+from .dietary import compile_rule
+from .instrument import count, enabled, stage
+from .nutrition import check_recipes, fit_to_limit, get_table
+from .retrieval import default_index
+from .pool import DEFAULT_MODEL, ClientPool, make_model
+from .policy import CallPolicy, CallTimeout, CircuitOpenError, agenerate, generate, is_retryable
+from .schemas import (
+    MealPlan, PackedRecipeLists, Recipe, RecipeList, RecipeStreamParser,
+    parse_meal_plan, parse_packed_recipes, parse_recipe_list,
+)
+from .singleflight import RECIPES
 import re
 
-from dotenv import load_dotenv
-load_dotenv(override=False)
-
 # helpers for strict ingredient guard
-ALLOWED_EXTRAS_ANY  = {"salt", "pepper", "oil", "vinegar", "water"}
-ALLOWED_EXTRAS_KETO = ALLOWED_EXTRAS_ANY | {"butter", "olive oil", "apple cider vinegar"}
+# the extras the prompts allow (prompts.EXTRAS_RULES renders the same lists)
+ALLOWED_EXTRAS_ANY  = set(prompts.ALLOWED_EXTRAS_ANY)
+ALLOWED_EXTRAS_KETO = set(prompts.ALLOWED_EXTRAS_KETO)
 
 def _norm(s: str) -> str:
     return re.sub(r"\s+", " ", s.strip().lower())
 
 def _expand_allowed(inputs: list[str]) -> set[str]:
-    allowed = set()
-    for x in inputs:
-        n = _norm(x)
-        allowed.add(n)
-        # naive plural/singular equivalence (sausage <-> sausages)
-        if n.endswith("s"):
-            allowed.add(n[:-1])
-        else:
-            allowed.add(n + "s")
-    return allowed
+    """Canonical IDs of the inputs (plurals, synonyms, modifiers folded by canon.py)."""
+    return {canonical_id(x) for x in inputs if x}
 
-def enforce_allowed_ingredients(json_text: str, inputs: list[str], diets: Optional[List[str]]) -> str:
-    try:
-        data = json.loads(json_text)
-    except Exception:
-        return json_text  # if it's not valid JSON, return as-is
+_EXTRAS_ANY_IDS  = frozenset(map(canonical_id, ALLOWED_EXTRAS_ANY))
+_EXTRAS_KETO_IDS = frozenset(map(canonical_id, ALLOWED_EXTRAS_KETO))
 
-    # build allowed set from inputs (+simple plural/singular)
+def recipe_guard(
+    inputs: list[str], diets: Optional[List[str]], allergies: Optional[List[str]] = None,
+) -> Callable[[dict], Optional[dict]]:
+    """
+    Per-recipe version of enforce_allowed_ingredients (used when recipes arrive one
+    at a time). Returns a function that trims a validated recipe to allowed
+    ingredients, or returns None if nothing allowed is left or the recipe breaks
+    an allergy/diet rule (dietary.compile_rule).
+    """
+    # canonical IDs of the inputs ("tomatoes" == "tomato", "canned tuna in water" == "tuna")
     allowed_names = _expand_allowed(inputs)
 
     # choose extras by diet
     keto = any(_norm(d) == "keto" for d in (diets or []))
-    extras = ALLOWED_EXTRAS_KETO if keto else ALLOWED_EXTRAS_ANY
+    extras = _EXTRAS_KETO_IDS if keto else _EXTRAS_ANY_IDS
+    rule = compile_rule(allergies, diets)
 
-    cleaned = []
-    for r in data.get("recipes", []):
+    def guard(r: dict) -> Optional[dict]:
+        if rule and not rule.allows(r.get("ingredients", [])):
+            count("guard_dietary_violations")
+            return None
         ing = []
         for item in r.get("ingredients", []):
-            n = _norm(item)
+            n = canonical_id(item)
             if n in allowed_names or n in extras:
                 ing.append(item)
-        if ing:
-            r["ingredients"] = ing
-            cleaned.append(r)
+        if not ing:
+            return None
+        r["ingredients"] = ing
+        return r
+
+    return guard
+
+def enforce_allowed_ingredients(
+    json_text: str, inputs: list[str], diets: Optional[List[str]], allergies: Optional[List[str]] = None,
+) -> str:
+    with stage("recipe.guard", bytes_in=len(json_text or "")) as st:
+        try:
+            data = parse_recipe_list(json_text)  # validates + repairs, no model re-call
+        except ValueError:
+            count("guard_unparseable")
+            return json.dumps({"recipes": []})  # unsalvageable output: nothing safe to show
+
+        guard = recipe_guard(inputs, diets, allergies)
+        recipes = data.get("recipes", [])
+        n_ing = sum(len(r["ingredients"]) for r in recipes) if enabled() else 0
+        cleaned = [g for g in map(guard, recipes) if g is not None]
+        if enabled():
+            dropped_ing = n_ing - sum(len(r["ingredients"]) for r in cleaned)
+            st.set(recipes_in=len(recipes), recipes_out=len(cleaned), ingredients_dropped=dropped_ing)
+            count("guard_dropped_recipes", len(recipes) - len(cleaned))
+            count("guard_dropped_ingredients", dropped_ing)
+        return json.dumps({"recipes": cleaned}, ensure_ascii=False, indent=2)
 
-    return json.dumps({"recipes": cleaned}, ensure_ascii=False, indent=2)
+def enforce_nutrition(json_text: str, calorie_limit: int, diets: Optional[List[str]]) -> str:
+    """
+    Local calorie/macro check of guarded recipes (nutrition.check_recipes): drops
+    recipes over the calorie limit or off keto macros, re-ranks ones whose local
+    estimate runs high. No model call.
+    """
+    with stage("recipe.nutrition") as st:
+        try:
+            recipes = json.loads(json_text).get("recipes", [])
+        except ValueError:
+            return json_text
+        kept = check_recipes(recipes, calorie_limit, diets)
+        if len(kept) != len(recipes):
+            count("nutrition_dropped_recipes", len(recipes) - len(kept))
+        st.set(recipes_in=len(recipes), recipes_out=len(kept))
+        return json.dumps({"recipes": kept}, ensure_ascii=False, indent=2)
+
+def _guarded(
+    raw: str, ingredients: List[str], calorie_limit: int,
+    allergies: Optional[List[str]], diets: Optional[List[str]],
+) -> str:
+    return enforce_nutrition(enforce_allowed_ingredients(raw, ingredients, diets, allergies), calorie_limit, diets)
 
 # end of strict ingredient helpers
 
-def create_client(api_key: Optional[str] = None):
-    """Return a Gemini client, or None if no key (offline demo mode)."""
-    key = api_key or os.getenv("GOOGLE_API_KEY")
-    if not key:
+_ENV_LOADED = False
+
+def load_env() -> None:
+    """Read .env into os.environ once (never overriding real env vars)."""
+    global _ENV_LOADED
+    if _ENV_LOADED:
+        return
+    _ENV_LOADED = True
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv(override=False)
+
+def _live_client(api_key: Optional[str] = None, model: Optional[str] = None):
+    keys = _split_keys(api_key or os.getenv("GOOGLE_API_KEYS") or os.getenv("GOOGLE_API_KEY") or "")
+    if not keys:
         return None
-    genai.configure(api_key=key)
-    return genai.GenerativeModel("gemini-2.0-flash")
+    models = _split_keys(model or os.getenv("BITEWISE_MODEL") or DEFAULT_MODEL)
+    if len(keys) == 1 and len(models) == 1:
+        return make_model(keys[0], models[0])  # isolated client; no global genai.configure
+    return ClientPool.from_keys(keys, models, strategy=os.getenv("BITEWISE_POOL_STRATEGY", "round_robin"))
+
+def _split_keys(s: str) -> List[str]:
+    return [x.strip() for x in s.split(",") if x.strip()]
+
+def create_client(api_key: Optional[str] = None, backend: Optional[str] = None, model: Optional[str] = None):
+    """
+    Return a model client, or None if no key (offline demo mode).
+    Several comma-separated keys (`api_key` or env GOOGLE_API_KEYS) and/or models
+    (`model` or env BITEWISE_MODEL) give a pool.ClientPool with one isolated
+    client per key/model.
+    `backend` (or env BITEWISE_BACKEND) selects "live" (default), "record:DIR"
+    (live + save responses) or "replay:DIR[?latency=..&jitter=..&error_rate=..]"
+    (serve saved responses, no network); see backends.py.
+    """
+    load_env()
+    spec = backend or os.getenv("BITEWISE_BACKEND", "")
+    if not spec or spec == "live":
+        return _live_client(api_key, model)
+    return make_backend(spec, lambda: _live_client(api_key, model))
 
 def _fallback_recipes(ingredients: List[str], calorie_limit: int) -> str:
+    # portions from the local nutrition table: use as much of the pantry as fits the limit
     name = ", ".join(ingredients[:3]) or "Pantry"
+    bowl, bowl_kcal = fit_to_limit(ingredients, calorie_limit)
+    fry, fry_kcal = fit_to_limit(ingredients[::-1], calorie_limit)
+    if not any(get_table().lookup(x) is not None for x in ingredients):
+        # nothing in the table: the sums are 0, so keep the old conservative guesses
+        bowl_kcal, fry_kcal = max(150, min(calorie_limit, calorie_limit - 50)), calorie_limit
     data = {
         "recipes": [
-            {"name": f"{name} Bowl", "ingredients": ingredients, "estimated_calories": max(150, min(calorie_limit, calorie_limit - 50))},
-            {"name": f"{name} Stir-Fry", "ingredients": ingredients, "estimated_calories": calorie_limit}
+            # a single portion over the limit: a smaller serving of it, at the limit
+            {"name": f"{name} Bowl", "ingredients": bowl or ingredients[:1], "estimated_calories": bowl_kcal if bowl else calorie_limit},
+            {"name": f"{name} Stir-Fry", "ingredients": fry[::-1] or ingredients[-1:], "estimated_calories": fry_kcal if fry else calorie_limit}
         ]
     }
     return json.dumps(data, ensure_ascii=False)
 
+def _build_prompt(
+    ingredients: List[str],
+    calorie_limit: int,
+    cuisines: Optional[List[str]],
+    allergies: Optional[List[str]],
+    diets: Optional[List[str]],
+    few_shots: Optional[str] = None,
+) -> str:
+    """`few_shots=None` picks the relevant examples (fewshot.select_few_shots)."""
+    ingredients_str = ", ".join(ingredients)
+    cuisines_str    = ", ".join(cuisines)  if cuisines  else "any cuisine"
+    allergies_str   = ", ".join(allergies) if allergies else "none"
+    diets_str       = ", ".join(diets)     if diets     else "none"
+    with stage("prompt.build") as st:
+        if few_shots is None:
+            few_shots = few_shot_block(ingredients, cuisines, allergies, diets)
+
+        prompt = PROMPT_TEMPLATE.format(
+            ingredients_str=ingredients_str,
+            calorie_limit=calorie_limit,
+            cuisines_str=cuisines_str,
+            allergies_str=allergies_str,
+            diets_str=diets_str,
+            few_shots=few_shots,
+        )
+        st.set(bytes_out=len(prompt))
+    return prompt
+
+def prompt_stats(
+    ingredients: List[str],
+    calorie_limit: int,
+    cuisines: Optional[List[str]] = None,
+    allergies: Optional[List[str]] = None,
+    diets: Optional[List[str]] = None,
+    k: Optional[int] = None,
+    token_budget: Optional[int] = None,
+) -> dict:
+    """Size of the recipe prompt for one request: retrieved few-shots vs the full block."""
+    shots = few_shot_block(ingredients, cuisines, allergies, diets, k=k, token_budget=token_budget)
+    prompt = _build_prompt(ingredients, calorie_limit, cuisines, allergies, diets, few_shots=shots)
+    full = _build_prompt(ingredients, calorie_limit, cuisines, allergies, diets, few_shots=FEW_SHOT_BLOCK)
+    return {
+        "few_shot_examples": shots.count("Example Input:"),
+        "prompt_chars": len(prompt),
+        "prompt_tokens_est": estimate_tokens(prompt),
+        "full_prompt_chars": len(full),
+        "full_prompt_tokens_est": estimate_tokens(full),
+        "saved_pct": round(100 * (1 - len(prompt) / len(full)), 1),
+    }
+
+def _recipe_config():
+    from google.generativeai.types import GenerationConfig
+    return GenerationConfig(
+        response_mime_type="application/json",
+        response_schema=RecipeList,
+        temperature=0.4,
+        top_p=0.9,
+    )
+
+def _cache_key(ingredients, calorie_limit, cuisines, allergies, diets) -> tuple:
+    n = lambda xs: [_norm(x) for x in (xs or []) if x and x.strip()]
+    pantry = [canonical_id(x) for x in ingredients if x and x.strip()]
+    return RecipeCache.key(pantry, calorie_limit, n(cuisines), n(allergies), n(diets))
+
+def _cached(cache: Optional[RecipeCache], key) -> Optional[str]:
+    hit = cache.get(key)
+    count("cache", cache="recipe", outcome="miss" if hit is None else "hit")
+    return hit
+
+def suggest_recipes_offline(
+    ingredients: List[str],
+    calorie_limit: int,
+    cuisines: Optional[List[str]] = None,
+    allergies: Optional[List[str]] = None,
+    diets: Optional[List[str]] = None,
+    k: int = 3,
+) -> str:
+    """
+    Recipes JSON text from the local corpus (retrieval.default_index), no model
+    call: only recipes cookable from the pantry + allowed extras, within the
+    calorie limit and tagged for the allergies/diets, then checked by
+    enforce_nutrition like model output (a library recipe without a calorie
+    figure gets the local estimate, or is dropped when that is over the limit).
+    {"recipes": []} when none fit. Also usable as a fast first answer while the
+    model call runs.
+    """
+    keto = any(_norm(d) == "keto" for d in (diets or []))
+    with stage("recipe.retrieve") as st:
+        found = default_index().search(
+            ingredients, calorie_limit, cuisines, allergies, diets, k=k,
+            extras=_EXTRAS_KETO_IDS if keto else _EXTRAS_ANY_IDS,
+        )
+        st.set(recipes_out=len(found))
+    return enforce_nutrition(json.dumps({"recipes": found}), calorie_limit, diets)
+
+def _usable(ingredients: List[str], allergies: Optional[List[str]], diets: Optional[List[str]]) -> List[str]:
+    """Pantry items no allergy/diet rule excludes."""
+    rule = compile_rule(allergies, diets)
+    return [x for x in ingredients if not rule.violates(x)] if rule else list(ingredients)
+
+def _fallback(
+    ingredients: List[str],
+    calorie_limit: int,
+    reason: str,
+    cuisines: Optional[List[str]] = None,
+    allergies: Optional[List[str]] = None,
+    diets: Optional[List[str]] = None,
+) -> str:
+    count("fallback", reason=reason)
+    local = suggest_recipes_offline(ingredients, calorie_limit, cuisines, allergies, diets)
+    if json.loads(local)["recipes"]:
+        return local
+    usable = _usable(ingredients, allergies, diets)  # placeholders must obey the same rules
+    if not usable:
+        return json.dumps({"recipes": []})
+    return _fallback_recipes(usable, calorie_limit)
+
+def _remember(cache: Optional[RecipeCache], key, guarded: str) -> str:
+    if cache is None:
+        return guarded
+    try:
+        keep = bool(json.loads(guarded).get("recipes"))
+    except Exception:
+        keep = False
+    if keep:  # never pin an empty/garbled answer
+        cache.put(key, guarded)
+    return guarded
+
+def _backend_down(exc: BaseException) -> bool:
+    return isinstance(exc, (CircuitOpenError, CallTimeout)) or is_retryable(exc)
+
 def suggest_recipes_from_ingredients(
     client,
     ingredients: List[str],
@@ -80,34 +311,408 @@ def suggest_recipes_from_ingredients(
     cuisines: Optional[List[str]] = None,
     allergies: Optional[List[str]] = None,
     diets: Optional[List[str]] = None,
+    cache: Optional[RecipeCache] = None,
+    policy: Optional[CallPolicy] = None,
 ) -> str:
+    """
+    Recipes JSON text for the pantry/constraints, guarded by enforce_allowed_ingredients.
+    With a `policy`, an unhealthy backend (circuit open, deadline or retries
+    exhausted on transient errors) degrades to _fallback_recipes instead of raising.
+    """
     if not ingredients:
         return json.dumps({"recipes": []})
     if client is None:
-        return _fallback_recipes(ingredients, calorie_limit)
+        return _fallback(ingredients, calorie_limit, "offline", cuisines, allergies, diets)
 
-    ingredients_str = ", ".join(ingredients)
-    cuisines_str    = ", ".join(cuisines)  if cuisines  else "any cuisine"
-    allergies_str   = ", ".join(allergies) if allergies else "none"
-    diets_str       = ", ".join(diets)     if diets     else "none"
+    key = _cache_key(ingredients, calorie_limit, cuisines, allergies, diets)
+    if cache is not None:
+        hit = _cached(cache, key)
+        if hit is not None:
+            return hit
 
-    prompt = PROMPT_TEMPLATE.format(
-        ingredients_str=ingredients_str,
-        calorie_limit=calorie_limit,
-        cuisines_str=cuisines_str,
-        allergies_str=allergies_str,
-        diets_str=diets_str,
-        few_shots=FEW_SHOT_BLOCK,
+    def _call() -> str:
+        prompt = _build_prompt(ingredients, calorie_limit, cuisines, allergies, diets)
+        try:
+            with stage("recipe.call", bytes_out=len(prompt)) as st:
+                resp = generate(client, [{"parts": [{"text": prompt}]}], policy, generation_config=_recipe_config())
+                st.usage(resp)
+        except Exception as e:
+            if policy is None or not _backend_down(e):
+                raise
+            return _fallback(ingredients, calorie_limit, type(e).__name__, cuisines, allergies, diets)
+        raw = resp.text or "{}"
+        return _remember(cache, key, _guarded(raw, ingredients, calorie_limit, allergies, diets))
+
+    # the same payload already in flight (another user/thread): share its answer
+    return RECIPES.do((id(client), key), _call)
+
+def suggest_recipes_stream(
+    client,
+    ingredients: List[str],
+    calorie_limit: int,
+    cuisines: Optional[List[str]] = None,
+    allergies: Optional[List[str]] = None,
+    diets: Optional[List[str]] = None,
+    cache: Optional[RecipeCache] = None,
+    policy: Optional[CallPolicy] = None,
+) -> Iterator[Recipe]:
+    """
+    Streaming variant of suggest_recipes_from_ingredients: yields each validated,
+    guarded recipe as soon as its closing brace arrives from the model.
+    The assembled answer is stored in `cache` once the stream completes.
+    With a `policy`, a stream that breaks on a transient error counts against the
+    breaker; if nothing was yielded yet it is re-issued once, then degrades to
+    _fallback. After the first recipe a broken stream just ends.
+    """
+    if not ingredients:
+        return
+    if client is None:
+        yield from json.loads(_fallback(ingredients, calorie_limit, "offline", cuisines, allergies, diets))["recipes"]
+        return
+
+    key = None
+    if cache is not None:
+        key = _cache_key(ingredients, calorie_limit, cuisines, allergies, diets)
+        hit = _cached(cache, key)
+        if hit is not None:
+            yield from json.loads(hit)["recipes"]
+            return
+
+    prompt = _build_prompt(ingredients, calorie_limit, cuisines, allergies, diets)
+    guard, done = recipe_guard(ingredients, diets, allergies), []
+    for attempt in range(2):  # a stream that breaks before its first recipe is re-issued once
+        try:
+            stream = generate(
+                client, [{"parts": [{"text": prompt}]}], policy,
+                generation_config=_recipe_config(), stream=True,
+            )
+        except Exception as e:
+            if policy is None or not _backend_down(e):
+                raise
+            yield from json.loads(_fallback(ingredients, calorie_limit, type(e).__name__, cuisines, allergies, diets))["recipes"]
+            return
+
+        parser, broken = RecipeStreamParser(), None
+        with stage("recipe.stream", bytes_out=len(prompt)) as st:
+            t0, received, last = time.perf_counter(), 0, None
+            try:
+                for chunk in stream:
+                    text = getattr(chunk, "text", "") or ""
+                    received += len(text)
+                    last = chunk
+                    for r in parser.feed(text):
+                        r = guard(r)
+                        if r is not None and not check_recipes([r], calorie_limit, diets):
+                            count("nutrition_dropped_recipes")
+                            r = None
+                        if r is not None:
+                            if not done:
+                                st.set(first_recipe_s=time.perf_counter() - t0)
+                            done.append(r)
+                            yield r
+            except Exception as e:  # the policy only covered opening the stream
+                if policy is None or not _backend_down(e):
+                    raise
+                policy.report_failure(e)
+                broken = e
+                st.set(broken=type(e).__name__)
+            st.set(bytes_in=received, recipes_out=len(done))
+            st.usage(last)  # the final chunk carries the totals
+        if broken is None:
+            break
+        if done:
+            return  # recipes already shown: end with those, never cache a partial answer
+        if attempt:
+            yield from json.loads(_fallback(ingredients, calorie_limit, type(broken).__name__, cuisines, allergies, diets))["recipes"]
+            return
+        count("stream_retry")
+    _remember(cache, key, json.dumps({"recipes": done}, ensure_ascii=False, indent=2))
+
+async def suggest_recipes_async(
+    client,
+    ingredients: List[str],
+    calorie_limit: int,
+    cuisines: Optional[List[str]] = None,
+    allergies: Optional[List[str]] = None,
+    diets: Optional[List[str]] = None,
+    cache: Optional[RecipeCache] = None,
+    policy: Optional[CallPolicy] = None,
+) -> str:
+    """asyncio twin of suggest_recipes_from_ingredients (uses `generate_content_async`)."""
+    if not ingredients:
+        return json.dumps({"recipes": []})
+    if client is None:
+        return _fallback(ingredients, calorie_limit, "offline", cuisines, allergies, diets)
+
+    key = _cache_key(ingredients, calorie_limit, cuisines, allergies, diets)
+    if cache is not None:
+        hit = _cached(cache, key)
+        if hit is not None:
+            return hit
+
+    async def _call() -> str:
+        prompt = _build_prompt(ingredients, calorie_limit, cuisines, allergies, diets)
+        try:
+            with stage("recipe.call", bytes_out=len(prompt)) as st:
+                resp = await agenerate(client, [{"parts": [{"text": prompt}]}], policy, generation_config=_recipe_config())
+                st.usage(resp)
+        except Exception as e:
+            if policy is None or not _backend_down(e):
+                raise
+            return _fallback(ingredients, calorie_limit, type(e).__name__, cuisines, allergies, diets)
+        raw = resp.text or "{}"
+        return _remember(cache, key, _guarded(raw, ingredients, calorie_limit, allergies, diets))
+
+    return await RECIPES.ado((id(client), key), _call)
+
+# ---------- multi-day plans: one model call for N days ----------
+MAX_PLAN_DAYS = 14
+
+def _meal_plan_config():
+    from google.generativeai.types import GenerationConfig
+    return GenerationConfig(
+        response_mime_type="application/json",
+        response_schema=MealPlan,
+        temperature=0.4,
+        top_p=0.9,
     )
 
-    resp = client.generate_content(
-        contents=[{"parts": [{"text": prompt}]}],
-        generation_config=GenerationConfig(
-            response_mime_type="application/json",
-            temperature=0.4,
-            top_p=0.9,
-        ),
+def _build_meal_plan_prompt(
+    ingredients: List[str],
+    calorie_limit: int,
+    days: int,
+    cuisines: Optional[List[str]],
+    allergies: Optional[List[str]],
+    diets: Optional[List[str]],
+) -> str:
+    with stage("prompt.build") as st:
+        prompt = MEAL_PLAN_TEMPLATE.format(
+            ingredients_str=", ".join(ingredients),
+            calorie_limit=calorie_limit,
+            cuisines_str=", ".join(cuisines) if cuisines else "any cuisine",
+            allergies_str=", ".join(allergies) if allergies else "none",
+            diets_str=", ".join(diets) if diets else "none",
+            days=days,
+            few_shots=few_shot_block(ingredients, cuisines, allergies, diets, k=2),
+        )
+        st.set(bytes_out=len(prompt))
+    return prompt
+
+def _split_pantry(ingredients: List[str], days: int) -> List[List[str]]:
+    """One wrapping slice of the pantry per day; consecutive slices overlap, so every item lands on some day."""
+    n = len(ingredients)
+    size = min(n, max(3, -(-n // days)))  # at least a cookable handful per day
+    return [[ingredients[(d * n // days + j) % n] for j in range(size)] for d in range(days)]
+
+def _offline_plan(
+    ingredients: List[str], calorie_limit: int, days: int, reason: str,
+    cuisines: Optional[List[str]], allergies: Optional[List[str]], diets: Optional[List[str]],
+) -> List[List[dict]]:
+    """Per-day recipes from the local library (pantry split across days), placeholders when nothing fits."""
+    count("fallback", reason=reason)
+    usable = _usable(ingredients, allergies, diets)
+    if not usable:
+        return [[] for _ in range(days)]
+    plan, used = [], set()
+    for pantry in _split_pantry(usable, days):
+        found = json.loads(suggest_recipes_offline(
+            pantry, calorie_limit, cuisines, allergies, diets, k=1 + len(used)))["recipes"]
+        day = [r for r in found if r["name"].lower() not in used][:1]
+        if not day:
+            day = json.loads(_fallback_recipes(pantry, calorie_limit))["recipes"][:1]
+        used.update(r["name"].lower() for r in day)
+        plan.append(day)
+    return plan
+
+def suggest_meal_plan(
+    client,
+    ingredients: List[str],
+    calorie_limit: int,
+    days: int = 7,
+    cuisines: Optional[List[str]] = None,
+    allergies: Optional[List[str]] = None,
+    diets: Optional[List[str]] = None,
+    policy: Optional[CallPolicy] = None,
+) -> str:
+    """
+    An N-day plan JSON text from ONE model call (instead of N suggest calls):
+    {"days": [{"day": 1, "recipes": [...]}, ...], "unused": [pantry items no day uses]}.
+    The prompt asks for the pantry to be spread across the days; each day is then
+    guarded like a single suggestion (enforce_allowed_ingredients + enforce_nutrition)
+    and keeps its first recipe whose dish is not already on an earlier day; one
+    recipe per day means `calorie_limit` bounds each day's total as well.
+    Offline, or with a `policy` and an unhealthy backend, days come from the local
+    recipe library with the pantry split across them.
+    """
+    if not 1 <= days <= MAX_PLAN_DAYS:
+        raise ValueError(f"days must be between 1 and {MAX_PLAN_DAYS}")
+    if not ingredients:
+        return json.dumps({"days": [{"day": n, "recipes": []} for n in range(1, days + 1)], "unused": []})
+
+    plan = None
+    if client is None:
+        plan = _offline_plan(ingredients, calorie_limit, days, "offline", cuisines, allergies, diets)
+    else:
+        prompt = _build_meal_plan_prompt(ingredients, calorie_limit, days, cuisines, allergies, diets)
+        try:
+            with stage("mealplan.call", bytes_out=len(prompt), days=days) as st:
+                resp = generate(client, [{"parts": [{"text": prompt}]}], policy, generation_config=_meal_plan_config())
+                st.usage(resp)
+        except Exception as e:
+            if policy is None or not _backend_down(e):
+                raise
+            plan = _offline_plan(ingredients, calorie_limit, days, type(e).__name__, cuisines, allergies, diets)
+        else:
+            try:
+                plan = [d["recipes"] for d in parse_meal_plan(resp.text or "", days)["days"]]
+            except ValueError:
+                count("guard_unparseable")
+                plan = [[] for _ in range(days)]
+
+    with stage("mealplan.guard", days=days) as st:
+        out, seen, names = [], set(), set()
+        for n, recipes in enumerate(plan, 1):
+            guarded = json.loads(_guarded(
+                json.dumps({"recipes": recipes}), ingredients, calorie_limit, allergies, diets))["recipes"]
+            fresh = [r for r in guarded if r["name"].strip().lower() not in names]
+            if len(fresh) < len(guarded):
+                count("mealplan_repeats", len(guarded) - len(fresh))
+            kept = fresh[:1]
+            names.update(r["name"].strip().lower() for r in kept)
+            out.append({"day": n, "recipes": kept})
+            seen.update(canonical_id(x) for r in kept for x in r["ingredients"])
+        unused = [x for x in ingredients if canonical_id(x) not in seen]
+        st.set(recipes_out=sum(len(d["recipes"]) for d in out), unused=len(unused))
+    return json.dumps({"days": out, "unused": unused}, ensure_ascii=False, indent=2)
+
+# ---------- several users per call: one packed prompt, split + guarded per request ----------
+# requests packed into one generate_content call (keeps the reply well under output limits)
+MAX_REQUESTS_PER_CALL = 8
+
+@dataclass
+class SuggestRequest:
+    ingredients: List[str]
+    calorie_limit: int
+    cuisines: Optional[List[str]] = None
+    allergies: Optional[List[str]] = None
+    diets: Optional[List[str]] = None
+
+def _as_request(r: Union[SuggestRequest, dict]) -> SuggestRequest:
+    if isinstance(r, SuggestRequest):
+        return r
+    limit = r.get("calorie_limit", r.get("calories"))
+    if limit is None:
+        raise ValueError("a suggest request needs calorie_limit")
+    return SuggestRequest(
+        list(r.get("ingredients") or []), int(limit),
+        r.get("cuisines"), r.get("allergies"), r.get("diets"),
+    )
+
+def _packed_config():
+    from google.generativeai.types import GenerationConfig
+    return GenerationConfig(
+        response_mime_type="application/json",
+        response_schema=PackedRecipeLists,
+        temperature=0.4,
+        top_p=0.9,
     )
-    raw = resp.text or "{}"
-    return enforce_allowed_ingredients(raw, ingredients, diets)
 
+def _build_packed_prompt(reqs: List[SuggestRequest], ids: List[str]) -> str:
+    """Rules once, the requests' most relevant few-shots once (deduped), then one block per request."""
+    with stage("prompt.build") as st:
+        shots: List[str] = []
+        for r in reqs:
+            for ex in select_few_shots(r.ingredients, r.cuisines, r.allergies, r.diets, k=2):
+                if ex not in shots:
+                    shots.append(ex)
+        prompt = PACKED_PROMPT_TEMPLATE.format(
+            n=len(reqs),
+            ids=", ".join(ids),
+            few_shots="\n\n".join(shots[:max(FEW_SHOT_K, 2)]),
+            requests="\n\n".join(
+                render_request(rid, r.ingredients, r.calorie_limit, r.cuisines, r.allergies, r.diets)
+                for rid, r in zip(ids, reqs)
+            ),
+        )
+        st.set(bytes_out=len(prompt))
+    return prompt
+
+def _suggest_packed(
+    client, reqs: List[SuggestRequest], keys: list,
+    cache: Optional[RecipeCache], policy: Optional[CallPolicy],
+) -> List[Optional[str]]:
+    """Guarded JSON text per request from ONE call; None for requests the reply left out."""
+    ids = [f"r{i}" for i in range(1, len(reqs) + 1)]
+    prompt = _build_packed_prompt(reqs, ids)
+    try:
+        with stage("recipe.call", bytes_out=len(prompt), requests=len(reqs)) as st:
+            resp = generate(client, [{"parts": [{"text": prompt}]}], policy, generation_config=_packed_config())
+            st.usage(resp)
+    except Exception as e:
+        if policy is None or not _backend_down(e):
+            raise
+        return [_fallback(r.ingredients, r.calorie_limit, type(e).__name__, r.cuisines, r.allergies, r.diets)
+                for r in reqs]
+    try:
+        parts = parse_packed_recipes(resp.text or "", ids)
+    except ValueError:
+        count("guard_unparseable")
+        parts = {}
+    out: List[Optional[str]] = []
+    for rid, r, key in zip(ids, reqs, keys):
+        if rid not in parts:
+            out.append(None)
+            continue
+        raw = json.dumps({"recipes": parts[rid]}, ensure_ascii=False)
+        out.append(_remember(cache, key, _guarded(raw, r.ingredients, r.calorie_limit, r.allergies, r.diets)))
+    return out
+
+def suggest_recipes_batch(
+    client,
+    requests: Sequence[Union[SuggestRequest, dict]],
+    cache: Optional[RecipeCache] = None,
+    policy: Optional[CallPolicy] = None,
+    max_per_call: int = MAX_REQUESTS_PER_CALL,
+) -> List[str]:
+    """
+    Recipes JSON text for each request (in order), answering up to `max_per_call`
+    users per model call: the instructions and few-shots are sent once, each
+    request carries an id, and the reply is split back out by id. Every part is
+    guarded like a single suggest (enforce_allowed_ingredients + enforce_nutrition)
+    against its own pantry and constraints.
+    Requests may be SuggestRequest or dicts with ingredients, calorie_limit (or
+    calories), cuisines, allergies, diets. Cache hits and duplicate payloads are
+    not packed; a request the reply leaves out is asked for on its own. Offline,
+    or with a `policy` and an unhealthy backend, each request gets _fallback_recipes.
+    """
+    reqs = [_as_request(r) for r in requests]
+    out: List[Optional[str]] = [None] * len(reqs)
+    todo: dict = {}  # cache key -> indexes of requests with that payload
+    for i, r in enumerate(reqs):
+        if not r.ingredients:
+            out[i] = json.dumps({"recipes": []})
+        elif client is None:
+            out[i] = _fallback(r.ingredients, r.calorie_limit, "offline", r.cuisines, r.allergies, r.diets)
+        else:
+            key = _cache_key(r.ingredients, r.calorie_limit, r.cuisines, r.allergies, r.diets)
+            hit = _cached(cache, key) if cache is not None and key not in todo else None
+            if hit is not None:
+                out[i] = hit
+            else:
+                todo.setdefault(key, []).append(i)
+
+    keys, cap = list(todo), max(1, int(max_per_call))
+    for c in range(0, len(keys), cap):
+        chunk = keys[c:c + cap]
+        firsts = [reqs[todo[k][0]] for k in chunk]
+        answers = _suggest_packed(client, firsts, chunk, cache, policy)
+        for key, r, ans in zip(chunk, firsts, answers):
+            if ans is None:
+                count("batch_missing")
+                ans = suggest_recipes_from_ingredients(
+                    client, r.ingredients, r.calorie_limit, r.cuisines, r.allergies, r.diets,
+                    cache=cache, policy=policy,
+                )
+            for i in todo[key]:
+                out[i] = ans
+    return out
@@ -0,0 +1,239 @@
+# src/bitewise/retrieval.py
+"""
+Offline recipe retrieval: a local corpus indexed by canonical ingredient IDs.
+
+Corpus format (JSONL, one recipe per line; only name/ingredients are required):
+
+    {"name": "Spinach Omelette", "ingredients": ["eggs", "spinach", "butter"],
+     "estimated_calories": 320, "cuisines": ["French"], "diets": ["Low-FODMAP"]}
+
+Allergies and the diets dietary.py knows (Vegan, Keto, Gluten-Free, ...) are
+checked against each recipe's ingredient classes, computed once at build time;
+`diets` tags are only needed for diets outside that taxonomy. The built-in
+corpus is the few-shot recipes in prompts.py (tagged with their example's
+cuisines/diets); env BITEWISE_RECIPES adds JSONL files (os.pathsep-separated).
+
+Each ingredient has a posting list (numpy array of recipe ids). A query adds
++1 per pantry/extra ingredient over its postings; a recipe is usable when every
+one of its ingredients was hit. Candidates are ranked by pantry coverage (the
+low-waste goal of PROMPT_TEMPLATE), cuisine match and how well they fill the
+calorie budget. Only recipes on the pantry's postings are ever looked at, so
+cost is proportional to the postings touched (plus a vocabulary scan when
+custom allergens are given), not to the corpus size.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, List, Optional
+import json
+import os
+import threading
+
+from .canon import canonical_id
+from .dietary import classify, compile_rule, known_diet
+from .nutrition import _np
+from .prompts import FEW_SHOT_EXAMPLES
+
+# ranking weights
+_W_COVERAGE, _W_CUISINE, _W_BUDGET = 1.0, 0.25, 0.05
+
+
+def _key(s: str) -> str:
+    return "-".join(str(s).lower().replace("-", " ").split())  # "Low FODMAP" == "low-fodmap"
+
+
+def _tags(v) -> List[str]:
+    if not v:
+        return []
+    if isinstance(v, str):
+        v = v.split(",")
+    return [_key(x) for x in v if str(x).strip()]
+
+
+def seed_recipes() -> Iterator[dict]:
+    """The few-shot recipes, tagged with their example's constraints."""
+    for ex in FEW_SHOT_EXAMPLES:
+        for r in ex["recipes"]:
+            yield {
+                **r,
+                "cuisines": ex["cuisines"],
+                "diets": ex["diets"],
+            }
+
+
+def read_corpus(path: str) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{n}: invalid JSON ({e})") from None
+            if not isinstance(obj, dict) or not obj.get("name") or not obj.get("ingredients"):
+                raise ValueError(f"{path}:{n}: a recipe needs name and ingredients")
+            yield obj
+
+
+class RecipeIndex:
+    """Posting-list index over a recipe corpus; build once, query many times."""
+
+    def __init__(self, recipes: Iterable[dict]):
+        np = _np()
+        self.recipes: List[dict] = []
+        self.vocab: Dict[str, int] = {}
+        postings: List[List[int]] = []
+        sizes, calories, classes = [], [], []
+        tag_rows: Dict[str, Dict[str, List[int]]] = {"cuisines": {}, "diets": {}}
+
+        for r in recipes:
+            rid = len(self.recipes)
+            ids, mask = set(), 0
+            for name in r["ingredients"]:
+                mask |= classify(str(name))
+                cid = canonical_id(str(name))
+                if not cid:
+                    continue
+                i = self.vocab.get(cid)
+                if i is None:
+                    i = self.vocab[cid] = len(postings)
+                    postings.append([])
+                if i not in ids:
+                    ids.add(i)
+                    postings[i].append(rid)
+            sizes.append(len(ids))
+            classes.append(mask)
+            calories.append(int(r.get("estimated_calories") or 0))
+            for field, rows in tag_rows.items():
+                tags = _tags(r.get(field)) or (_tags(r.get("cuisine")) if field == "cuisines" else [])
+                for t in tags:
+                    rows.setdefault(t, []).append(rid)
+            self.recipes.append({
+                "name": str(r["name"]),
+                "ingredients": [str(x) for x in r["ingredients"]],
+                "estimated_calories": calories[-1],
+            })
+
+        n = len(self.recipes)
+        self.postings = [np.asarray(p, dtype=np.int32) for p in postings]
+        self.sizes = np.asarray(sizes, dtype=np.int32)
+        self.calories = np.asarray(calories, dtype=np.int32)
+        self.classes = np.asarray(classes, dtype=np.int64)  # dietary class bits per recipe
+        self.tags: Dict[str, Dict[str, object]] = {}
+        for field, rows in tag_rows.items():
+            self.tags[field] = {}
+            for t, ids in rows.items():
+                mask = np.zeros(n, dtype=bool)
+                mask[ids] = True
+                self.tags[field][t] = mask
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    @classmethod
+    def from_jsonl(cls, *paths: str, seed: bool = False) -> "RecipeIndex":
+        def _all():
+            if seed:
+                yield from seed_recipes()
+            for p in paths:
+                yield from read_corpus(p)
+        return cls(_all())
+
+    def _touched(self, ids: Iterable[int]):
+        """(recipe ids on the postings of `ids`, sorted; how many of `ids` each contains)."""
+        np = _np()
+        lists = [self.postings[i] for i in ids]
+        if not lists:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(lists), return_counts=True)  # postings are unique per recipe
+
+    def _hits(self, ids: Iterable[int], cand):
+        """How many of `ids` each recipe in `cand` (sorted ids) contains."""
+        np = _np()
+        rids, counts = self._touched(ids)
+        if not rids.size:
+            return np.zeros(cand.size, dtype=np.int64)
+        at = np.minimum(np.searchsorted(rids, cand), rids.size - 1)
+        return np.where(rids[at] == cand, counts[at], 0)
+
+    def search(
+        self,
+        pantry: Iterable[str],
+        calorie_limit: int,
+        cuisines: Optional[List[str]] = None,
+        allergies: Optional[List[str]] = None,
+        diets: Optional[List[str]] = None,
+        k: int = 3,
+        extras: Iterable[str] = (),
+    ) -> List[dict]:
+        """
+        Top-`k` recipes cookable from `pantry` (+ `extras`, canonical IDs of the
+        allowed staples) within `calorie_limit` that break no allergy/diet rule; best first.
+        """
+        np = _np()
+        if not self.recipes or k <= 0:
+            return []
+        pantry_ids = {self.vocab[c] for c in map(canonical_id, pantry) if c in self.vocab}
+        if not pantry_ids:
+            return []
+        extra_ids = {self.vocab[c] for c in extras if c in self.vocab} - pantry_ids
+
+        cand, used = self._touched(pantry_ids)  # every usable recipe uses some pantry item
+        ok = (used + self._hits(extra_ids, cand) == self.sizes[cand]) & (self.calories[cand] <= calorie_limit)
+        rule = compile_rule(allergies, diets)
+        if rule.banned:
+            ok &= (self.classes[cand] & rule.banned) == 0
+        if rule.phrases:  # custom allergens: recipes containing a matching ingredient
+            banned = [i for c, i in self.vocab.items() if rule.violates(c)]
+            ok &= self._hits(banned, cand) == 0
+        for d in _tags(diets):
+            if not known_diet(d):
+                mask = self.tags["diets"].get(d)
+                ok &= mask[cand] if mask is not None else False
+        cand, used = cand[ok], used[ok]
+        if not cand.size:
+            return []
+
+        score = _W_COVERAGE * used / len(pantry_ids)
+        want = _tags(cuisines)
+        if want:
+            match = np.zeros(cand.size, dtype=bool)
+            for c in want:
+                if c in self.tags["cuisines"]:
+                    match |= self.tags["cuisines"][c][cand]
+            score = score + _W_CUISINE * match
+        score = score + _W_BUDGET * self.calories[cand] / max(calorie_limit, 1)
+
+        # distinct names only: corpora often carry near-duplicates
+        order = cand[np.lexsort((cand, -score))]
+        out, seen = [], set()
+        for rid in order:
+            r = self.recipes[int(rid)]
+            if r["name"].lower() in seen:
+                continue
+            seen.add(r["name"].lower())
+            out.append({**r, "ingredients": list(r["ingredients"])})
+            if len(out) >= k:
+                break
+        return out
+
+
+_INDEX: Optional[RecipeIndex] = None
+_LOCK = threading.Lock()
+
+
+def default_index() -> RecipeIndex:
+    """Built-in corpus + env BITEWISE_RECIPES files, built on first use (thread-safe)."""
+    global _INDEX
+    if _INDEX is None:
+        with _LOCK:
+            if _INDEX is None:
+                paths = [p for p in os.getenv("BITEWISE_RECIPES", "").split(os.pathsep) if p]
+                _INDEX = RecipeIndex.from_jsonl(*paths, seed=True)
+    return _INDEX
+
+
+def set_default_index(index: Optional[RecipeIndex]) -> None:
+    """Install a prebuilt index (None = rebuild from env on next use)."""
+    global _INDEX
+    with _LOCK:
+        _INDEX = index
@@ -0,0 +1,277 @@
+# src/bitewise/scheduler.py
+"""
+Quota-aware scheduler in front of model calls: requests-per-minute and
+tokens-per-minute token buckets, priority classes and queue statistics.
+
+    sched = Scheduler(rpm=60, tpm=250_000)
+    ui_client   = sched.wrap(client, priority="interactive")
+    bulk_client = sched.wrap(client, priority="bulk")
+
+Each call is admitted only when both buckets can pay for it, so throughput
+settles at the quota ceiling instead of bursting into 429s (and retry storms).
+Waiting callers are served strictly by (priority, arrival): interactive work
+goes ahead of queued bulk work. The token cost is estimated before the call
+(prompt text ~4 chars/token, images 258 tokens per 768px tile, plus an output
+allowance) and corrected from `usage_metadata` afterwards.
+A call's `request_options={"timeout": t}` (set by policy.CallPolicy) bounds its
+queue wait too: when admission would take longer, AdmissionTimeout is raised
+instead of sending the call late, and the time spent queued is taken off the
+timeout passed to the backend.
+"""
+from __future__ import annotations
+from collections import defaultdict
+from typing import Dict, List, Optional
+import asyncio
+import heapq
+import io
+import itertools
+import os
+import threading
+import time
+
+from .fewshot import estimate_tokens
+from .policy import AdmissionTimeout
+
+PRIORITIES = {"interactive": 0, "default": 1, "bulk": 2}
+
+IMAGE_TILE_TOKENS = 258  # Gemini: per image <= 384px, else per 768x768 tile
+_TILE = 768
+
+
+def image_tokens(data: bytes) -> int:
+    """Token cost of one inline image, from its header dimensions when Pillow is available."""
+    from .imaging import _pil
+    pil = _pil()
+    if pil is None:
+        return IMAGE_TILE_TOKENS
+    try:
+        w, h = pil[0].open(io.BytesIO(data)).size  # header only, no decode
+    except Exception:
+        return IMAGE_TILE_TOKENS
+    if w <= 384 and h <= 384:
+        return IMAGE_TILE_TOKENS
+    return IMAGE_TILE_TOKENS * (-(-w // _TILE)) * (-(-h // _TILE))
+
+
+def estimate_request_tokens(contents, output_tokens: int = 0) -> int:
+    """Prompt tokens of a generate_content request + an allowance for the answer."""
+    total = output_tokens
+    if isinstance(contents, (str, dict)):
+        contents = [contents]
+    for msg in contents or []:
+        if isinstance(msg, str):
+            total += estimate_tokens(msg)
+            continue
+        parts = msg.get("parts", []) if isinstance(msg, dict) else []
+        for p in parts:
+            if isinstance(p, str):
+                total += estimate_tokens(p)
+            elif isinstance(p, dict):
+                if "text" in p:
+                    total += estimate_tokens(p["text"])
+                elif "inline_data" in p:
+                    total += image_tokens(p["inline_data"].get("data", b""))
+    return max(1, total)
+
+
+class TokenBucket:
+    """`capacity` units refilled continuously at capacity/`period` units per second."""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.level = self.capacity
+        self._t = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._t) * self.rate)
+        self._t = now
+
+    def wait_for(self, n: float, now: float) -> float:
+        """Seconds until `n` units are available (0 = available now)."""
+        self._refill(now)
+        n = min(n, self.capacity)  # an oversized request still gets through once the bucket is full
+        return 0.0 if self.level >= n else (n - self.level) / self.rate
+
+    def take(self, n: float) -> None:
+        self.level -= min(n, self.capacity)
+
+    def give_back(self, n: float) -> None:
+        """Correct an estimate after the fact (negative n charges extra)."""
+        self.level = min(self.capacity, self.level + n)
+
+
+class Scheduler:
+    """
+    rpm/tpm:        quota per minute (None = unlimited)
+    output_tokens:  allowance added to each request's estimate for the model's answer
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, output_tokens: int = 512):
+        self.rpm = TokenBucket(rpm) if rpm else None
+        self.tpm = TokenBucket(tpm) if tpm else None
+        self.output_tokens = output_tokens
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._heap: List[list] = []  # [priority, seq, tokens, cancelled]
+        self._seq = itertools.count()
+        self._granted: Dict[str, int] = defaultdict(int)
+        self._waits: Dict[str, List[float]] = defaultdict(list)
+        self._waiting: Dict[str, int] = defaultdict(int)
+
+    # ---------- admission ----------
+    def _enqueue(self, tokens: int, priority: str) -> list:
+        ticket = [PRIORITIES.get(priority, PRIORITIES["default"]), next(self._seq), tokens, False]
+        with self._lock:
+            heapq.heappush(self._heap, ticket)
+            self._waiting[priority] += 1
+        return ticket
+
+    def _poll(self, ticket: list) -> float:
+        """Grant `ticket` if it is first in line and the buckets allow; else seconds to wait."""
+        with self._lock:
+            while self._heap and self._heap[0][3]:
+                heapq.heappop(self._heap)  # drop cancelled tickets
+            if self._heap[0] is not ticket:
+                return 0.01
+            now = time.monotonic()
+            wait = max(
+                self.rpm.wait_for(1, now) if self.rpm else 0.0,
+                self.tpm.wait_for(ticket[2], now) if self.tpm else 0.0,
+            )
+            if wait > 0:
+                return wait
+            if self.rpm:
+                self.rpm.take(1)
+            if self.tpm:
+                self.tpm.take(ticket[2])
+            heapq.heappop(self._heap)
+            self._cond.notify_all()
+            return 0.0
+
+    def _done(self, ticket: list, priority: str, granted: bool, waited: float) -> None:
+        with self._lock:
+            self._waiting[priority] -= 1
+            if granted:
+                self._granted[priority] += 1
+                w = self._waits[priority]
+                w.append(waited)
+                if len(w) > 1000:
+                    del w[:500]
+            else:
+                ticket[3] = True
+                self._cond.notify_all()
+
+    @staticmethod
+    def _check(t0: float, wait: float, timeout: Optional[float]) -> None:
+        if timeout is not None and time.monotonic() - t0 + wait > timeout:
+            raise AdmissionTimeout(f"Quota admission would exceed the {timeout:.1f}s call timeout")
+
+    def acquire(self, tokens: int, priority: str = "default", timeout: Optional[float] = None) -> float:
+        """Block until the call may be sent; returns seconds waited. AdmissionTimeout past `timeout`."""
+        t0 = time.monotonic()
+        ticket, granted = self._enqueue(tokens, priority), False
+        try:
+            while True:
+                wait = self._poll(ticket)
+                if wait == 0:
+                    granted = True
+                    return time.monotonic() - t0
+                self._check(t0, wait, timeout)
+                with self._cond:
+                    self._cond.wait(timeout=min(wait, 1.0))
+        finally:
+            self._done(ticket, priority, granted, time.monotonic() - t0)
+
+    async def aacquire(self, tokens: int, priority: str = "default", timeout: Optional[float] = None) -> float:
+        """asyncio twin of `acquire` (sleeps on the loop instead of blocking a thread)."""
+        t0 = time.monotonic()
+        ticket, granted = self._enqueue(tokens, priority), False
+        try:
+            while True:
+                wait = self._poll(ticket)
+                if wait == 0:
+                    granted = True
+                    return time.monotonic() - t0
+                self._check(t0, wait, timeout)
+                await asyncio.sleep(min(wait, 1.0))
+        finally:
+            self._done(ticket, priority, granted, time.monotonic() - t0)
+
+    def settle(self, estimated: int, resp) -> None:
+        """Replace the estimate with the real token count from `usage_metadata`."""
+        if self.tpm is None:
+            return
+        u = getattr(resp, "usage_metadata", None)
+        actual = getattr(u, "total_token_count", None) if u is not None else None
+        if actual:
+            with self._lock:
+                self.tpm.give_back(estimated - int(actual))
+
+    # ---------- wrapping ----------
+    def wrap(self, client, priority: str = "default") -> "ScheduledClient":
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}; use one of {sorted(PRIORITIES)}")
+        return ScheduledClient(client, self, priority)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {"queue_depth": sum(self._waiting.values()), "priorities": {}}
+            for p in PRIORITIES:
+                ws = sorted(self._waits.get(p, []))
+                out["priorities"][p] = {
+                    "waiting": self._waiting.get(p, 0),
+                    "granted": self._granted.get(p, 0),
+                    "wait_avg_s": round(sum(ws) / len(ws), 4) if ws else 0.0,
+                    "wait_p95_s": round(ws[int(0.95 * (len(ws) - 1))], 4) if ws else 0.0,
+                    "wait_max_s": round(ws[-1], 4) if ws else 0.0,
+                }
+            out["rpm_available"] = round(self.rpm.level, 2) if self.rpm else None
+            out["tpm_available"] = round(self.tpm.level) if self.tpm else None
+        return out
+
+
+def scheduler_from_env() -> Optional[Scheduler]:
+    """Scheduler for env BITEWISE_RPM / BITEWISE_TPM, or None when neither is set."""
+    rpm, tpm = os.getenv("BITEWISE_RPM"), os.getenv("BITEWISE_TPM")
+    if not (rpm or tpm):
+        return None
+    return Scheduler(rpm=float(rpm) if rpm else None, tpm=float(tpm) if tpm else None)
+
+
+class ScheduledClient:
+    """Client wrapper: every generate_content call is admitted by the scheduler first."""
+
+    def __init__(self, client, scheduler: Scheduler, priority: str = "default"):
+        self.client = client
+        self.scheduler = scheduler
+        self.priority = priority
+
+    @staticmethod
+    def _timeout(kwargs: dict) -> Optional[float]:
+        opts = kwargs.get("request_options")
+        return opts.get("timeout") if isinstance(opts, dict) else None
+
+    @staticmethod
+    def _after_wait(kwargs: dict, timeout: Optional[float], waited: float) -> dict:
+        """The backend gets what is left of the call timeout after queueing."""
+        if timeout is None or not waited:
+            return kwargs
+        return {**kwargs, "request_options": {**kwargs["request_options"], "timeout": max(timeout - waited, 0.001)}}
+
+    def generate_content(self, contents, **kwargs):
+        est = estimate_request_tokens(contents, self.scheduler.output_tokens)
+        timeout = self._timeout(kwargs)
+        waited = self.scheduler.acquire(est, self.priority, timeout=timeout)
+        resp = self.client.generate_content(contents, **self._after_wait(kwargs, timeout, waited))
+        if not kwargs.get("stream"):
+            self.scheduler.settle(est, resp)
+        return resp
+
+    async def generate_content_async(self, contents, **kwargs):
+        est = estimate_request_tokens(contents, self.scheduler.output_tokens)
+        timeout = self._timeout(kwargs)
+        waited = await self.scheduler.aacquire(est, self.priority, timeout=timeout)
+        resp = await self.client.generate_content_async(contents, **self._after_wait(kwargs, timeout, waited))
+        self.scheduler.settle(est, resp)
+        return resp
@@ -1,5 +1,6 @@
-from typing import List
+from typing import Any, Dict, List, Optional
 from typing_extensions import TypedDict
+import json, re
 
 class Recipe(TypedDict):
     name: str
@@ -7,4 +8,221 @@ class Recipe(TypedDict):
     estimated_calories: int
 
 class RecipeList(TypedDict):
-    recipes: List[Recipe]
\ No newline at end of file
+    recipes: List[Recipe]
+
+class MealPlanDay(TypedDict):
+    day: int
+    recipes: List[Recipe]
+
+class MealPlan(TypedDict):
+    days: List[MealPlanDay]
+
+# several users' requests packed into one call (recipes.suggest_recipes_batch)
+class RequestRecipes(TypedDict):
+    id: str
+    recipes: List[Recipe]
+
+class PackedRecipeLists(TypedDict):
+    results: List[RequestRecipes]
+
+# response schemas for vision: one array of names, or one array per packed photo
+IngredientList = list[str]
+PackedIngredientLists = list[list[str]]
+
+
+# ---------- validating parser (repairs instead of re-asking the model) ----------
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "‘": "'", "’": "'"})
+_INT = re.compile(r"-?\d+(?:\.\d+)?")
+
+def repair_json(text: str) -> Any:
+    """json.loads, then retry after stripping fences/smart quotes/trailing commas/prose."""
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        pass
+    fixed = _FENCE.sub("", text.translate(_SMART_QUOTES))
+    starts = [i for i in (fixed.find("{"), fixed.find("[")) if i != -1]
+    if starts:
+        start = min(starts)
+        end = fixed.rfind("}" if fixed[start] == "{" else "]")
+        fixed = fixed[start:end + 1] if end > start else fixed[start:]
+    fixed = _TRAILING_COMMA.sub(r"\1", fixed)
+    try:
+        return json.loads(fixed)
+    except ValueError as e:
+        raise ValueError(f"Unparseable model output: {e}") from None
+
+def _as_int(v: Any) -> Optional[int]:
+    if isinstance(v, bool):
+        return None
+    if isinstance(v, (int, float)):
+        return int(v)
+    if isinstance(v, str):
+        m = _INT.search(v)
+        return int(float(m.group())) if m else None
+    return None
+
+def validate_recipe(obj: Any) -> Optional[Recipe]:
+    """
+    Coerce one recipe or return None if it can't be salvaged.
+    name and a non-empty ingredients list are required; estimated_calories is
+    coerced to int when present. Extra keys (instructions, tips...) are kept.
+    """
+    if not isinstance(obj, dict):
+        return None
+    name = str(obj.get("name") or "").strip()
+    ing = obj.get("ingredients")
+    if isinstance(ing, str):
+        ing = ing.split(",")
+    if not name or not isinstance(ing, list):
+        return None
+    ing = [str(x).strip() for x in ing if x is not None and str(x).strip()]
+    if not ing:
+        return None
+    out = dict(obj)
+    out["name"], out["ingredients"] = name, ing
+    out.pop("estimated_calories", None)
+    cal = _as_int(obj.get("estimated_calories"))
+    if cal is not None:
+        out["estimated_calories"] = cal
+    return out  # type: ignore[return-value]
+
+def parse_recipe_list(text: str) -> RecipeList:
+    """
+    Fast validating parser for recipe payloads.
+    Accepts {"recipes": [...]}, a bare list, or a single recipe object, repairs
+    common damage and drops recipes that don't validate. Raises ValueError
+    when nothing recipe-shaped can be recovered.
+    """
+    if not text or not text.strip():
+        raise ValueError("Empty model output")
+    data = repair_json(text)
+    if isinstance(data, dict):
+        data = data.get("recipes", [data] if "name" in data else None)
+    if not isinstance(data, list):
+        raise ValueError("Model output has no recipe list")
+    return {"recipes": [r for r in map(validate_recipe, data) if r is not None]}
+
+def parse_meal_plan(text: str, days: int) -> MealPlan:
+    """
+    Validating parser for an N-day plan: {"days": [{"day": 1, "recipes": [...]}, ...]}
+    or a bare list of days (a day may also be a bare recipe list). Always returns
+    exactly `days` days numbered 1..days; missing days are empty, out-of-range or
+    repeated day numbers are dropped. Raises ValueError when there is no day list.
+    """
+    if not text or not text.strip():
+        raise ValueError("Empty model output")
+    data = repair_json(text)
+    if isinstance(data, dict):
+        data = data.get("days")
+    if not isinstance(data, list):
+        raise ValueError("Model output has no day list")
+    by_day = {}
+    for i, d in enumerate(data, 1):
+        if isinstance(d, list):
+            d = {"day": i, "recipes": d}
+        if not isinstance(d, dict):
+            continue
+        n = _as_int(d.get("day"))
+        n = i if n is None else n
+        if 1 <= n <= days and n not in by_day and isinstance(d.get("recipes"), list):
+            by_day[n] = [r for r in map(validate_recipe, d["recipes"]) if r is not None]
+    return {"days": [{"day": n, "recipes": by_day.get(n, [])} for n in range(1, days + 1)]}
+
+def parse_packed_recipes(text: str, ids: List[str]) -> Dict[str, List[Recipe]]:
+    """
+    Split a packed reply {"results": [{"id": "r1", "recipes": [...]}, ...]} back into
+    validated recipe lists by request id. Entries without a known id are matched by
+    position when the reply has exactly one entry per request. Requests missing
+    from the reply are missing from the result; raises ValueError when there is no
+    result list at all.
+    """
+    if not text or not text.strip():
+        raise ValueError("Empty model output")
+    data = repair_json(text)
+    if isinstance(data, dict):
+        data = data.get("results")
+    if not isinstance(data, list):
+        raise ValueError("Model output has no result list")
+    known = set(ids)
+    positional = len(data) == len(ids)
+    out: Dict[str, List[Recipe]] = {}
+    for i, part in enumerate(data):
+        if isinstance(part, list):
+            part = {"recipes": part}
+        if not isinstance(part, dict) or not isinstance(part.get("recipes"), list):
+            continue
+        rid = str(part.get("id") or "").strip()
+        if rid not in known:
+            if not positional:
+                continue
+            rid = ids[i]
+        if rid not in out:
+            out[rid] = [r for r in map(validate_recipe, part["recipes"]) if r is not None]
+    return out
+
+def parse_string_list(text: str) -> Optional[List[str]]:
+    """JSON array of strings (or {"ingredients": [...]}) -> list; None if not JSON."""
+    try:
+        data = repair_json(text or "")
+    except ValueError:
+        return None
+    if isinstance(data, dict):
+        data = data.get("ingredients")
+    if not isinstance(data, list):
+        return None
+    return [str(x).strip() for x in data if not isinstance(x, (list, dict)) and str(x).strip()]
+
+
+class RecipeStreamParser:
+    """
+    Incremental parser for a streamed {"recipes": [...]} (or bare [...]) payload.
+    feed() returns the recipes whose closing brace arrived in this chunk, already
+    validated; earlier text is never re-scanned.
+    """
+
+    def __init__(self):
+        self._buf = []       # chunks of the current recipe object
+        self._stack = []     # open containers: "{" / "["
+        self._in_str = self._esc = False
+        self._capturing = False
+
+    def _at_item_level(self) -> bool:
+        # a recipe object starts directly inside the list: {"recipes": [ HERE ] } or [ HERE ]
+        return self._stack in (["{", "["], ["["])
+
+    def feed(self, chunk: str) -> List[Recipe]:
+        out: List[Recipe] = []
+        start = 0 if self._capturing else None
+        for i, ch in enumerate(chunk):
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+                continue
+            if ch == '"':
+                self._in_str = True
+            elif ch in "{[":
+                if ch == "{" and not self._capturing and self._at_item_level():
+                    self._capturing, start = True, i
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if ch == "}" and self._capturing and self._at_item_level():
+                    self._buf.append(chunk[start:i + 1])
+                    text, self._buf, self._capturing, start = "".join(self._buf), [], False, None
+                    try:
+                        r = validate_recipe(json.loads(text))
+                    except ValueError:
+                        r = None
+                    if r is not None:
+                        out.append(r)
+        if self._capturing and start is not None:
+            self._buf.append(chunk[start:])
+        return out
@@ -0,0 +1,358 @@
+# src/bitewise/serve.py
+"""
+Long-running HTTP service behind `bitewise serve` (stdlib asyncio, no web framework).
+
+    POST /detect   multipart images (any file field)           -> {"ingredients": [...]}
+    POST /suggest  JSON {"ingredients": [...], "calories": 500,
+                         "cuisines": [...], "allergies": [...], "diets": [...]} -> {"recipes": [...]}
+    POST /plan     multipart images + constraint fields (or a "constraints" JSON field)
+                   -> {"ingredients": [...], "recipes": [...]}
+    GET  /healthz  liveness + breaker/queue state
+    GET  /metrics  Prometheus text (requests, latency, queue, caches, pipeline stages)
+
+One warm client, caches and call policy serve every request. Work goes through a
+bounded queue drained by a fixed number of workers; when the queue is full the
+request is answered 503 with Retry-After instead of piling up.
+With `batch_window` > 0, /suggest and /plan recipe requests arriving within that
+many seconds share one packed model call (microbatch.RecipeBatcher).
+JSON bodies may carry images as base64 strings in "images".
+"""
+from __future__ import annotations
+from collections import defaultdict
+from email.parser import BytesParser
+from email.policy import HTTP
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import base64
+import json
+import time
+
+from .batch import _as_list
+from .cache import DetectionCache, RecipeCache
+from .imaging import ImageOptions
+from .instrument import PrometheusSink, get_sink, set_sink
+from .microbatch import RecipeBatcher
+from .policy import AdmissionTimeout, CallPolicy, CallTimeout, CircuitOpenError
+from .recipes import suggest_recipes_async
+from .singleflight import DETECTIONS, RECIPES
+from .vision import _dedup_clamp, detect_ingredients_async
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ---------- request decoding ----------
+def parse_body(headers: Dict[str, str], body: bytes) -> Tuple[dict, List[bytes]]:
+    """(fields, images) from a JSON or multipart/form-data body."""
+    ctype = headers.get("content-type", "")
+    if ctype.startswith("multipart/form-data"):
+        msg = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {ctype}\r\n\r\n".encode("latin-1") + body)
+        if not msg.is_multipart():
+            raise HTTPError(400, "Malformed multipart body")
+        fields, images = {}, []
+        for part in msg.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            data = part.get_payload(decode=True) or b""
+            if part.get_filename() is not None:
+                images.append(data)
+            elif name == "constraints":
+                fields.update(_json_object(data))
+            elif name:
+                fields[name] = data.decode("utf-8", "replace")
+        return fields, images
+    if not body:
+        return {}, []
+    fields = _json_object(body)
+    try:
+        images = [base64.b64decode(x) for x in fields.pop("images", None) or []]
+    except (TypeError, ValueError):
+        raise HTTPError(400, "images must be base64 strings") from None
+    return fields, images
+
+
+def _json_object(data: bytes) -> dict:
+    try:
+        obj = json.loads(data)
+    except ValueError:
+        raise HTTPError(400, "Body is not valid JSON") from None
+    if not isinstance(obj, dict):
+        raise HTTPError(400, "Expected a JSON object")
+    return obj
+
+
+def _calories(fields: dict) -> int:
+    try:
+        return int(fields["calories"])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPError(400, "calories (int) is required") from None
+
+
+# ---------- server ----------
+class BiteWiseServer:
+    def __init__(
+        self,
+        client,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        workers: int = 8,
+        queue_size: int = 64,
+        max_body: int = 25 * 1024 * 1024,
+        max_items: int = 20,
+        policy: Optional[CallPolicy] = None,
+        image_options: Optional[ImageOptions] = None,
+        detection_cache: Optional[DetectionCache] = None,
+        recipe_cache: Optional[RecipeCache] = None,
+        batch_window: float = 0.0,
+    ):
+        self.client = client
+        self.host, self.port = host, port
+        self.workers, self.queue_size, self.max_body = max(1, workers), max(1, queue_size), max_body
+        self.max_items = max_items
+        self.policy = policy
+        self.image_options = image_options
+        self.detection_cache = detection_cache if detection_cache is not None else DetectionCache()
+        self.recipe_cache = recipe_cache if recipe_cache is not None else RecipeCache()
+        self.batcher = None
+        if batch_window > 0 and client is not None:
+            self.batcher = RecipeBatcher(client, window=batch_window, cache=self.recipe_cache, policy=policy)
+        # pipeline stage metrics: an installed PrometheusSink is shared; otherwise start()
+        # installs this one for the server's lifetime and close() takes it out again
+        self.stages = get_sink() if isinstance(get_sink(), PrometheusSink) else PrometheusSink(None)
+        self._owns_sink = False
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.requests: Dict[Tuple[str, int], int] = defaultdict(int)
+        self.latency_sum: Dict[str, float] = defaultdict(float)
+        self.rejected = 0
+        self.started = time.time()
+
+    # ----- pipeline (run by queue workers) -----
+    async def _detect(self, images: List[bytes], max_items: int) -> List[str]:
+        if not images:
+            raise HTTPError(400, "No images in request")
+        results = await asyncio.gather(*(
+            detect_ingredients_async(
+                img, self.client, max_items=max_items, cache=self.detection_cache,
+                image_options=self.image_options, policy=self.policy,
+            ) for img in images
+        ))
+        return _dedup_clamp([it for r in results for it in r], max_items)
+
+    async def _suggest(self, ingredients: List[str], fields: dict) -> dict:
+        if self.batcher is not None:
+            out = await self.batcher.asuggest(
+                ingredients, _calories(fields), _as_list(fields.get("cuisines")),
+                _as_list(fields.get("allergies")), _as_list(fields.get("diets")),
+            )
+            return json.loads(out)
+        out = await suggest_recipes_async(
+            self.client, ingredients, _calories(fields), _as_list(fields.get("cuisines")),
+            _as_list(fields.get("allergies")), _as_list(fields.get("diets")),
+            cache=self.recipe_cache, policy=self.policy,
+        )
+        return json.loads(out)
+
+    async def run_endpoint(self, path: str, fields: dict, images: List[bytes]) -> dict:
+        try:
+            max_items = int(fields.get("max_items") or self.max_items)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "max_items must be an int") from None
+        if path == "/detect":
+            return {"ingredients": await self._detect(images, max_items)}
+        if path == "/suggest":
+            ingredients = _as_list(fields.get("ingredients"))
+            if not ingredients:
+                raise HTTPError(400, "ingredients is required")
+            return await self._suggest(ingredients, fields)
+        _calories(fields)  # reject before spending a vision call
+        detected = await self._detect(images, max_items)
+        return {"ingredients": detected, **await self._suggest(detected, fields)}
+
+    async def _worker(self) -> None:
+        while True:
+            path, fields, images, fut = await self._queue.get()
+            try:
+                if not fut.cancelled():
+                    fut.set_result(await self.run_endpoint(path, fields, images))
+            except Exception as e:
+                if not fut.cancelled():
+                    fut.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    # ----- HTTP -----
+    def _health(self) -> dict:
+        return {
+            "status": "ok",
+            "online": self.client is not None,
+            "breaker": self.policy.breaker.state if self.policy and self.policy.breaker else None,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+            "uptime_s": round(time.time() - self.started, 1),
+        }
+
+    def metrics_text(self) -> str:
+        lines = ["# TYPE bitewise_http_requests_total counter"]
+        for (path, status), n in sorted(self.requests.items()):
+            lines.append(f'bitewise_http_requests_total{{path="{path}",status="{status}"}} {n}')
+        lines.append("# TYPE bitewise_http_request_seconds_sum counter")
+        for path, s in sorted(self.latency_sum.items()):
+            lines.append(f'bitewise_http_request_seconds_sum{{path="{path}"}} {s:.6f}')
+        lines += [
+            f"bitewise_http_rejected_total {self.rejected}",
+            f"bitewise_queue_depth {self._queue.qsize() if self._queue else 0}",
+            f"bitewise_queue_size {self.queue_size}",
+        ]
+        for name, cache in (("detection", self.detection_cache), ("recipe", self.recipe_cache)):
+            for k, v in cache.stats().items():
+                lines.append(f'bitewise_cache_{k}{{cache="{name}"}} {v}')
+        for flight in (DETECTIONS, RECIPES):
+            for k, v in flight.stats().items():
+                lines.append(f'bitewise_singleflight_{k}{{flight="{flight.name}"}} {v}')
+        if self.batcher is not None:
+            for k, v in self.batcher.stats().items():
+                lines.append(f"bitewise_microbatch_{k} {v}")
+        sched = getattr(self.client, "scheduler", None)
+        if sched is not None:
+            st = sched.stats()
+            lines.append(f"bitewise_scheduler_queue_depth {st['queue_depth']}")
+            for prio, ps in st["priorities"].items():
+                for k in ("waiting", "granted", "wait_avg_s", "wait_p95_s", "wait_max_s"):
+                    lines.append(f'bitewise_scheduler_{k}{{priority="{prio}"}} {ps[k]}')
+        if self.policy is not None:
+            for k, v in self.policy.stats().items():
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    lines.append(f"bitewise_policy_{k} {v}")
+        return "\n".join(lines) + "\n" + self.stages.render()
+
+    async def handle(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, dict, bytes]:
+        """Route one request; returns (status, extra headers, body)."""
+        path = path.split("?", 1)[0]
+        if path == "/healthz":
+            return 200, {}, json.dumps(self._health()).encode()
+        if path == "/metrics":
+            return 200, {"Content-Type": "text/plain; version=0.0.4"}, self.metrics_text().encode()
+        if path not in ("/detect", "/suggest", "/plan"):
+            raise HTTPError(404, f"No route for {path}")
+        if method != "POST":
+            raise HTTPError(405, "Use POST")
+        fields, images = parse_body(headers, body)
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((path, fields, images, fut))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return 503, {"Retry-After": "1"}, json.dumps({"error": "Server busy, retry later"}).encode()
+        try:
+            result = await fut
+        except HTTPError:
+            raise
+        except (CircuitOpenError, AdmissionTimeout) as e:  # backend unhealthy / out of quota
+            raise HTTPError(503, str(e)) from None
+        except CallTimeout as e:
+            raise HTTPError(504, str(e)) from None
+        return 200, {}, json.dumps(result, ensure_ascii=False).encode()
+
+    async def _respond(self, writer, status: int, headers: dict, body: bytes, keep_alive: bool) -> None:
+        head = [f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}"]
+        hdrs = {"Content-Type": "application/json", "Content-Length": str(len(body)),
+                "Connection": "keep-alive" if keep_alive else "close", **headers}
+        head += [f"{k}: {v}" for k, v in hdrs.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {}, b'{"error": "Bad request line"}', False)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {}, b'{"error": "Invalid Content-Length"}', False)
+                    return
+                if length > self.max_body:
+                    await self._respond(writer, 413, {}, b'{"error": "Body too large"}', False)
+                    return
+                try:
+                    body = await reader.readexactly(length) if length else b""
+                except asyncio.IncompleteReadError:
+                    # the peer may have only half-closed: it can still read the answer
+                    try:
+                        await self._respond(writer, 400, {}, b'{"error": "Body shorter than Content-Length"}', False)
+                    except ConnectionError:
+                        pass
+                    return
+
+                t0 = time.perf_counter()
+                try:
+                    status, extra, payload = await self.handle(method.upper(), target, headers, body)
+                except HTTPError as e:
+                    status, extra, payload = e.status, {}, json.dumps({"error": str(e)}).encode()
+                except Exception as e:
+                    status, extra, payload = 500, {}, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode()
+                route = target.split("?", 1)[0]
+                self.requests[(route, status)] += 1
+                self.latency_sum[route] += time.perf_counter() - t0
+                await self._respond(writer, status, extra, payload, keep_alive)
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    # ----- lifecycle -----
+    async def start(self) -> None:
+        if get_sink() is None:
+            set_sink(self.stages)
+            self._owns_sink = True
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._connection, self.host, self.port, limit=64 * 1024)
+        self.port = self._server.sockets[0].getsockname()[1]  # resolves port=0
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.batcher is not None:
+            await asyncio.to_thread(self.batcher.close)
+        if self._owns_sink:
+            if get_sink() is self.stages:
+                set_sink(None)
+            self._owns_sink = False
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
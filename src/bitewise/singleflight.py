@@ -0,0 +1,131 @@
+# src/bitewise/singleflight.py
+"""
+Single-flight coalescing: concurrent calls with the same key share one
+in-flight execution and all receive its result (or its exception).
+
+    DETECTIONS.do(key, fn)            # threads
+    await DETECTIONS.ado(key, afn)    # asyncio (per event loop)
+
+Unlike the caches this never stores anything: once the leader finishes the key
+is forgotten, so only callers that overlap in time are merged. vision.py and
+recipes.py key their model calls like their caches (+ the client), so a popular
+image or an identical suggest payload arriving from several users at once costs
+one model call.
+"""
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+import threading
+
+from .instrument import count
+
+
+class _LeaderGone(Exception):
+    """The leading coroutine was cancelled; its followers take over."""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.followers = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str = "model"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = self.saved = 0
+
+    def _joined(self) -> None:
+        with self._lock:
+            self.saved += 1
+        count("singleflight_saved", flight=self.name)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run `fn()` unless an identical call is in flight; then wait for and share its outcome."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                call.followers += 1
+        if not leader:
+            self._joined()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        asyncio twin of `do`; only coroutines on the same event loop are merged.
+        If the leader is cancelled its followers are not: one of them re-runs its
+        own `fn` as the new leader and the rest join that call.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                fut = self._futures.get(key)
+                leader = fut is None or fut.get_loop() is not loop
+                if leader:
+                    fut = loop.create_future()
+                    if key not in self._futures:
+                        self._futures[key] = fut
+                    self.leaders += 1
+            if leader:
+                break
+            try:
+                # shield: a cancelled follower must not cancel the shared call
+                result = await asyncio.shield(fut)
+            except _LeaderGone:
+                continue
+            self._joined()
+            return result
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            fut.set_exception(_LeaderGone())
+            fut.exception()  # fine if nobody was waiting
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved; the leader re-raises it below
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._futures.get(key) is fut:
+                    del self._futures[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls) + len(self._futures),
+                "leaders": self.leaders,
+                "saved": self.saved,
+            }
+
+
+# process-wide flights used by vision.py and recipes.py
+DETECTIONS = SingleFlight("detection")
+RECIPES = SingleFlight("recipe")
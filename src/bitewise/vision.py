@@ -1,12 +1,17 @@
 from __future__ import annotations
-from typing import List
-import io, base64
-import json as _json
-
-try:
-    from PIL import Image as PILImage  # optional
-except Exception:
-    PILImage = None  # gracefully fall back to inline_data
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Union
+from .cache import DetectionCache
+from .canon import canonical_id
+from .instrument import count, stage
+from .policy import CallPolicy, agenerate, generate
+from .singleflight import DETECTIONS
+from .schemas import IngredientList, PackedIngredientLists, repair_json, parse_string_list
+from .imaging import (
+    DEFAULT_IMAGE_OPTIONS, ImageOptions, PreparedImage, preprocess_image, guess_mime as _guess_mime,
+)
 
 _PROMPT_JSON = (
     "Identify edible grocery/food items visible in this photo. "
@@ -14,18 +19,15 @@ _PROMPT_JSON = (
     "No commentary."
 )
 
-_PROMPT_LINES = (
-    "List all visible food ingredients (one per line, no numbers or bullets). "
-    "Ignore packaging/utensils."
+_PROMPT_JSON_MULTI = (
+    "You are given {n} photos, labelled Photo 1..{n} in order. "
+    "Identify edible grocery/food items visible in each photo. "
+    "Return ONLY a JSON array with exactly {n} elements; element i is a JSON array "
+    "of strings (unique, capitalized common names) for Photo i. No commentary."
 )
 
-def _guess_mime(image_bytes: bytes) -> str:
-    """Tiny mime sniffer. Prefer JPEG if unsure."""
-    if image_bytes.startswith(b"\xff\xd8"):
-        return "image/jpeg"
-    if image_bytes.startswith(b"\x89PNG\r\n\x1a\n"):
-        return "image/png"
-    return "image/jpeg"
+# images packed into one generate_content call (keeps each request well under size limits)
+MAX_IMAGES_PER_REQUEST = 6
 
 def _normalize_lines(text: str) -> List[str]:
     out: List[str] = []
@@ -43,81 +45,299 @@ def _normalize_lines(text: str) -> List[str]:
     return out
 
 def _dedup_clamp(items: List[str], max_items: int) -> List[str]:
+    # dedup on canonical ID ("Tomatoes" == "tomato"), keep the first spelling seen
     seen, out = set(), []
     for it in (str(x).strip() for x in items):
-        if it and it not in seen:
-            seen.add(it)
+        cid = canonical_id(it) if it else ""
+        if it and cid not in seen:
+            seen.add(cid)
             out.append(it)
         if len(out) >= max_items:
             break
     return out
 
-def detect_ingredients(image_path: str, client, max_items: int = 20) -> List[str]:
+ImageSource = Union[str, bytes]
+
+def _read_image(image: ImageSource) -> bytes:
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    with open(image, "rb") as f:
+        return f.read()
+
+def _load(image: ImageSource) -> bytes:
+    with stage("image.read") as st:
+        data = _read_image(image)
+        st.set(bytes_out=len(data))
+    return data
+
+def _prepare(data: bytes, options: Optional[ImageOptions]) -> PreparedImage:
+    with stage("image.preprocess", bytes_in=len(data)) as st:
+        image = preprocess_image(data, options)
+        st.set(bytes_out=image.payload_bytes)
+    return image
+
+def _contents(image: PreparedImage, prompt: str) -> list:
+    return [{"role": "user", "parts": [image.part(), {"text": prompt}]}]
+
+def _json_config(schema=IngredientList):
+    # schema-constrained JSON: the reply is parsed locally, never re-requested
+    from google.generativeai.types import GenerationConfig
+    return GenerationConfig(
+        response_mime_type="application/json",
+        response_schema=schema,
+        temperature=0.2,
+    )
+
+def _parse_items(text: str) -> List[str]:
+    with stage("vision.parse", bytes_in=len(text or "")):
+        items = parse_string_list(text)
+        if items is not None:
+            return items
+        # not JSON at all: salvage a bulleted/one-per-line answer
+        count("vision_unstructured_reply")
+        return _normalize_lines(text or "")
+
+def _cache_lookup(data: bytes, max_items: int, cache: Optional[DetectionCache], options: Optional[ImageOptions]):
+    """Return (key, cached_items); key is None when caching is off."""
+    if cache is None:
+        return None, None
+    key = cache.key(data, _PROMPT_JSON, max_items, variant=(options or DEFAULT_IMAGE_OPTIONS).tag())
+    items = cache.get(key)
+    count("cache", cache="detection", outcome="miss" if items is None else "hit")
+    return key, items
+
+def _flight_key(data: bytes, max_items: int, options: Optional[ImageOptions], cache_key, client) -> tuple:
+    """Same identity as the detection cache key, scoped to the client."""
+    if cache_key is None:
+        cache_key = DetectionCache.key(data, _PROMPT_JSON, max_items, variant=(options or DEFAULT_IMAGE_OPTIONS).tag())
+    return (id(client), cache_key)
+
+def _finish(items: List[str], max_items: int, cache: Optional[DetectionCache], key) -> List[str]:
+    items = _dedup_clamp(items, max_items)
+    if key is not None and items:
+        cache.put(key, items)
+    return items
+
+def _require_client(client) -> None:
+    if client is None:
+        raise RuntimeError("Online detection requires GOOGLE_API_KEY. See .env setup.")
+
+def detect_ingredients(
+    image_path: ImageSource,
+    client,
+    max_items: int = 20,
+    cache: Optional[DetectionCache] = None,
+    image_options: Optional[ImageOptions] = None,
+    policy: Optional[CallPolicy] = None,
+) -> List[str]:
     """
     Use Gemini Vision to detect edible grocery/food items in an image.
+    `image_path` may also be the raw image bytes (e.g. from an upload widget).
     Returns: list[str] of unique, capitalized common names (max max_items).
     Requires a configured client (see create_client in recipes.py).
+    If `cache` is given, a repeated image (same bytes/prompt/max_items) skips the model call.
+    `image_options` controls downscale/re-encode before upload (see imaging.ImageOptions).
+    `policy` adds deadline/retry/hedging/circuit breaking (see policy.CallPolicy).
     """
-    if client is None:
-        raise RuntimeError("Online detection requires GOOGLE_API_KEY. See .env setup.")
+    data = _load(image_path)
+    key, cached = _cache_lookup(data, max_items, cache, image_options)
+    if cached is not None:
+        return cached
+    _require_client(client)
+
+    def _call() -> List[str]:
+        image = _prepare(data, image_options)  # decoded/encoded once, reused below
+        with stage("vision.call", bytes_out=image.payload_bytes, images=1) as st:
+            resp = generate(client, _contents(image, _PROMPT_JSON), policy, generation_config=_json_config())
+            st.usage(resp)
+        items = _parse_items(getattr(resp, "text", "") or "")
+        return _finish(items, max_items, cache, key)
+
+    # identical image already being detected by another caller: share that call
+    return list(DETECTIONS.do(_flight_key(data, max_items, image_options, key, client), _call))
+
+async def detect_ingredients_async(
+    image_path: ImageSource,
+    client,
+    max_items: int = 20,
+    cache: Optional[DetectionCache] = None,
+    image_options: Optional[ImageOptions] = None,
+    policy: Optional[CallPolicy] = None,
+) -> List[str]:
+    """
+    asyncio twin of detect_ingredients built on `client.generate_content_async`.
+    Same prompt, schema, parsing and cache; no worker thread per request.
+    """
+    if isinstance(image_path, str):
+        data = await asyncio.to_thread(_load, image_path)
+    else:
+        data = _load(image_path)
+    key, cached = _cache_lookup(data, max_items, cache, image_options)
+    if cached is not None:
+        return cached
+    _require_client(client)
+
+    async def _call() -> List[str]:
+        # CPU-bound decode/encode goes to a thread so the loop keeps serving
+        image = await asyncio.to_thread(_prepare, data, image_options)
+        with stage("vision.call", bytes_out=image.payload_bytes, images=1) as st:
+            resp = await agenerate(client, _contents(image, _PROMPT_JSON), policy, generation_config=_json_config())
+            st.usage(resp)
+        items = _parse_items(getattr(resp, "text", "") or "")
+        return _finish(items, max_items, cache, key)
 
-    with open(image_path, "rb") as f:
-        data = f.read()
-    mime = _guess_mime(data)
+    return list(await DETECTIONS.ado(_flight_key(data, max_items, image_options, key, client), _call))
 
-    # Prefer JSON array response for clean parsing
+@dataclass
+class MultiDetection:
+    """Per-image outcome of detect_ingredients_many (index-aligned with the inputs)."""
+    results: List[Optional[List[str]]] = field(default_factory=list)
+    errors: List[Optional[BaseException]] = field(default_factory=list)
+    ingredients: List[str] = field(default_factory=list)  # merged, deduped, clamped
+
+    @property
+    def ok(self) -> bool:
+        return not any(self.errors)
+
+def _parse_packed(text: str, n: int):
+    """Return (per_image, merged); per_image is None when the reply isn't one list per photo."""
     try:
-        from google.generativeai.types import GenerationConfig
-        if PILImage:
-            img = PILImage.open(io.BytesIO(data))
-            resp = client.generate_content(
-                [img, {"text": _PROMPT_JSON}],
-                generation_config=GenerationConfig(
-                    response_mime_type="application/json",
-                    temperature=0.2,
-                ),
-            )
-        else:
-            image_part = {
-                "inline_data": {
-                    "mime_type": mime,
-                    "data": base64.b64encode(data).decode("utf-8"),
-                }
-            }
-            resp = client.generate_content(
-                [image_part, {"text": _PROMPT_JSON}],
-                generation_config=GenerationConfig(
-                    response_mime_type="application/json",
-                    temperature=0.2,
-                ),
-            )
+        parsed = repair_json(text or "")
+    except ValueError:
+        return None, _normalize_lines(text or "")
+    if isinstance(parsed, dict):
+        parsed = parsed.get("images") or parsed.get("ingredients") or []
+    if not isinstance(parsed, list):
+        return None, []
+    if parsed and all(isinstance(x, list) for x in parsed):
+        per = [[str(y).strip() for y in x if str(y).strip()] for x in parsed]
+        merged = [it for p in per for it in p]
+        return (per if len(per) == n else None), merged
+    return None, [str(x).strip() for x in parsed if str(x).strip()]
 
+def detect_ingredients_packed(
+    images: Sequence[ImageSource],
+    client,
+    max_items: int = 20,
+    cache: Optional[DetectionCache] = None,
+    image_options: Optional[ImageOptions] = None,
+    policy: Optional[CallPolicy] = None,
+) -> MultiDetection:
+    """
+    Detect over several images with ONE generate_content call (N round-trips -> 1).
+    Asks for one JSON array per photo; if the model answers with a single merged
+    list per-image `results` stay None and only `ingredients` is filled.
+    Cached images are left out of the request.
+    Callers should keep len(images) <= MAX_IMAGES_PER_REQUEST (see detect_ingredients_many).
+    """
+    images = list(images)
+    out = MultiDetection(results=[None] * len(images), errors=[None] * len(images))
+    todo: List[tuple] = []  # (index, data, key)
+    for i, img in enumerate(images):
         try:
-            parsed = _json.loads(resp.text)
-        except Exception:
-            parsed = resp.text
-
-        if isinstance(parsed, list):
-            items = [str(x).strip() for x in parsed if str(x).strip()]
-        elif isinstance(parsed, dict) and "ingredients" in parsed:
-            items = [str(x).strip() for x in parsed["ingredients"] if str(x).strip()]
-        elif isinstance(parsed, str):
-            items = _normalize_lines(parsed)
+            data = _load(img)
+        except Exception as e:
+            out.errors[i] = e
+            continue
+        key, cached = _cache_lookup(data, max_items, cache, image_options)
+        if cached is not None:
+            out.results[i] = cached
         else:
-            items = []
-    except Exception:
-        # Fallback: let the model return plain lines
-        if PILImage:
-            img = PILImage.open(io.BytesIO(data))
-            resp2 = client.generate_content([img, {"text": _PROMPT_LINES}])
+            todo.append((i, data, key))
+
+    merged: List[str] = []
+    if todo:
+        try:
+            _require_client(client)
+            n = len(todo)
+            parts: list = []
+            payload = 0
+            for k, (_, data, _) in enumerate(todo, 1):
+                image = _prepare(data, image_options)
+                payload += image.payload_bytes
+                parts += [{"text": f"Photo {k}:"}, image.part()]
+            with stage("vision.call", bytes_out=payload, images=n) as st:
+                resp = generate(
+                    client,
+                    [{"role": "user", "parts": parts + [{"text": _PROMPT_JSON_MULTI.format(n=n)}]}],
+                    policy,
+                    generation_config=_json_config(PackedIngredientLists),
+                )
+                st.usage(resp)
+            with stage("vision.parse", images=n):
+                per, merged = _parse_packed(getattr(resp, "text", "") or "", n)
+        except Exception as e:
+            for i, _, _ in todo:
+                out.errors[i] = e
         else:
-            image_part = {
-                "inline_data": {
-                    "mime_type": mime,
-                    "data": base64.b64encode(data).decode("utf-8"),
-                }
-            }
-            resp2 = client.generate_content([image_part, {"text": _PROMPT_LINES}])
-        items = _normalize_lines(getattr(resp2, "text", "") or "")
-
-    return _dedup_clamp(items, max_items)
+            if per is not None:
+                for (i, _, key), items in zip(todo, per):
+                    out.results[i] = _finish(items, max_items, cache, key)
+
+    # per-image lists where we have them, the packed merged list otherwise
+    all_items = [it for r in out.results if r for it in r] + merged
+    out.ingredients = _dedup_clamp(all_items, max_items)
+    return out
+
+def detect_ingredients_many(
+    paths_or_bytes: Sequence[ImageSource],
+    client,
+    max_items: int = 20,
+    max_workers: int = 4,
+    cache: Optional[DetectionCache] = None,
+    image_options: Optional[ImageOptions] = None,
+    policy: Optional[CallPolicy] = None,
+    pack: bool = False,
+    max_images_per_request: int = MAX_IMAGES_PER_REQUEST,
+) -> MultiDetection:
+    """
+    Run detect_ingredients over several images on a bounded thread pool.
+    One failing image does not sink the others: its exception is kept in `errors`.
+    The merged list follows input order and is deduped/clamped like _dedup_clamp.
+    pack=True sends up to `max_images_per_request` images per model call
+    (detect_ingredients_packed) instead of one call per image.
+    """
+    images = list(paths_or_bytes)
+    out = MultiDetection(results=[None] * len(images), errors=[None] * len(images))
+    if not images:
+        return out
+
+    if pack:
+        cap = max(1, int(max_images_per_request))
+        chunks = [images[i:i + cap] for i in range(0, len(images), cap)]
+
+        def _chunk(imgs: list) -> MultiDetection:
+            return detect_ingredients_packed(
+                imgs, client, max_items=max_items, cache=cache, image_options=image_options,
+                policy=policy,
+            )
+
+        workers = max(1, min(int(max_workers), len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bw-detect") as pool:
+            parts = list(pool.map(_chunk, chunks))
+        merged: List[str] = []
+        for c, part in enumerate(parts):
+            out.results[c * cap:c * cap + len(part.results)] = part.results
+            out.errors[c * cap:c * cap + len(part.errors)] = part.errors
+            merged += part.ingredients
+        out.ingredients = _dedup_clamp(merged, max_items)
+        return out
+
+    def _one(img: ImageSource) -> List[str]:
+        return detect_ingredients(
+            img, client, max_items=max_items, cache=cache, image_options=image_options,
+            policy=policy,
+        )
+
+    workers = max(1, min(int(max_workers), len(images)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bw-detect") as pool:
+        futures = [pool.submit(_one, img) for img in images]
+        for i, fut in enumerate(futures):
+            try:
+                out.results[i] = fut.result()
+            except Exception as e:
+                out.errors[i] = e
+
+    merged = [it for r in out.results if r for it in r]
+    out.ingredients = _dedup_clamp(merged, max_items)
+    return out
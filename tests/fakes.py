@@ -0,0 +1,53 @@
+"""Stand-ins for google.generativeai models, shared by the tests."""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeResponse:
+    """What generate_content returns: `.text`, plus `.usage_metadata` when token counts are given."""
+
+    def __init__(self, text, **usage):
+        self.text = text
+        if usage:
+            self.usage_metadata = SimpleNamespace(**usage)
+
+
+def _parts(contents):
+    try:
+        return contents[0]["parts"]
+    except (IndexError, KeyError, TypeError):
+        return []
+
+
+class FakeClient:
+    """
+    Answers every call with `text` (`image_text` for requests that carry an image)
+    after `delay` seconds, or raises `error`. Counts `calls` and keeps each prompt.
+    """
+
+    def __init__(self, text, image_text=None, delay=0.0, error=None, usage=None):
+        self.text, self.image_text = text, image_text
+        self.delay, self.error, self.usage = delay, error, usage or {}
+        self.calls = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def _answer(self, contents):
+        parts = _parts(contents)
+        with self._lock:
+            self.calls += 1
+            self.prompts.extend(p["text"] for p in parts if "text" in p)
+        if self.error is not None:
+            raise self.error
+        image = self.image_text is not None and any("inline_data" in p for p in parts)
+        return FakeResponse(self.image_text if image else self.text, **self.usage)
+
+    def generate_content(self, contents, **kwargs):
+        time.sleep(self.delay)
+        return self._answer(contents)
+
+    async def generate_content_async(self, contents, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self._answer(contents)
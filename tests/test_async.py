@@ -0,0 +1,42 @@
+import asyncio
+import json
+from pathlib import Path
+
+from bitewise.imaging import RAW_IMAGE_OPTIONS
+from bitewise.recipes import suggest_recipes_async
+from bitewise.vision import detect_ingredients_async
+
+from .fakes import FakeResponse
+
+FRIDGE = Path(__file__).resolve().parents[1] / "examples" / "sample_fridge.jpg"
+
+
+class AsyncFakeClient:
+    def __init__(self, text):
+        self.text = text
+        self.in_flight = self.peak = 0
+
+    async def generate_content_async(self, *args, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return FakeResponse(self.text)
+
+
+def test_detect_async_runs_concurrently_on_one_loop():
+    client = AsyncFakeClient('["Milk", "Eggs"]')
+
+    async def main():
+        # distinct max_items: identical in-flight requests would be coalesced (singleflight.py)
+        return await asyncio.gather(*(detect_ingredients_async(str(FRIDGE), client, max_items=20 + i, image_options=RAW_IMAGE_OPTIONS) for i in range(20)))
+
+    results = asyncio.run(main())
+    assert all(r == ["Milk", "Eggs"] for r in results)
+    assert client.peak == 20
+
+
+def test_suggest_async_applies_guard():
+    raw = '{"recipes":[{"name":"t","ingredients":["Rice","Bacon"],"estimated_calories":300}]}'
+    out = asyncio.run(suggest_recipes_async(AsyncFakeClient(raw), ["rice"], 400))
+    assert json.loads(out)["recipes"][0]["ingredients"] == ["Rice"]
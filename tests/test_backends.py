@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from bitewise.backends import InjectedError, RecordingClient, ReplayClient, ReplayMiss, fingerprint
+from bitewise.policy import CallPolicy
+from bitewise.recipes import create_client, suggest_recipes_from_ingredients, suggest_recipes_stream
+
+from .fakes import FakeResponse
+
+PAYLOAD = {"recipes": [{"name": "Rice Bowl", "ingredients": ["rice", "egg"], "estimated_calories": 420}]}
+
+
+class LiveStub:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, *args, **kwargs):
+        self.calls += 1
+        if kwargs.get("stream"):
+            text = json.dumps(PAYLOAD)
+            return iter([FakeResponse(text[:20]), FakeResponse(text[20:])])
+        return FakeResponse(json.dumps(PAYLOAD))
+
+
+def test_fingerprint_ignores_timeouts_and_hashes_bytes():
+    a = fingerprint([{"parts": [{"inline_data": {"data": b"x" * 10}}]}], request_options={"timeout": 3})
+    b = fingerprint([{"parts": [{"inline_data": {"data": b"x" * 10}}]}])
+    assert a == b
+    assert a != fingerprint([{"parts": [{"inline_data": {"data": b"y" * 10}}]}])
+
+
+def test_record_then_replay_offline(tmp_path):
+    live = LiveStub()
+    rec = RecordingClient(live, str(tmp_path))
+    first = suggest_recipes_from_ingredients(rec, ["rice", "egg"], 500)
+    list(suggest_recipes_stream(rec, ["rice", "egg"], 500))
+    assert rec.recorded == 2 and live.calls == 2
+
+    replay = ReplayClient(str(tmp_path))
+    # a deadline policy adds request_options; the fingerprint still matches
+    again = suggest_recipes_from_ingredients(replay, ["rice", "egg"], 500, policy=CallPolicy(deadline=5))
+    assert json.loads(again) == json.loads(first)
+    streamed = list(suggest_recipes_stream(replay, ["rice", "egg"], 500))
+    assert [r["name"] for r in streamed] == ["Rice Bowl"]
+
+    with pytest.raises(ReplayMiss):
+        suggest_recipes_from_ingredients(replay, ["tofu"], 500)
+
+
+def test_replay_error_injection_and_backend_spec(tmp_path, monkeypatch):
+    RecordingClient(LiveStub(), str(tmp_path)).generate_content(["hi"])
+    flaky = ReplayClient(str(tmp_path), error_rate=1.0, seed=1)
+    with pytest.raises(InjectedError):
+        flaky.generate_content(["hi"])
+
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    client = create_client(backend=f"replay:{tmp_path}?latency=0.001&seed=3")
+    assert isinstance(client, ReplayClient) and client.latency == 0.001
+    assert client.generate_content(["hi"]).text == json.dumps(PAYLOAD)
@@ -0,0 +1,55 @@
+import io
+import json
+import shutil
+from pathlib import Path
+
+from bitewise.batch import BatchRunner, jobs_from_dir, jobs_from_jsonl
+
+from .fakes import FakeClient
+
+SAMPLE = Path(__file__).resolve().parents[1] / "examples" / "sample_fridge.jpg"
+DETECTED = '["Eggs", "Spinach"]'
+RECIPES = json.dumps({"recipes": [{"name": "Frittata", "ingredients": ["eggs", "spinach"], "estimated_calories": 350}]})
+
+
+def _jobs_file(tmp_path):
+    shutil.copy(SAMPLE, tmp_path / "fridge.jpg")
+    lines = [
+        {"id": "d1", "type": "detect", "image": "fridge.jpg"},
+        {"id": "s1", "type": "suggest", "ingredients": ["rice", "eggs"], "calories": 500},
+        {"id": "p1", "type": "plan", "images": ["fridge.jpg"], "diets": "Vegetarian"},
+        {"id": "bad", "type": "suggest", "ingredients": ["rice"]},  # no calories anywhere
+    ]
+    path = tmp_path / "jobs.jsonl"
+    path.write_text("\n".join(json.dumps(x) for x in lines) + "\n")
+    return path
+
+
+def test_jsonl_jobs_run_and_stream_results(tmp_path):
+    jobs = list(jobs_from_jsonl(str(_jobs_file(tmp_path))))
+    jobs[2].calories = 600
+    out = io.StringIO()
+    totals = BatchRunner(FakeClient(RECIPES, image_text=DETECTED), max_workers=2).run(jobs, out)
+    recs = {r["id"]: r for r in map(json.loads, out.getvalue().splitlines())}
+    assert totals["ok"] == 3 and totals["failed"] == 1
+    assert recs["d1"]["ingredients"] == ["Eggs", "Spinach"]
+    assert recs["p1"]["recipes"][0]["name"] == "Frittata"
+    assert not recs["bad"]["ok"] and "calories" in recs["bad"]["error"]
+
+
+def test_checkpoint_resumes_and_shares_cache(tmp_path):
+    for name in ("a.jpg", "b.jpg", "sub/c.jpg"):
+        (tmp_path / "imgs" / name).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(SAMPLE, tmp_path / "imgs" / name)
+    ck = str(tmp_path / "done.txt")
+    (tmp_path / "done.txt").write_text("a.jpg\n")
+
+    client = FakeClient(RECIPES, image_text=DETECTED)
+    out = io.StringIO()
+    totals = BatchRunner(client, max_workers=2).run(jobs_from_dir(str(tmp_path / "imgs")), out, checkpoint=ck)
+    assert totals["skipped"] == 1 and totals["ok"] == 2
+    assert sorted(json.loads(line)["id"] for line in out.getvalue().splitlines()) == ["b.jpg", "sub/c.jpg"]
+    assert set(open(ck).read().split()) == {"a.jpg", "b.jpg", "sub/c.jpg"}
+
+    totals = BatchRunner(client).run(jobs_from_dir(str(tmp_path / "imgs")), io.StringIO(), checkpoint=ck)
+    assert totals == {"ok": 0, "failed": 0, "skipped": 3, "seconds": totals["seconds"]}
@@ -0,0 +1,52 @@
+import json
+
+from bitewise.cache import RecipeCache
+from bitewise.recipes import suggest_recipes_from_ingredients
+
+from .fakes import FakeClient
+
+
+RAW = '{"recipes":[{"name":"Fried Rice","ingredients":["rice","eggs"],"estimated_calories":420}]}'
+
+
+def test_exact_hit_after_normalization():
+    client, cache = FakeClient(RAW), RecipeCache()
+    suggest_recipes_from_ingredients(client, ["Rice", "Eggs"], 500, cache=cache)
+    out = suggest_recipes_from_ingredients(client, ["eggs", " rice "], 500, cache=cache)
+    assert client.calls == 1 and cache.stats()["exact_hits"] == 1
+    assert json.loads(out)["recipes"][0]["name"] == "Fried Rice"
+
+
+def test_subset_hit_for_extra_item_and_higher_limit():
+    client, cache = FakeClient(RAW), RecipeCache()
+    suggest_recipes_from_ingredients(client, ["rice", "eggs"], 500, allergies=["Nuts"], cache=cache)
+    suggest_recipes_from_ingredients(client, ["rice", "eggs", "peas"], 600, cache=cache)
+    assert client.calls == 1 and cache.stats()["subset_hits"] == 1
+
+
+def test_incompatible_constraints_miss():
+    k = RecipeCache.key
+    cache = RecipeCache()
+    cache.put(k({"rice", "eggs"}, 500), RAW)
+    assert cache.get(k({"rice", "eggs"}, 400)) is None                      # lower limit
+    assert cache.get(k({"rice", "eggs"}, 500, allergies={"eggs"})) is None  # stricter allergies
+    assert cache.get(k({"rice", "eggs"}, 500, cuisines={"italian"})) is None
+    assert cache.get(k({"rice", "eggs", "a", "b"}, 500)) is None            # too little coverage
+    assert cache.stats()["misses"] == 4
+
+
+def test_lru_eviction():
+    cache = RecipeCache(maxsize=1)
+    cache.put(RecipeCache.key({"a"}, 1), "x")
+    cache.put(RecipeCache.key({"b"}, 1), "y")
+    assert cache.stats()["entries"] == 1
+    assert cache.get(RecipeCache.key({"a"}, 1)) is None
+
+
+def test_keto_entries_are_not_reused_without_keto():
+    k = RecipeCache.key
+    cache = RecipeCache()
+    cache.put(k({"rice", "eggs"}, 500, diets={"keto", "vegetarian"}), RAW)  # may contain butter
+    assert cache.get(k({"rice", "eggs"}, 500, diets={"vegetarian"})) is None
+    cache.put(k({"rice", "eggs"}, 500, diets={"keto", "vegetarian", "nut-free"}), RAW)
+    assert cache.get(k({"rice", "eggs"}, 500, diets={"keto", "vegetarian"})) == RAW
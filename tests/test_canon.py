@@ -0,0 +1,15 @@
+from bitewise.canon import canonical_id
+
+
+def test_plurals_modifiers_and_synonyms_collapse():
+    assert canonical_id("Tomatoes") == canonical_id("tomato (diced)") == "tomato"
+    assert canonical_id("berries") == "berry"
+    assert canonical_id("Canned tuna in water") == canonical_id("tuna")
+    assert canonical_id("Garbanzo Beans") == canonical_id("chickpeas")
+    assert canonical_id("extra virgin olive oil") == "olive oil"
+
+
+def test_distinct_ingredients_stay_distinct():
+    assert canonical_id("olive oil") != canonical_id("oil")
+    assert canonical_id("sweet potatoes") != canonical_id("potato")
+    assert canonical_id("hummus") == "hummus" and canonical_id("asparagus") == "asparagus"
@@ -0,0 +1,78 @@
+import json
+
+from bitewise.dietary import compile_rule, ingredient_classes
+from bitewise.policy import CallPolicy, CircuitBreaker
+from bitewise.recipes import enforce_allowed_ingredients, suggest_recipes_from_ingredients, suggest_recipes_stream
+
+from .fakes import FakeClient, FakeResponse
+
+PANTRY = ["eggs", "spinach", "rice", "bacon", "cheddar", "soy sauce", "walnuts", "zucchini", "celery"]
+
+
+def test_classification_uses_canonical_phrases():
+    assert ingredient_classes("Canned tuna in water") == ["fish"]
+    assert ingredient_classes("Prawns") == ["shellfish"]
+    assert ingredient_classes("peanut butter") == ["nut", "legume"]  # not dairy
+    assert ingredient_classes("unsweetened almond milk") == ["nut"]
+    assert ingredient_classes("eggplant") == [] and ingredient_classes("butternut squash") == []
+    assert set(ingredient_classes("soy sauce")) == {"soy", "gluten"}
+
+
+def test_free_qualifiers_lift_classes():
+    assert ingredient_classes("gluten-free soy sauce") == ["soy"]
+    assert ingredient_classes("dairy-free cheese") == []
+    assert ingredient_classes("vegan mayo") == []
+
+
+def test_rules_for_app_allergies_and_diets():
+    rule = compile_rule(["Lactose", "Nuts", "Shellfish", "Eggs", "Soy", "Fish"], None)
+    assert rule.violations(PANTRY + ["shrimp", "salmon"]) == ["eggs", "cheddar", "soy sauce", "walnuts", "shrimp", "salmon"]
+    assert compile_rule(None, ["Vegan"]).violations(["eggs", "honey", "tofu", "bacon"]) == ["eggs", "honey", "bacon"]
+    assert compile_rule(None, ["Keto"]).violations(["rice", "zucchini", "chickpeas", "sugar", "bacon"]) == ["rice", "chickpeas", "sugar"]
+    assert compile_rule(None, ["Gluten-Free"]).violations(["bread", "gluten-free soy sauce", "rice"]) == ["bread"]
+    assert compile_rule(["Celery"], None).violations(["celery sticks", "celeriac"]) == ["celery sticks"]
+    assert not compile_rule(None, ["Mediterranean"])  # unknown diets stay prompt-only
+    assert compile_rule(["eggs"], ["keto"]) is compile_rule(["Eggs"], ["Keto"])  # compiled once
+
+
+def test_guard_drops_violating_recipes():
+    raw = json.dumps({"recipes": [
+        {"name": "Bacon Omelette", "ingredients": ["eggs", "bacon"], "estimated_calories": 400},
+        {"name": "Spinach Omelette", "ingredients": ["eggs", "spinach"], "estimated_calories": 300},
+        {"name": "Shrimp Rice", "ingredients": ["rice", "shrimp"], "estimated_calories": 450},
+    ]})
+    out = json.loads(enforce_allowed_ingredients(raw, PANTRY, ["Vegetarian"]))
+    assert [r["name"] for r in out["recipes"]] == ["Spinach Omelette"]
+    out = json.loads(enforce_allowed_ingredients(raw, PANTRY, None, allergies=["Eggs"]))
+    assert out["recipes"] == [{"name": "Shrimp Rice", "ingredients": ["rice"], "estimated_calories": 450}]
+    out = json.loads(enforce_allowed_ingredients(raw, PANTRY, None, allergies=["Shellfish", "Eggs"]))
+    assert out["recipes"] == []  # checked before off-pantry items are trimmed
+
+
+class StreamClient:
+    def __init__(self, text):
+        self.text = text
+
+    def generate_content(self, *args, **kwargs):
+        return iter([FakeResponse(self.text[i:i + 16]) for i in range(0, len(self.text), 16)])
+
+
+def test_stream_applies_allergy_rules():
+    raw = json.dumps({"recipes": [
+        {"name": "Walnut Salad", "ingredients": ["spinach", "walnuts"], "estimated_calories": 300},
+        {"name": "Zucchini Eggs", "ingredients": ["zucchini", "eggs"], "estimated_calories": 250},
+    ]})
+    out = list(suggest_recipes_stream(StreamClient(raw), PANTRY, 500, allergies=["Tree nuts"]))
+    assert [r["name"] for r in out] == ["Zucchini Eggs"]
+
+
+def test_fallback_placeholders_obey_allergies_and_diets():
+    rules = dict(allergies=["Eggs", "Shellfish"], diets=["Vegan"])
+    offline = json.loads(suggest_recipes_from_ingredients(None, ["eggs", "milk", "shrimp"], 600, **rules))
+    assert offline["recipes"] == []
+
+    policy = CallPolicy(max_attempts=1, breaker=CircuitBreaker())
+    degraded = json.loads(suggest_recipes_from_ingredients(
+        FakeClient("", error=ConnectionError("backend unavailable")), ["eggs", "milk", "shrimp", "spinach"], 600, policy=policy, **rules))
+    assert degraded["recipes"]
+    assert all(r["ingredients"] == ["spinach"] for r in degraded["recipes"])
@@ -0,0 +1,21 @@
+from bitewise.fewshot import estimate_tokens, select_few_shots
+from bitewise.prompts import FEW_SHOT_BLOCK
+from bitewise.recipes import prompt_stats
+
+
+def test_selects_matching_diet_and_cuisine_first():
+    shots = select_few_shots(["zucchini", "ground beef"], ["Italian"], None, ["Keto"], k=2)
+    assert len(shots) == 2
+    assert "Dietary Preferences: Keto" in shots[0] and "Cuisines: Italian" in shots[0]
+
+
+def test_respects_token_budget_but_keeps_one_example():
+    shots = select_few_shots(["rice"], k=5, token_budget=300)
+    assert sum(estimate_tokens(s) for s in shots) <= 300
+    assert len(select_few_shots(["rice"], token_budget=1)) == 1
+
+
+def test_prompt_stats_reports_savings():
+    stats = prompt_stats(["rice", "chicken"], 500, ["Chinese"])
+    assert stats["prompt_chars"] < stats["full_prompt_chars"]
+    assert stats["full_prompt_chars"] > len(FEW_SHOT_BLOCK)
@@ -0,0 +1,40 @@
+import io
+
+import pytest
+
+from bitewise.imaging import ImageOptions, RAW_IMAGE_OPTIONS, preprocess_image
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _jpeg(size, orientation=None):
+    buf = io.BytesIO()
+    img = Image.new("RGB", size, (200, 30, 30))
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        img.save(buf, format="JPEG", quality=95, exif=exif)
+    else:
+        img.save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+
+def test_downscales_to_max_edge():
+    prep = preprocess_image(_jpeg((4000, 3000)), ImageOptions(max_edge=1000))
+    assert max(prep.size) == 1000 and prep.original_size == (4000, 3000)
+    assert prep.payload_bytes < prep.original_bytes and prep.mime == "image/jpeg"
+
+
+def test_applies_exif_orientation():
+    prep = preprocess_image(_jpeg((400, 200), orientation=6), ImageOptions(max_edge=None))
+    assert prep.size == (200, 400)
+
+
+def test_webp_and_raw_passthrough():
+    data = _jpeg((800, 600))
+    assert preprocess_image(data, ImageOptions(format="WEBP", max_edge=400)).mime == "image/webp"
+    assert preprocess_image(data, RAW_IMAGE_OPTIONS).data == data
+
+
+def test_undecodable_bytes_pass_through():
+    assert preprocess_image(b"not an image").data == b"not an image"
@@ -0,0 +1,71 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from bitewise import instrument
+from bitewise.cache import RecipeCache
+from bitewise.instrument import CallbackSink, PrometheusSink, count, set_sink, stage
+from bitewise.recipes import suggest_recipes_from_ingredients
+from bitewise.vision import detect_ingredients
+
+from .fakes import FakeClient
+
+SAMPLE = Path(__file__).resolve().parents[1] / "examples" / "sample_fridge.jpg"
+RECIPES = json.dumps({"recipes": [
+    {"name": "Omelette", "ingredients": ["eggs", "milk", "bacon"], "estimated_calories": 300},
+    {"name": "Bacon", "ingredients": ["bacon"], "estimated_calories": 500},
+]})
+USAGE = {"prompt_token_count": 120, "candidates_token_count": 30}
+
+
+@pytest.fixture
+def events():
+    out = []
+    set_sink(CallbackSink(out.append))
+    yield out
+    set_sink(None)
+
+
+def test_noop_without_sink():
+    assert instrument.get_sink() is None
+    with stage("x") as st:
+        st.set(bytes_out=1)
+    assert stage("x") is stage("y")  # shared no-op object
+
+
+def test_pipeline_stages_tokens_and_counters(events):
+    client, cache = FakeClient(RECIPES, image_text='["Eggs", "Milk"]', usage=USAGE), RecipeCache()
+    items = detect_ingredients(str(SAMPLE), client)
+    suggest_recipes_from_ingredients(client, items, 600, cache=cache)
+    suggest_recipes_from_ingredients(client, items, 600, cache=cache)
+
+    stages = {e["stage"]: e for e in events if "stage" in e}
+    for name in ("image.read", "image.preprocess", "vision.call", "vision.parse",
+                 "prompt.build", "recipe.call", "recipe.guard"):
+        assert name in stages and stages[name]["seconds"] >= 0
+    assert stages["vision.call"]["prompt_tokens"] == 120 and stages["vision.call"]["bytes_out"] > 0
+    assert stages["recipe.guard"]["recipes_in"] == 2 and stages["recipe.guard"]["recipes_out"] == 1
+
+    counters = [(e["counter"], e.get("outcome"), e["value"]) for e in events if "counter" in e]
+    assert ("cache", "miss", 1) in counters and ("cache", "hit", 1) in counters
+    assert ("guard_dropped_recipes", None, 1) in counters
+    assert ("guard_dropped_ingredients", None, 2) in counters
+
+
+def test_prometheus_textfile(tmp_path):
+    path = tmp_path / "bitewise.prom"
+    sink = PrometheusSink(str(path), interval=0)
+    set_sink(sink)
+    try:
+        with pytest.raises(RuntimeError):
+            with stage("recipe.call", bytes_out=10):
+                raise RuntimeError("boom")
+        count("fallback", reason="offline")
+    finally:
+        set_sink(None)
+    text = path.read_text()
+    assert 'bitewise_stage_seconds_count{stage="recipe.call"} 1' in text
+    assert 'bitewise_stage_errors_total{stage="recipe.call"} 1' in text
+    assert 'bitewise_stage_bytes_total{stage="recipe.call",direction="out"} 10' in text
+    assert 'bitewise_fallback_total{reason="offline"} 1' in text
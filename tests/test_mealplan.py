@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from bitewise.policy import CallPolicy, CircuitBreaker
+from bitewise.recipes import _split_pantry, suggest_meal_plan
+from bitewise.schemas import parse_meal_plan
+
+from .fakes import FakeClient
+
+PANTRY = ["eggs", "spinach", "rice", "chicken", "tomatoes", "onion", "garlic", "zucchini", "cheese", "beans"]
+
+
+def _day(n, *recipes):
+    return {"day": n, "recipes": [{"name": name, "ingredients": ing, "estimated_calories": kcal}
+                                  for name, ing, kcal in recipes]}
+
+
+def test_whole_plan_is_one_call_and_every_day_is_guarded():
+    client = FakeClient(json.dumps({"days": [
+        _day(1, ("Spinach Omelette", ["eggs", "spinach", "butter"], 320)),
+        _day(2, ("Chicken Rice", ["chicken", "rice", "soy sauce"], 540)),
+        _day(3, ("Ham Frittata", ["eggs", "ham", "onion"], 400), ("Tomato Salad", ["tomatoes", "onion"], 120)),
+        _day(4, ("Zucchini Gratin", ["zucchini", "cheese", "garlic"], 900)),
+    ]}))
+    out = json.loads(suggest_meal_plan(client, PANTRY, 600, days=4, diets=["Vegetarian"]))
+
+    assert client.calls == 1
+    assert "4 days" in client.prompts[0] and "exactly 4 objects" in client.prompts[0]
+    days = {d["day"]: [r["name"] for r in d["recipes"]] for d in out["days"]}
+    assert days == {1: ["Spinach Omelette"], 2: [], 3: ["Tomato Salad"], 4: []}  # meat / over the limit dropped
+    assert out["days"][0]["recipes"][0]["ingredients"] == ["eggs", "spinach"]  # butter is not an allowed extra
+    assert out["unused"] == ["rice", "chicken", "garlic", "zucchini", "cheese", "beans"]
+
+
+def test_repeated_dishes_are_dropped_and_each_day_keeps_one_recipe():
+    client = FakeClient(json.dumps({"days": [
+        _day(1, ("Tomato Salad", ["tomatoes", "onion"], 120), ("Spinach Omelette", ["eggs", "spinach"], 320)),
+        _day(2, ("tomato salad ", ["tomatoes", "garlic"], 110), ("Bean Stew", ["beans", "onion"], 450)),
+        _day(3, ("Bean Stew", ["beans", "tomatoes"], 430)),
+    ]}))
+    out = json.loads(suggest_meal_plan(client, PANTRY, 600, days=3))
+
+    days = {d["day"]: [r["name"] for r in d["recipes"]] for d in out["days"]}
+    assert days == {1: ["Tomato Salad"], 2: ["Bean Stew"], 3: []}
+    assert all(sum(r["estimated_calories"] for r in d["recipes"]) <= 600 for d in out["days"])
+
+
+def test_parser_numbers_days_and_pads_missing_ones():
+    text = '```json\n{"days": [{"day": "2", "recipes": [{"name": "A", "ingredients": "rice, egg"}]},' \
+           ' [{"name": "B", "ingredients": ["x"]}], {"day": 9, "recipes": []}]}\n```'
+    plan = parse_meal_plan(text, 3)
+    assert [d["day"] for d in plan["days"]] == [1, 2, 3]
+    assert [r["name"] for d in plan["days"] for r in d["recipes"]] == ["A"]  # day 2 given twice: first wins
+    with pytest.raises(ValueError):
+        parse_meal_plan('{"recipes": []}', 3)
+
+
+def test_pantry_split_covers_every_item():
+    for n, days in [(10, 7), (10, 3), (2, 5), (30, 7)]:
+        items = [f"i{k}" for k in range(n)]
+        parts = _split_pantry(items, days)
+        assert len(parts) == days
+        assert set().union(*parts) == set(items)
+
+
+def test_offline_and_degraded_plans_come_from_the_pantry():
+    offline = json.loads(suggest_meal_plan(None, PANTRY, 600, days=4, diets=["Vegetarian"]))
+    assert [d["day"] for d in offline["days"]] == [1, 2, 3, 4]
+    assert all(d["recipes"] for d in offline["days"])
+    names = [r["name"] for d in offline["days"] for r in d["recipes"]]
+    assert len(set(names)) == len(names)
+    assert offline["unused"] == ["chicken"]
+
+    policy = CallPolicy(max_attempts=1, breaker=CircuitBreaker())
+    down = FakeClient("", error=ConnectionError("backend unavailable"))
+    degraded = json.loads(suggest_meal_plan(down, PANTRY, 600, days=4, diets=["Vegetarian"], policy=policy))
+    assert degraded == offline
+
+
+def test_days_are_bounded():
+    with pytest.raises(ValueError):
+        suggest_meal_plan(None, PANTRY, 600, days=0)
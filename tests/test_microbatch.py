@@ -0,0 +1,152 @@
+import asyncio
+import json
+import re
+import threading
+import urllib.request
+
+from bitewise.cache import RecipeCache
+from bitewise.microbatch import RecipeBatcher
+from bitewise.recipes import SuggestRequest, suggest_recipes_batch
+from bitewise.schemas import parse_packed_recipes
+from bitewise.serve import BiteWiseServer
+
+from .fakes import FakeResponse
+
+
+class PackingClient:
+    """Answers every request block in the prompt with one recipe made of its own pantry (+ ham)."""
+
+    def __init__(self, skip=()):
+        self.prompts = []
+        self.skip = set(skip)
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, **kwargs):
+        prompt = contents[0]["parts"][0]["text"]
+        with self._lock:
+            self.prompts.append(prompt)
+        blocks = re.findall(r"^Request (r\d+):\nIngredients: (.*)$", prompt, re.M)
+        if not blocks:  # a single (unpacked) suggest call
+            pantry = re.findall(r"^Ingredients: (.*)$", prompt, re.M)[-1].split(", ")
+            return FakeResponse(json.dumps({"recipes": [{"name": "Solo", "ingredients": pantry, "estimated_calories": 300}]}))
+        results = [
+            {"id": rid, "recipes": [{"name": f"Dish {rid}", "ingredients": items.split(", ") + ["ham"],
+                                     "estimated_calories": 300}]}
+            for rid, items in blocks if rid not in self.skip
+        ]
+        return FakeResponse(json.dumps({"results": results}))
+
+
+def _recipes(text):
+    return json.loads(text)["recipes"]
+
+
+def test_batch_packs_requests_into_one_call_and_guards_each_part():
+    client = PackingClient()
+    outs = suggest_recipes_batch(client, [
+        SuggestRequest(["rice", "eggs"], 500),
+        {"ingredients": ["tofu", "spinach"], "calories": 600, "diets": ["Vegan"]},
+        SuggestRequest(["chicken", "rice"], 700, allergies=["Nuts"]),
+    ])
+    assert len(client.prompts) == 1
+    prompt = client.prompts[0]
+    assert prompt.count("Use ONLY that request's ingredients") == 1  # static rules sent once
+    assert "Request r3:" in prompt and "Dietary Preferences: Vegan" in prompt
+
+    assert _recipes(outs[0])[0]["ingredients"] == ["rice", "eggs"]  # ham is not in this pantry
+    assert _recipes(outs[1]) == []  # ham breaks Vegan
+    assert _recipes(outs[2])[0]["ingredients"] == ["chicken", "rice"]
+
+
+def test_duplicates_and_cache_hits_are_not_packed_and_missing_parts_are_asked_alone():
+    cache = RecipeCache()
+    client = PackingClient(skip={"r2"})
+    outs = suggest_recipes_batch(client, [
+        SuggestRequest(["rice", "eggs"], 500),
+        SuggestRequest(["Rice", "egg"], 500),  # same payload after canonicalization
+        SuggestRequest(["tomatoes", "onion"], 300),
+    ], cache=cache)
+    assert outs[0] == outs[1]
+    assert len(client.prompts) == 2  # the packed call + r2 ("tomatoes, onion") alone
+    assert "Request r2:" in client.prompts[0] and "Request r3:" not in client.prompts[0]
+    assert _recipes(outs[2])[0]["name"] == "Solo"
+
+    again = suggest_recipes_batch(client, [SuggestRequest(["eggs", "rice"], 500)], cache=cache)
+    assert again == outs[:1] and len(client.prompts) == 2
+
+
+def test_offline_batch_uses_fallback_per_request():
+    outs = suggest_recipes_batch(None, [SuggestRequest(["rice", "eggs"], 500), SuggestRequest([], 500)])
+    assert _recipes(outs[0]) and _recipes(outs[1]) == []
+
+
+def test_packed_parser_matches_ids_then_positions():
+    ids = ["r1", "r2"]
+    got = parse_packed_recipes('{"results": [{"id": "r2", "recipes": [{"name": "B", "ingredients": ["x"]}]}]}', ids)
+    assert list(got) == ["r2"]
+    got = parse_packed_recipes('[[{"name": "A", "ingredients": ["x"]}], {"recipes": []}]', ids)
+    assert [r["name"] for r in got["r1"]] == ["A"] and got["r2"] == []
+
+
+def test_batcher_gathers_concurrent_threads_into_one_call():
+    client = PackingClient()
+    pantries = [["rice", f"item{i}"] for i in range(5)]
+    results = [None] * 5
+    with RecipeBatcher(client, window=0.2) as batcher:
+        def _one(i):
+            results[i] = batcher.suggest(pantries[i], 500)
+        threads = [threading.Thread(target=_one, args=(i,)) for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert batcher.stats()["batches"] == 1 and batcher.stats()["requests"] == 5
+    assert len(client.prompts) == 1
+    for pantry, out in zip(pantries, results):
+        assert _recipes(out)[0]["ingredients"] == pantry
+
+
+def test_batcher_flushes_full_batches_and_serves_asyncio():
+    client = PackingClient()
+
+    async def main(batcher):
+        return await asyncio.gather(*(batcher.asuggest(["rice", f"item{i}"], 500) for i in range(4)))
+
+    with RecipeBatcher(client, window=5.0, max_batch=2) as batcher:
+        outs = asyncio.run(asyncio.wait_for(main(batcher), 2.0))  # full batches never wait out the window
+    assert len(client.prompts) == 2
+    assert [_recipes(o)[0]["ingredients"][1] for o in outs] == [f"item{i}" for i in range(4)]
+
+
+def _post(url, body):
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(req, timeout=10) as r:
+        return r.status, json.loads(r.read())
+
+
+def _get(url):
+    with urllib.request.urlopen(url, timeout=10) as r:
+        return r.read().decode()
+
+
+def test_batch_window_packs_concurrent_suggests():
+    client = PackingClient()
+
+    async def main():
+        server = BiteWiseServer(client, port=0, workers=4, batch_window=0.2)
+        await server.start()
+        base = f"http://127.0.0.1:{server.port}"
+        try:
+            bodies = [json.dumps({"ingredients": ["rice", f"item{i}"], "calories": 500}).encode() for i in range(3)]
+            answers = await asyncio.gather(*(
+                asyncio.to_thread(_post, base + "/suggest", b) for b in bodies
+            ))
+            metrics = await asyncio.to_thread(_get, base + "/metrics")
+        finally:
+            await server.close()
+        return answers, metrics
+
+    answers, metrics = asyncio.run(main())
+    assert len(client.prompts) == 1
+    assert [a[1]["recipes"][0]["ingredients"] for a in answers] == [["rice", f"item{i}"] for i in range(3)]
+    assert "bitewise_microbatch_requests 3" in metrics
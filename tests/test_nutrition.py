@@ -0,0 +1,70 @@
+import json
+
+from bitewise.nutrition import check_recipes, estimate_calories, fit_to_limit, get_table
+from bitewise.recipes import _fallback_recipes, suggest_recipes_from_ingredients
+
+from .fakes import FakeClient
+
+
+def test_lookup_goes_through_canonical_names():
+    t = get_table()
+    assert t.lookup("Tomatoes") == t.lookup("cherry tomatoes") == t.lookup("tomato (diced)")
+    assert t.lookup("canned tuna in water") == t.lookup("tuna")
+    assert t.lookup("peanut butter") != t.lookup("butter")
+    assert t.lookup("dragonfruit powder") is None
+
+
+def test_estimate_scores_a_batch_in_one_pass():
+    est = get_table().estimate([["rice", "egg"], ["eggs", "spinach", "mystery"], []])
+    assert round(est.kcal[0]) == estimate_calories(["rice", "egg"]) == 338
+    assert list(est.known) == [2, 2, 0] and list(est.total) == [2, 3, 0]
+    assert est.carb_share[1] < 0.05 < est.carb_share[0]
+
+
+def test_check_drops_over_limit_and_reranks_heavy_recipes():
+    recipes = [
+        {"name": "Heavy", "ingredients": ["pasta", "bacon", "cheese", "butter"], "estimated_calories": 390},
+        {"name": "Over", "ingredients": ["egg"], "estimated_calories": 650},
+        {"name": "Light", "ingredients": ["egg", "spinach"], "estimated_calories": 250},
+        {"name": "Unknown kcal", "ingredients": ["egg", "spinach"], "estimated_calories": 0},
+    ]
+    out = check_recipes(recipes, 400)
+    assert [r["name"] for r in out] == ["Light", "Unknown kcal", "Heavy"]
+    assert out[1]["estimated_calories"] == 157
+
+
+def test_filled_in_estimate_over_the_limit_is_dropped():
+    recipes = [{"name": "Cheesy Chicken", "ingredients": ["chicken breast", "rice", "olive oil", "cheese"],
+                "estimated_calories": 0}]
+    assert check_recipes(recipes, 400) == []
+    assert check_recipes(recipes, 700)[0]["estimated_calories"] == 652
+
+
+def test_keto_macros_are_checked():
+    recipes = [
+        {"name": "Rice Bowl", "ingredients": ["rice", "egg"], "estimated_calories": 350},
+        {"name": "Zucchini Skillet", "ingredients": ["turkey", "zucchini", "butter"], "estimated_calories": 380},
+    ]
+    assert [r["name"] for r in check_recipes(recipes, 500, ["Keto"])] == ["Zucchini Skillet"]
+    assert len(check_recipes(recipes, 500)) == 2
+
+
+def test_suggest_filters_locally_without_another_call():
+    client = FakeClient(json.dumps({"recipes": [
+        {"name": "Too big", "ingredients": ["rice", "egg"], "estimated_calories": 900},
+        {"name": "Fits", "ingredients": ["rice", "egg"], "estimated_calories": 380},
+    ]}))
+    out = json.loads(suggest_recipes_from_ingredients(client, ["rice", "eggs"], 400))
+    assert [r["name"] for r in out["recipes"]] == ["Fits"]
+
+
+def test_fallback_respects_the_limit():
+    subset, kcal = fit_to_limit(["rice", "bacon", "spinach", "butter"], 400)
+    assert subset == ["rice", "bacon", "spinach"] and kcal <= 400
+    for r in json.loads(_fallback_recipes(["rice", "bacon", "spinach", "butter"], 300))["recipes"]:
+        assert r["estimated_calories"] <= 300
+
+
+def test_fallback_without_local_coverage_keeps_a_conservative_estimate():
+    kcal = [r["estimated_calories"] for r in json.loads(_fallback_recipes(["quark", "skyr"], 500))["recipes"]]
+    assert kcal == [450, 500]
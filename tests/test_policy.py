@@ -0,0 +1,115 @@
+import asyncio
+import json
+import time
+
+import pytest
+from google.api_core import exceptions as gexc
+
+from bitewise.policy import CallPolicy, CircuitBreaker, CircuitOpenError, is_retryable
+from bitewise.recipes import suggest_recipes_from_ingredients
+
+from .fakes import FakeResponse
+
+
+class FlakyClient:
+    """Fails with `errors` (in order) before answering."""
+
+    def __init__(self, errors, text='{"recipes":[{"name":"R","ingredients":["rice"],"estimated_calories":300}]}'):
+        self.errors = list(errors)
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, *args, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return FakeResponse(self.text)
+
+
+def _fast(**kw):
+    return CallPolicy(base_delay=0.001, max_delay=0.002, **kw)
+
+
+def test_retryable_classification():
+    assert is_retryable(gexc.ResourceExhausted("quota")) and is_retryable(gexc.ServiceUnavailable("x"))
+    assert not is_retryable(gexc.InvalidArgument("bad")) and not is_retryable(ValueError())
+
+
+def test_retries_transient_errors_then_succeeds():
+    client = FlakyClient([gexc.TooManyRequests("429"), gexc.ServiceUnavailable("503")])
+    out = suggest_recipes_from_ingredients(client, ["rice"], 400, policy=_fast())
+    assert client.calls == 3 and json.loads(out)["recipes"][0]["name"] == "R"
+
+
+def test_permanent_error_is_not_retried():
+    client = FlakyClient([gexc.InvalidArgument("bad key")])
+    with pytest.raises(gexc.InvalidArgument):
+        suggest_recipes_from_ingredients(client, ["rice"], 400, policy=_fast())
+    assert client.calls == 1
+
+
+def test_open_breaker_fails_fast_to_fallback():
+    policy = _fast(max_attempts=1, breaker=CircuitBreaker(failure_threshold=2, reset_after=60))
+    client = FlakyClient([gexc.ServiceUnavailable("down")] * 5)
+    for _ in range(3):
+        out = suggest_recipes_from_ingredients(client, ["rice"], 400, policy=policy)
+    assert client.calls == 2  # third request never reached the backend
+    assert json.loads(out)["recipes"][0]["name"] == "rice Bowl"
+    with pytest.raises(CircuitOpenError):
+        policy.call(lambda timeout: None)
+
+
+def test_hedge_returns_faster_duplicate():
+    delays = [0.5, 0.0]
+
+    def fn(timeout):
+        time.sleep(delays.pop(0))
+        return "ok"
+
+    policy = CallPolicy(hedge=True, hedge_after=0.05)
+    t0 = time.monotonic()
+    assert policy.call(fn) == "ok"
+    assert time.monotonic() - t0 < 0.4 and policy.stats()["hedges"] == 1
+
+
+def test_permanent_errors_do_not_open_the_breaker():
+    policy = _fast(max_attempts=1, breaker=CircuitBreaker(failure_threshold=2, reset_after=60))
+    client = FlakyClient([ValueError("bad request")] * 3)
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            suggest_recipes_from_ingredients(client, [f"rice{_}"], 400, policy=policy)
+    assert policy.breaker.state == "closed" and client.calls == 3
+
+
+def test_cancelled_half_open_trial_frees_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0.0)
+    breaker.record_failure()
+    policy = _fast(max_attempts=1, breaker=breaker)
+
+    async def slow(timeout):
+        await asyncio.sleep(10)
+
+    async def ok(timeout):
+        return "ok"
+
+    async def main():
+        trial = asyncio.ensure_future(policy.acall(slow))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        return await policy.acall(ok)
+
+    assert asyncio.run(main()) == "ok" and breaker.state == "closed"
+
+
+def test_async_timeouts_are_retried_within_the_deadline():
+    attempts = []
+
+    async def fn(timeout):
+        attempts.append(timeout)
+        if len(attempts) == 1:
+            raise asyncio.TimeoutError
+        return "ok"
+
+    assert asyncio.run(_fast(deadline=5).acall(fn)) == "ok" and len(attempts) == 2
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+
+import pytest
+from google.api_core import exceptions as gexc
+
+from bitewise.pool import ClientPool, PoolMember
+from bitewise.recipes import suggest_recipes_from_ingredients
+from bitewise.vision import detect_ingredients
+
+from .fakes import FakeClient, FakeResponse
+
+SAMPLE = Path(__file__).resolve().parents[1] / "examples" / "sample_fridge.jpg"
+
+
+class Member:
+    def __init__(self, name, fail_with=None):
+        self.name, self.fail_with, self.calls = name, fail_with, 0
+        self._lock = threading.Lock()
+
+    def _answer(self, contents):
+        with self._lock:
+            self.calls += 1
+        if self.fail_with is not None:
+            raise self.fail_with
+        parts = contents[0]["parts"]
+        if any("inline_data" in p for p in parts):
+            return FakeResponse(json.dumps(["Eggs", self.name]))
+        return FakeResponse(json.dumps({"recipes": [{"name": self.name, "ingredients": ["eggs"], "estimated_calories": 300}]}))
+
+    def generate_content(self, contents, **kwargs):
+        return self._answer(contents)
+
+    async def generate_content_async(self, contents, **kwargs):
+        return self._answer(contents)
+
+
+def _pool(*clients, **kw):
+    return ClientPool([PoolMember(client=c, key=c.name) for c in clients], **kw)
+
+
+def test_round_robin_spreads_calls_and_works_as_a_client():
+    a, b = Member("A"), Member("B")
+    pool = _pool(a, b)
+    for _ in range(4):
+        suggest_recipes_from_ingredients(pool, ["eggs"], 500)
+    assert a.calls == 2 and b.calls == 2
+    assert detect_ingredients(str(SAMPLE), pool)[0] == "Eggs"
+
+
+def test_quota_error_parks_member_and_fails_over():
+    bad, good = Member("bad", gexc.ResourceExhausted("quota")), Member("good")
+    pool = _pool(bad, good, park_for=60)
+    out = [json.loads(suggest_recipes_from_ingredients(pool, ["eggs"], 500)) for _ in range(3)]
+    assert all(o["recipes"][0]["name"] == "good" for o in out)
+    assert bad.calls == 1  # parked after the first 429
+    stats = {s["key"]: s for s in pool.stats()}
+    assert stats["bad"]["quota_errors"] == 1 and stats["bad"]["parked_s"] > 0
+
+
+def test_non_quota_errors_are_not_retried_on_other_members():
+    pool = _pool(Member("x", gexc.InvalidArgument("bad request")), Member("y"))
+    with pytest.raises(gexc.InvalidArgument):
+        pool.generate_content([{"parts": [{"text": "hi"}]}])
+
+
+def test_all_parked_raises_last_quota_error_and_async_path():
+    pool = _pool(Member("a", gexc.ResourceExhausted("q")), Member("b", gexc.ResourceExhausted("q")))
+    with pytest.raises(gexc.ResourceExhausted):
+        pool.generate_content([{"parts": [{"text": "hi"}]}])
+
+    ll = _pool(Member("A"), Member("B"), strategy="least_loaded")
+    resp = asyncio.run(ll.generate_content_async([{"parts": [{"text": "hi"}]}]))
+    assert json.loads(resp.text)["recipes"][0]["name"] in {"A", "B"}
+
+
+def test_cancelled_call_frees_its_slot():
+    pool = ClientPool([PoolMember(client=FakeClient("{}", delay=5.0), key="slow")])
+
+    async def main():
+        task = asyncio.ensure_future(pool.generate_content_async([{"parts": [{"text": "hi"}]}]))
+        await asyncio.sleep(0.01)
+        assert pool.stats()[0]["inflight"] == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert pool.stats()[0]["inflight"] == 0
+
+
+def test_from_keys_builds_isolated_members():
+    pool = ClientPool.from_keys(["k1", "k2"], models=["m1", "m2"], factory=lambda k, m: Member(f"{k}/{m}"))
+    assert len(pool.members) == 4 and len({m.key for m in pool.members}) == 2
+    assert "k1" not in pool.members[0].key  # labels never expose the key
+    assert {m.model for m in pool.for_model("m2").members} == {"m2"}
+
+
+def test_make_model_builds_the_async_client_inside_each_loop(monkeypatch):
+    import google.generativeai as genai
+    from bitewise.pool import make_model
+
+    async def fake(self, *args, **kwargs):  # stands in for the SDK call: report the client it would use
+        return self._async_client
+
+    monkeypatch.setattr(genai.GenerativeModel, "generate_content_async", fake)
+    m = make_model("test-key")
+    assert m._client is not None and m._async_client is None  # nothing bound to a loop yet
+
+    async def twice():
+        return await m.generate_content_async("hi"), await m.generate_content_async("hi")
+
+    a, b = asyncio.run(twice())
+    c, _ = asyncio.run(twice())
+    assert a is not None and a is b and c is not a  # one client per event loop
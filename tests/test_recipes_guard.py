@@ -1,5 +1,6 @@
 import json
-from bitewise.recipes import enforce_allowed_ingredients
+from bitewise.prompts import EXTRAS_RULES, KETO_RULES, MEAL_PLAN_TEMPLATE, PACKED_PROMPT_TEMPLATE, PROMPT_TEMPLATE
+from bitewise.recipes import ALLOWED_EXTRAS_KETO, enforce_allowed_ingredients
 
 def _ingredients(json_text):
     data = json.loads(json_text)
@@ -16,3 +17,15 @@ def test_keto_allows_keto_extras_and_singular_plural_inputs():
     # compare case-insensitively
     got = {s.lower() for s in _ingredients(out)}
     assert {"sausages", "olive oil", "butter", "water"}.issubset(got)
+
+def test_irregular_plurals_synonyms_and_modifiers_are_kept():
+    raw = ('{"recipes":[{"name":"t","ingredients":'
+           '["Tomatoes","Berries","Canned tuna in water","Garbanzo beans","Bacon"]}]}')
+    out = enforce_allowed_ingredients(raw, ["tomato", "berry", "tuna", "chickpeas"], diets=None)
+    assert _ingredients(out) == ["Tomatoes", "Berries", "Canned tuna in water", "Garbanzo beans"]
+
+def test_every_prompt_carries_the_shared_rules_the_guard_enforces():
+    for template in (PROMPT_TEMPLATE, MEAL_PLAN_TEMPLATE, PACKED_PROMPT_TEMPLATE):
+        assert EXTRAS_RULES in template and KETO_RULES in template
+    raw = json.dumps({"recipes": [{"name": "t", "ingredients": sorted(ALLOWED_EXTRAS_KETO)}]})
+    assert set(_ingredients(enforce_allowed_ingredients(raw, ["eggs"], diets=["Keto"]))) == ALLOWED_EXTRAS_KETO
@@ -0,0 +1,71 @@
+import json
+
+from bitewise.recipes import suggest_recipes_from_ingredients, suggest_recipes_offline
+from bitewise.retrieval import RecipeIndex, default_index, set_default_index
+
+CORPUS = [
+    {"name": "Tuna Rice Bowl", "ingredients": ["rice", "canned tuna in water", "spinach"], "estimated_calories": 450,
+     "cuisines": ["Japanese"]},
+    {"name": "Egg Fried Rice", "ingredients": ["rice", "eggs", "soy sauce", "oil"], "estimated_calories": 520,
+     "cuisines": ["Chinese"]},
+    {"name": "Spinach Omelette", "ingredients": ["eggs", "spinach", "butter"], "estimated_calories": 320,
+     "diets": ["Low-FODMAP"]},
+    {"name": "Steak Frites", "ingredients": ["steak", "potatoes", "oil"], "estimated_calories": 900},
+]
+
+
+def test_only_cookable_recipes_ranked_by_pantry_coverage():
+    idx = RecipeIndex(CORPUS)
+    out = idx.search(["Eggs", "Rice", "Soy Sauce", "spinach", "tuna"], 600, extras={"oil", "salt"})
+    assert [r["name"] for r in out] == ["Egg Fried Rice", "Tuna Rice Bowl"]  # omelette needs butter
+
+
+def test_calorie_cuisine_allergy_and_diet_filters():
+    idx = RecipeIndex(CORPUS)
+    pantry = ["rice", "eggs", "soy sauce", "spinach", "tuna", "butter", "steak", "potato", "oil"]
+    assert "Steak Frites" not in [r["name"] for r in idx.search(pantry, 800, k=10)]
+    assert idx.search(pantry, 600, cuisines=["Japanese"])[0]["name"] == "Tuna Rice Bowl"
+    assert [r["name"] for r in idx.search(pantry, 600, allergies=["Fish"], k=10)] == ["Egg Fried Rice", "Spinach Omelette"]
+    assert [r["name"] for r in idx.search(pantry, 600, diets=["keto"], k=10)] == ["Spinach Omelette"]
+    assert idx.search(pantry, 600, diets=["Vegan"]) == []
+    assert [r["name"] for r in idx.search(pantry, 600, allergies=["Spinach"], k=10)] == ["Egg Fried Rice"]
+    # diets outside the taxonomy need a tag
+    assert [r["name"] for r in idx.search(pantry, 600, diets=["low fodmap"], k=10)] == ["Spinach Omelette"]
+    assert idx.search(pantry, 600, diets=["no-such-diet"]) == []
+
+
+def test_jsonl_corpus_and_offline_mode(tmp_path, monkeypatch):
+    path = tmp_path / "corpus.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in CORPUS), encoding="utf-8")
+    set_default_index(RecipeIndex.from_jsonl(str(path), seed=True))
+    try:
+        assert len(default_index()) > len(CORPUS)
+        out = json.loads(suggest_recipes_from_ingredients(None, ["eggs", "spinach", "butter"], 400))
+        assert out["recipes"][0]["name"] == "Spinach Omelette"
+        # nothing in the corpus fits: placeholder recipes as before
+        out = json.loads(suggest_recipes_from_ingredients(None, ["saffron"], 400))
+        assert out["recipes"][0]["name"] == "saffron Bowl"
+    finally:
+        set_default_index(None)
+
+
+def test_offline_results_get_the_nutrition_check():
+    corpus = [
+        {"name": "Cheesy Chicken", "ingredients": ["chicken breast", "rice", "olive oil", "cheese"]},
+        {"name": "Plain Rice", "ingredients": ["rice"]},
+    ]
+    set_default_index(RecipeIndex(corpus))
+    try:
+        out = json.loads(suggest_recipes_offline(["chicken breast", "rice", "olive oil", "cheese"], 400))["recipes"]
+    finally:
+        set_default_index(None)
+    assert [r["name"] for r in out] == ["Plain Rice"]  # no calorie figure: local 652 kcal is over the limit
+    assert out[0]["estimated_calories"] > 0
+
+
+def test_scales_to_a_large_corpus():
+    big = [{"name": f"R{i}", "ingredients": [f"item{i % 500}", f"item{(i * 7) % 500}"], "estimated_calories": 100 + i % 700}
+           for i in range(20_000)]
+    idx = RecipeIndex(big)
+    out = idx.search([f"item{i}" for i in range(50)], 400, k=5)
+    assert len(out) == 5 and all(r["estimated_calories"] <= 400 for r in out)
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from bitewise.policy import AdmissionTimeout, CallPolicy, CircuitBreaker
+from bitewise.recipes import suggest_recipes_from_ingredients
+from bitewise.scheduler import Scheduler, TokenBucket, estimate_request_tokens, image_tokens
+
+from .fakes import FakeResponse
+
+SAMPLE = Path(__file__).resolve().parents[1] / "examples" / "sample_fridge.jpg"
+
+
+class Recorder:
+    def __init__(self):
+        self.order = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, **kwargs):
+        with self._lock:
+            self.order.append(contents[0]["parts"][0]["text"])
+        return FakeResponse(json.dumps({"recipes": [{"name": "R", "ingredients": ["rice"], "estimated_calories": 1}]}),
+                            total_token_count=10)
+
+    async def generate_content_async(self, contents, **kwargs):
+        return self.generate_content(contents, **kwargs)
+
+
+def test_token_estimates_cover_text_and_images():
+    with open(SAMPLE, "rb") as f:
+        img = f.read()
+    assert image_tokens(img) >= 258
+    est = estimate_request_tokens([{"parts": [{"inline_data": {"data": img}}, {"text": "x" * 400}]}], 50)
+    assert est == image_tokens(img) + 100 + 50
+
+
+def test_bucket_refill_math():
+    b = TokenBucket(60)  # 1 per second
+    b.take(60)
+    assert 0.9 < b.wait_for(1, b._t) <= 1.0
+
+
+def test_rpm_limit_spaces_calls_and_interactive_jumps_the_queue():
+    sched = Scheduler(rpm=600)  # 10/s, bucket starts full
+    rec = Recorder()
+    bulk, ui = sched.wrap(rec, "bulk"), sched.wrap(rec, "interactive")
+    sched.rpm.level = 0  # drained: everyone queues
+
+    def call(client, tag):
+        client.generate_content([{"parts": [{"text": tag}]}])
+
+    threads = [threading.Thread(target=call, args=(bulk, f"bulk{i}")) for i in range(3)]
+    for t in threads:
+        t.start()
+    time.sleep(0.02)
+    t_ui = threading.Thread(target=call, args=(ui, "ui"))
+    t_ui.start()
+    t0 = time.monotonic()
+    for t in threads + [t_ui]:
+        t.join()
+    assert time.monotonic() - t0 >= 0.25  # 4 calls at 10/s from an empty bucket
+    assert rec.order.index("ui") <= 1  # overtook queued bulk work
+    st = sched.stats()
+    assert st["queue_depth"] == 0 and st["priorities"]["bulk"]["granted"] == 3
+    assert st["priorities"]["interactive"]["wait_max_s"] > 0
+
+
+def test_tpm_settles_to_actual_usage_and_async_path():
+    sched = Scheduler(tpm=100_000, output_tokens=1000)
+    client = sched.wrap(Recorder(), "interactive")
+    before = sched.tpm.level
+    asyncio.run(client.generate_content_async([{"parts": [{"text": "hello"}]}]))
+    assert before - sched.tpm.level < 20  # charged ~10 real tokens, not the 1000+ estimate
+    out = suggest_recipes_from_ingredients(client, ["rice"], 400)
+    assert json.loads(out)["recipes"][0]["name"] == "R"
+
+
+def test_queue_wait_respects_the_call_timeout():
+    sched = Scheduler(rpm=1)  # the second call would wait ~60 s
+    client = sched.wrap(Recorder(), "interactive")
+    policy = CallPolicy(deadline=0.5, breaker=CircuitBreaker(failure_threshold=1))
+    suggest_recipes_from_ingredients(client, ["rice"], 400, policy=policy)
+
+    t0 = time.monotonic()
+    out = suggest_recipes_from_ingredients(client, ["rice", "eggs"], 400, policy=policy)
+    assert time.monotonic() - t0 < 0.5
+    assert json.loads(out)["recipes"][0]["name"] != "R"  # degraded to the fallback, never sent
+    assert len(client.client.order) == 1 and policy.breaker.state == "closed"
+    assert sched.stats()["queue_depth"] == 0
+
+    with pytest.raises(AdmissionTimeout):
+        asyncio.run(client.generate_content_async([{"parts": [{"text": "x"}]}], request_options={"timeout": 0.2}))
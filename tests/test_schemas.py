@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from bitewise.recipes import enforce_allowed_ingredients
+from bitewise.schemas import parse_recipe_list, parse_string_list
+
+
+def test_parses_clean_payload():
+    out = parse_recipe_list('{"recipes":[{"name":"A","ingredients":["rice"],"estimated_calories":300}]}')
+    assert out == {"recipes": [{"name": "A", "ingredients": ["rice"], "estimated_calories": 300}]}
+
+
+def test_repairs_fences_smart_quotes_and_trailing_commas():
+    raw = '```json\n{“recipes”: [{"name": "A", "ingredients": ["rice",], "estimated_calories": "450 kcal"},]}\n```'
+    out = parse_recipe_list(raw)
+    assert out["recipes"][0]["ingredients"] == ["rice"]
+    assert out["recipes"][0]["estimated_calories"] == 450
+
+
+def test_drops_invalid_recipes_and_accepts_bare_list():
+    raw = '[{"name": "", "ingredients": ["x"]}, {"name": "B", "ingredients": "rice, peas"}, 7]'
+    assert parse_recipe_list(raw)["recipes"] == [{"name": "B", "ingredients": ["rice", "peas"]}]
+
+
+def test_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_recipe_list("sorry, I cannot help with that")
+
+
+def test_guard_returns_empty_list_for_garbage():
+    assert json.loads(enforce_allowed_ingredients("not json", ["rice"], None)) == {"recipes": []}
+
+
+def test_string_list():
+    assert parse_string_list('Sure: ["Milk", " Eggs ", ""]') == ["Milk", "Eggs"]
+    assert parse_string_list('{"ingredients": ["Milk"]}') == ["Milk"]
+    assert parse_string_list("Milk\nEggs") is None
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from bitewise.instrument import get_sink
+from bitewise.policy import AdmissionTimeout, CallTimeout, CircuitOpenError
+from bitewise.serve import BiteWiseServer, HTTPError
+
+from .fakes import FakeClient
+
+SAMPLE = Path(__file__).resolve().parents[1] / "examples" / "sample_fridge.jpg"
+DETECTED = '["Eggs", "Spinach"]'
+RECIPES = json.dumps({"recipes": [
+    {"name": "Frittata", "ingredients": ["eggs", "spinach", "ham"], "estimated_calories": 350},
+]})
+
+
+def _multipart(fields, files):
+    boundary = "bwtestboundary"
+    out = b""
+    for k, v in fields.items():
+        out += f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode()
+    for name, data in files:
+        out += (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="{name}"\r\n'
+                f"Content-Type: image/jpeg\r\n\r\n").encode() + data + b"\r\n"
+    return out + f"--{boundary}--\r\n".encode(), f"multipart/form-data; boundary={boundary}"
+
+
+def _post(url, body, ctype):
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": ctype}, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=10) as r:
+            return r.status, json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _get(url):
+    with urllib.request.urlopen(url, timeout=10) as r:
+        return r.read().decode()
+
+
+def test_endpoints_over_http():
+    async def main():
+        server = BiteWiseServer(FakeClient(RECIPES, image_text=DETECTED), port=0, workers=2)
+        await server.start()
+        base = f"http://127.0.0.1:{server.port}"
+        try:
+            with open(SAMPLE, "rb") as f:
+                img = f.read()
+            body, ctype = _multipart({"calories": "500", "diets": "Gluten-Free"}, [("fridge.jpg", img)])
+            plan = await asyncio.to_thread(_post, base + "/plan", body, ctype)
+            suggest = await asyncio.to_thread(
+                _post, base + "/suggest",
+                json.dumps({"ingredients": ["eggs", "spinach"], "calories": 400}).encode(), "application/json",
+            )
+            bad = await asyncio.to_thread(_post, base + "/suggest", b'{"ingredients": ["eggs"]}', "application/json")
+            health = json.loads(await asyncio.to_thread(_get, base + "/healthz"))
+            metrics = await asyncio.to_thread(_get, base + "/metrics")
+        finally:
+            await server.close()
+        return plan, suggest, bad, health, metrics
+
+    plan, suggest, bad, health, metrics = asyncio.run(main())
+    assert plan[0] == 200 and plan[1]["ingredients"] == ["Eggs", "Spinach"]
+    assert plan[1]["recipes"][0]["ingredients"] == ["eggs", "spinach"]  # guarded
+    assert suggest[0] == 200 and suggest[1]["recipes"][0]["name"] == "Frittata"
+    assert bad[0] == 400 and "calories" in bad[1]["error"]
+    assert health["status"] == "ok" and health["online"]
+    assert 'bitewise_http_requests_total{path="/plan",status="200"} 1' in metrics
+    assert 'bitewise_stage_seconds_count{stage="vision.call"}' in metrics
+
+
+def test_server_removes_its_metrics_sink_on_close():
+    async def main():
+        server = BiteWiseServer(FakeClient(RECIPES), port=0)
+        assert get_sink() is None  # constructing a server changes nothing process-wide
+        await server.start()
+        assert get_sink() is server.stages
+        await server.close()
+
+    asyncio.run(main())
+    assert get_sink() is None
+
+
+def test_full_queue_answers_503():
+    async def main():
+        server = BiteWiseServer(FakeClient(RECIPES, image_text=DETECTED, delay=0.2), port=0, workers=1, queue_size=1)
+        await server.start()
+        body = json.dumps({"ingredients": ["eggs"], "calories": 400}).encode()
+        hdrs = {"content-type": "application/json"}
+        try:
+            return await asyncio.gather(*(server.handle("POST", "/suggest", hdrs, body) for _ in range(4)))
+        finally:
+            await server.close()
+
+    statuses = sorted(s for s, _, _ in asyncio.run(main()))
+    assert statuses[0] == 200 and statuses[-1] == 503
+
+
+def test_bad_content_length_and_short_body_get_a_400():
+    async def raw(port, request, half_close=False):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(request)
+        if half_close:
+            writer.write_eof()
+        status = (await reader.readline()).split()[1]
+        writer.close()
+        return int(status)
+
+    async def main():
+        server = BiteWiseServer(FakeClient(RECIPES, image_text=DETECTED), port=0, workers=1)
+        await server.start()
+        try:
+            return [
+                await raw(server.port, b"POST /suggest HTTP/1.1\r\nContent-Length: abc\r\n\r\n"),
+                await raw(server.port, b"POST /suggest HTTP/1.1\r\nContent-Length: -5\r\n\r\n"),
+                await raw(server.port, b"POST /suggest HTTP/1.1\r\nContent-Length: 100\r\n\r\n{}", half_close=True),
+            ]
+        finally:
+            await server.close()
+
+    assert asyncio.run(asyncio.wait_for(main(), 10)) == [400, 400, 400]
+
+
+def test_backend_errors_map_to_503_504_and_others_stay_500():
+    async def status_for(error):
+        server = BiteWiseServer(FakeClient("", error=error), port=0, workers=1)
+        await server.start()
+        body = json.dumps({"ingredients": ["eggs"], "calories": 400}).encode()
+        try:
+            await server.handle("POST", "/suggest", {"content-type": "application/json"}, body)
+        except HTTPError as e:
+            return e.status
+        except Exception:
+            return 500  # what _connection answers for anything unmapped
+        finally:
+            await server.close()
+
+    async def main():
+        return [await status_for(e) for e in (
+            CircuitOpenError("open"), AdmissionTimeout("no quota"), CallTimeout("slow"), ValueError("bug"),
+        )]
+
+    assert asyncio.run(main()) == [503, 503, 504, 500]
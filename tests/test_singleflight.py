@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from bitewise.imaging import RAW_IMAGE_OPTIONS
+from bitewise.recipes import suggest_recipes_async, suggest_recipes_from_ingredients
+from bitewise.singleflight import SingleFlight
+from bitewise.vision import detect_ingredients, detect_ingredients_async
+
+from .fakes import FakeClient
+
+FRIDGE = Path(__file__).resolve().parents[1] / "examples" / "sample_fridge.jpg"
+RAW = '{"recipes":[{"name":"Rice Bowl","ingredients":["Rice"],"estimated_calories":300}]}'
+
+
+def _together(n, fn):
+    barrier = threading.Barrier(n)
+    out, errors = [None] * n, [None] * n
+
+    def run(i):
+        barrier.wait()
+        try:
+            out[i] = fn()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out, errors
+
+
+def test_threads_share_one_detection_call():
+    client = FakeClient('["Milk", "Eggs"]', delay=0.05)
+    out, errors = _together(8, lambda: detect_ingredients(str(FRIDGE), client, image_options=RAW_IMAGE_OPTIONS))
+    assert errors == [None] * 8
+    assert all(r == ["Milk", "Eggs"] for r in out)
+    assert client.calls == 1
+    out[0].append("Mutated")  # every caller gets its own list
+    assert out[1] == ["Milk", "Eggs"]
+
+
+def test_threads_share_the_error():
+    flight = SingleFlight("t")
+    boom = ValueError("boom")
+
+    def fn():
+        time.sleep(0.05)
+        raise boom
+
+    _, errors = _together(5, lambda: flight.do("k", fn))
+    assert all(e is boom for e in errors)
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "saved": 4}
+
+
+def test_sequential_calls_are_not_merged():
+    client = FakeClient(RAW)
+    for _ in range(3):
+        suggest_recipes_from_ingredients(client, ["rice"], 400)
+    assert client.calls == 3
+
+
+def test_async_suggest_coalesces_identical_payloads():
+    client = FakeClient(RAW, delay=0.05)
+
+    async def main():
+        same = [suggest_recipes_async(client, ["Rice", "rice "], 400) for _ in range(5)]
+        other = [suggest_recipes_async(client, ["rice"], 500)]
+        return await asyncio.gather(*same, *other)
+
+    out = asyncio.run(main())
+    assert client.calls == 2
+    assert len(set(out[:5])) == 1
+
+
+def test_async_errors_reach_every_waiter():
+    client = FakeClient("[]", delay=0.05, error=RuntimeError("down"))
+
+    async def main():
+        return await asyncio.gather(
+            *(detect_ingredients_async(str(FRIDGE), client, image_options=RAW_IMAGE_OPTIONS) for _ in range(4)),
+            return_exceptions=True,
+        )
+
+    out = asyncio.run(main())
+    assert client.calls == 1
+    assert all(isinstance(e, RuntimeError) for e in out)
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    flight = SingleFlight("t")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado("k", work))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == 42
+
+
+def test_cancelled_leader_hands_the_call_to_its_followers():
+    flight = SingleFlight("t")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("k", work))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(flight.ado("k", work)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(main()) == [42, 42, 42]
+    assert len(runs) == 2  # the cancelled leader's call + one takeover shared by all followers
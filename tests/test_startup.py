@@ -0,0 +1,51 @@
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+# cumulative import time of bitewise.cli (µs) as reported by -X importtime;
+# generous so slow CI boxes pass, tight enough to catch an eager SDK import (~1s)
+BUDGET_US = int(os.getenv("BITEWISE_STARTUP_BUDGET_MS", "400")) * 1000
+HEAVY = ("google.generativeai", "PIL", "dotenv")
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    env = {k: v for k, v in os.environ.items() if k != "GOOGLE_API_KEY"}
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=env, timeout=60)
+
+
+def test_cli_import_stays_light_and_within_budget():
+    proc = _run(
+        "import sys, bitewise.cli\n"
+        f"print([m for m in {HEAVY!r} if m in sys.modules])"
+    )
+    assert proc.stdout.strip() == "[]"
+    m = re.search(r"import time:\s+\d+ \|\s+(\d+) \| bitewise\.cli$", proc.stderr, re.M)
+    assert m, proc.stderr[-2000:]
+    assert int(m.group(1)) < BUDGET_US, f"bitewise.cli import took {int(m.group(1)) / 1000:.0f} ms"
+
+
+def test_offline_suggest_never_imports_the_sdk():
+    proc = _run(
+        "import sys\n"
+        "from bitewise.recipes import suggest_recipes_from_ingredients\n"
+        "suggest_recipes_from_ingredients(None, ['rice', 'eggs'], 500)\n"
+        "print('google.generativeai' in sys.modules, 'PIL' in sys.modules)"
+    )
+    assert proc.stdout.strip() == "False False", proc.stderr[-2000:]
+
+
+@pytest.mark.parametrize("argv", [["--version"], ["--help"]])
+def test_trivial_commands_skip_heavy_imports(argv):
+    code = (
+        "import sys\n"
+        f"sys.argv = ['bitewise'] + {argv!r}\n"
+        "from bitewise.cli import main\n"
+        "try:\n    main()\nexcept SystemExit:\n    pass\n"
+        f"print('LOADED', [m for m in {HEAVY!r} + ('bitewise.recipes',) if m in sys.modules])"
+    )
+    proc = _run(code)
+    assert "LOADED []" in proc.stdout, proc.stdout[-500:] + proc.stderr[-2000:]
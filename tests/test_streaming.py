@@ -0,0 +1,94 @@
+import json
+
+from bitewise.cache import RecipeCache
+from bitewise.policy import CallPolicy, CircuitBreaker
+from bitewise.recipes import suggest_recipes_stream
+from bitewise.schemas import RecipeStreamParser
+
+from .fakes import FakeResponse
+
+PAYLOAD = json.dumps({"recipes": [
+    {"name": "A {tricky} \"name\"", "ingredients": ["rice", "bacon"], "estimated_calories": 300},
+    {"name": "B", "ingredients": ["bacon"], "estimated_calories": 200},
+    {"name": "C", "ingredients": ["eggs", "rice"], "estimated_calories": 350},
+]})
+
+
+class StreamClient:
+    def __init__(self, size=5):
+        self.size = size
+        self.calls = 0
+
+    def generate_content(self, *args, stream=False, **kwargs):
+        assert stream
+        self.calls += 1
+        return (FakeResponse(PAYLOAD[i:i + self.size]) for i in range(0, len(PAYLOAD), self.size))
+
+
+def test_parser_emits_each_recipe_when_it_closes():
+    first_end = PAYLOAD.index('"estimated_calories": 300}') + len('"estimated_calories": 300}')
+    parser = RecipeStreamParser()
+    assert parser.feed(PAYLOAD[: first_end - 1]) == []
+    assert [r["name"] for r in parser.feed(PAYLOAD[first_end - 1])] == ['A {tricky} "name"']
+    assert [r["name"] for r in parser.feed(PAYLOAD[first_end:])] == ["B", "C"]
+
+
+def test_stream_yields_guarded_recipes_and_fills_cache():
+    client, cache = StreamClient(), RecipeCache()
+    recipes = list(suggest_recipes_stream(client, ["rice", "eggs"], 400, cache=cache))
+    assert [r["name"] for r in recipes] == ['A {tricky} "name"', "C"]
+    assert recipes[0]["ingredients"] == ["rice"]
+    assert list(suggest_recipes_stream(client, ["rice", "eggs"], 400, cache=cache)) == recipes
+    assert client.calls == 1
+
+
+def test_stream_is_lazy():
+    gen = suggest_recipes_stream(StreamClient(size=1), ["rice", "eggs"], 400)
+    assert next(gen)["name"] == 'A {tricky} "name"'
+
+
+class BreakingClient(StreamClient):
+    """Streams `good` chunks, then raises a transient error (for the first `breaks` calls)."""
+
+    def __init__(self, good, breaks):
+        super().__init__()
+        self.good, self.breaks = good, breaks
+
+    def generate_content(self, *args, stream=False, **kwargs):
+        chunks = super().generate_content(*args, stream=stream, **kwargs)
+        if self.calls > self.breaks:
+            return chunks
+
+        def _gen():
+            for i, c in enumerate(chunks):
+                if i == self.good:
+                    raise ConnectionError("stream reset")
+                yield c
+        return _gen()
+
+
+def _policy(threshold=5):
+    return CallPolicy(max_attempts=1, breaker=CircuitBreaker(failure_threshold=threshold, reset_after=60))
+
+
+def test_stream_broken_before_first_recipe_is_reissued():
+    client, policy = BreakingClient(good=2, breaks=1), _policy()
+    recipes = list(suggest_recipes_stream(client, ["rice", "eggs"], 400, policy=policy))
+    assert client.calls == 2 and [r["name"] for r in recipes] == ['A {tricky} "name"', "C"]
+
+
+def test_broken_streams_trip_the_breaker_and_fall_back():
+    client, policy = BreakingClient(good=2, breaks=2), _policy()
+    recipes = list(suggest_recipes_stream(client, ["rice", "eggs"], 400, policy=policy))
+    assert client.calls == 2 and [r["name"] for r in recipes] == ["rice, eggs Bowl", "rice, eggs Stir-Fry"]
+
+    client, policy = BreakingClient(good=2, breaks=1), _policy(threshold=1)
+    list(suggest_recipes_stream(client, ["rice", "eggs"], 400, policy=policy))
+    assert client.calls == 1 and policy.breaker.state == "open"  # the re-issue was rejected
+
+
+def test_stream_broken_after_a_recipe_ends_with_what_was_shown():
+    client, cache = BreakingClient(good=30, breaks=1), RecipeCache()
+    recipes = list(suggest_recipes_stream(client, ["rice", "eggs"], 400, cache=cache, policy=_policy()))
+    assert client.calls == 1 and [r["name"] for r in recipes] == ['A {tricky} "name"']
+    assert cache.stats()["entries"] == 0
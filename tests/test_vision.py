@@ -0,0 +1,83 @@
+from pathlib import Path
+
+from bitewise.cache import DetectionCache
+from bitewise.vision import detect_ingredients
+
+from .fakes import FakeClient
+
+FRIDGE = Path(__file__).resolve().parents[1] / "examples" / "sample_fridge.jpg"
+DETECTED = '["Milk", "Eggs", "Milk"]'
+
+
+def test_detect_parses_json_and_dedups():
+    client = FakeClient(DETECTED)
+    assert detect_ingredients(str(FRIDGE), client, max_items=5) == ["Milk", "Eggs"]
+
+
+def test_cache_hit_skips_model_call():
+    client, cache = FakeClient(DETECTED), DetectionCache()
+    first = detect_ingredients(str(FRIDGE), client, cache=cache)
+    second = detect_ingredients(str(FRIDGE), client, cache=cache)
+    assert first == second and client.calls == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_disk_cache_survives_new_instance(tmp_path):
+    client = FakeClient(DETECTED)
+    detect_ingredients(str(FRIDGE), client, cache=DetectionCache(disk_dir=tmp_path))
+    cache = DetectionCache(disk_dir=tmp_path)
+    assert detect_ingredients(str(FRIDGE), None, cache=cache) == ["Milk", "Eggs"]
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_cache_tracks_its_size_and_walks_only_to_evict(tmp_path, monkeypatch):
+    cache = DetectionCache(maxsize=0, disk_dir=tmp_path, disk_max_bytes=2000)
+    walks = []
+    evict = DetectionCache._disk_evict
+    monkeypatch.setattr(DetectionCache, "_disk_evict", lambda self: walks.append(1) or evict(self))
+    for i in range(100):
+        cache.put(DetectionCache.key(str(i).encode(), "p", 5), [f"Item {i}"] * 4)
+    on_disk = sum(p.stat().st_size for p in tmp_path.glob("*/*.json"))
+    assert on_disk <= 2000 and cache._disk_bytes == on_disk
+    assert len(walks) < 20  # first write seeds the size; later walks only when over budget
+
+
+def test_cache_key_depends_on_max_items():
+    assert DetectionCache.key(b"x", "p", 5) != DetectionCache.key(b"x", "p", 6)
+
+
+def test_detect_many_merges_and_keeps_per_image_errors(tmp_path):
+    from bitewise.vision import detect_ingredients_many
+
+    missing = str(tmp_path / "nope.jpg")
+    res = detect_ingredients_many([str(FRIDGE), missing, FRIDGE.read_bytes()], FakeClient(DETECTED), max_workers=2)
+    assert res.results[0] == ["Milk", "Eggs"] and res.results[2] == ["Milk", "Eggs"]
+    assert res.results[1] is None and isinstance(res.errors[1], OSError)
+    assert res.ingredients == ["Milk", "Eggs"]
+    assert not res.ok
+
+
+def test_packed_detection_uses_one_call_and_splits_per_image():
+    from bitewise.vision import detect_ingredients_many
+
+    client = FakeClient('[["Milk", "Eggs"], ["Rice"], ["Eggs", "Oats"]]')
+    res = detect_ingredients_many([FRIDGE.read_bytes(), b"a", b"b"], client, pack=True)
+    assert client.calls == 1
+    assert res.results == [["Milk", "Eggs"], ["Rice"], ["Eggs", "Oats"]]
+    assert res.ingredients == ["Milk", "Eggs", "Rice", "Oats"]
+
+
+def test_packed_detection_accepts_merged_reply_and_chunks():
+    from bitewise.vision import detect_ingredients_many
+
+    client = FakeClient('["Milk", "Rice"]')
+    res = detect_ingredients_many([b"a", b"b", b"c"], client, pack=True, max_images_per_request=2)
+    assert client.calls == 2
+    assert res.results == [None, None, None] and res.ok
+    assert res.ingredients == ["Milk", "Rice"]
+
+
+def test_non_json_reply_is_salvaged_without_second_call():
+    client = FakeClient("Here are the ingredients:\n- Milk\n- Eggs\n")
+    assert detect_ingredients(str(FRIDGE), client) == ["Milk", "Eggs"]
+    assert client.calls == 1